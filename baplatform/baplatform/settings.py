@@ -84,6 +84,10 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # 测试库使用文件而非内存数据库，多线程并发测试才能共享同一个库
+        'TEST': {
+            'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
+        },
     }
 }
 
@@ -195,6 +199,46 @@ CKEDITOR_CONFIGS = {
 }
 
 
+# 论坛浏览数写缓冲：每累计 N 次浏览或每隔 N 秒批量写回一次
+FORUM_VIEW_FLUSH_HITS = 100
+FORUM_VIEW_FLUSH_INTERVAL = 60
+# 同一会话在该时间窗口（秒）内重复浏览同一帖子只计一次，0 表示不去重
+FORUM_VIEW_DEDUP_SECONDS = 30 * 60
+
+
+# 论坛语义检索：每门课程的帖子向量索引文件目录，以及每次检索返回的帖子数
+FORUM_VECTOR_DIR = os.path.join(BASE_DIR, 'vector_index')
+FORUM_SEMANTIC_TOP_K = 100
+# 帖子嵌入器（需实现 dim 属性和 embed(texts) 方法）及 Post.embedding 的存储格式（int8 或 float16）
+FORUM_EMBEDDER = 'baweb.utils.embedding.HashingEmbedder'
+FORUM_EMBEDDING_FORMAT = 'int8'
+# 帖子详情页展示的相关帖子数
+FORUM_RELATED_K = 5
+# 帖子详情页评论树直接展开的回复层数，更深的回复按需加载
+FORUM_COMMENT_DEPTH = 3
+# 趋势统计的默认时间窗口和时间桶保留时长（小时）
+FORUM_TRENDING_HOURS = 7 * 24
+FORUM_TRENDING_RETENTION_HOURS = 7 * 24
+# 课程帖子排行缓存的长度（篇）和过期时间（秒）
+FORUM_LEADERBOARD_SIZE = 50
+FORUM_LEADERBOARD_TIMEOUT = 300
+
+# 清理已删除帖子时每批删除的记录数，以及两批之间让出写锁的秒数
+FORUM_PURGE_BATCH_SIZE = 500
+FORUM_PURGE_PAUSE = 0.05
+
+# 论坛实时事件：每个频道保留的事件数（供 Last-Event-ID 补发）、连接时长、保活间隔（秒）
+FORUM_EVENT_BUFFER = 100
+FORUM_EVENT_STREAM_SECONDS = 300
+FORUM_EVENT_HEARTBEAT = 15
+# 超过该时间（秒）没有新事件的频道连同缓冲区一起淘汰，同时保留的频道数上限
+FORUM_EVENT_CHANNEL_TTL = 600
+FORUM_EVENT_CHANNELS = 1000
+
+# 发帖时提示相似问题的 Jaccard 相似度阈值
+FORUM_DUPLICATE_THRESHOLD = 0.5
+
+
 # SECURITY安全设置 - 支持http时建议开启
 SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "http")
 SECURE_SSL_REDIRECT = False # 将所有非SSL请求永久重定向到SSL
@@ -15,6 +15,7 @@ Including another URLconf
 """
 from django.urls import path,include
 from baweb.views import home,admin, user, student, course, teacher, file, assignment, assignmentfile, comment, group, announce
+from baweb.views import forum, forum_api
 from django.conf import settings
 from django.conf.urls.static import static
 
@@ -106,8 +107,9 @@ urlpatterns = [
     path('assignment/<int:id>/student/<int:sid>/entermarks',assignmentfile.marks_enter), 
     path('assignment/<int:id>/student/<int:uid>/marks/get', assignmentfile.marks_get),
     path('assignment/<int:id>/student/<int:uid>/files/get', assignmentfile.files_get),
+    path('assignment/<int:id>/submissions/get', assignmentfile.submissions_get),
     ##查看成绩
-    #path('course/<int:id>/marks/list',course.marks_list), 
+    path('course/<int:id>/marks/list',course.marks_list), 
     ##小组
     path('course/<int:id>/group/list',group.group_list), 
     path('course/<int:id>/group/add',group.group_add), 
@@ -122,4 +124,27 @@ urlpatterns = [
     path('ckeditor/', include('ckeditor_uploader.urls')),
     ##老师课程展示
     path("teacher/<int:id>/course/list", course.teacher_courses),
+    ##论坛（course_id 为 0 表示不对应任何课程）
+    path('forum/<int:course_id>/list', forum.post_list),
+    path('forum/<int:course_id>/post/add', forum.post_create),
+    path('forum/<int:course_id>/tags', forum.popular_tags),
+    path('forum/<int:course_id>/trending', forum.trending_list),
+    path('forum/<int:course_id>/events', forum.course_events),
+    path('forum/collections', forum.my_collections),
+    path('forum/leaderboard/stats', forum.leaderboard_stats),
+    path('forum/interactions', forum.interactions_batch),
+    path('forum/post/<str:post_id>/detail', forum.post_detail),
+    path('forum/post/<str:post_id>/update', forum.post_update),
+    path('forum/post/<str:post_id>/delete', forum.post_delete),
+    path('forum/post/<str:post_id>/like', forum.post_like),
+    path('forum/post/<str:post_id>/collect', forum.post_collect),
+    path('forum/post/<str:post_id>/events', forum.post_events),
+    path('forum/post/<str:post_id>/comment/add', forum.comment_add),
+    path('forum/comment/<str:comment_id>/delete', forum.comment_delete),
+    path('forum/comment/<str:comment_id>/replies', forum.comment_replies),
+    path('forum/comment/<str:comment_id>/like', forum.comment_like),
+    ####论坛只读 JSON 接口（支持 ETag 条件请求）
+    path('api/forum/<int:course_id>/posts', forum_api.post_list),
+    path('api/forum/post/<str:post_id>', forum_api.post_detail),
+    path('api/forum/post/<str:post_id>/comments', forum_api.comment_list),
 ]+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class BawebConfig(AppConfig):
     name = 'baweb'
+
+    def ready(self):
+        from baweb import signals  # noqa: F401 注册信号处理函数
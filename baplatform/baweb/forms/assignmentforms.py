@@ -15,10 +15,10 @@ class AssignmentCommentForm(BootStrapModelForm):
 
 class AssignmentSubmitForm(BootStrapModelForm):
     class Meta:
-        model = models.AssignmentSubmit
+        model = models.SubmissionFile
         fields = ['file', 'file_name']
 
 class AssignmentMarkForm(BootStrapModelForm):
     class Meta:
-        model = models.AssignmentSubmit
+        model = models.Submission
         fields = ['marks', 'max_marks']
\ No newline at end of file
@@ -77,6 +77,13 @@ class PostSearchForm(forms.Form):
         ('heat', '按热度排序'),
         ('newest', '按最新排序'),
         ('popular', '按热门排序'),
+        ('hot', '按热议排序'),
+        ('relevance', '按相关度排序'),
+    )
+    
+    MODE_CHOICES = (
+        ('keyword', '关键词检索'),
+        ('semantic', '语义检索'),
     )
     
     keyword = forms.CharField(
@@ -86,6 +93,13 @@ class PostSearchForm(forms.Form):
         widget=forms.TextInput(attrs={'placeholder': '输入搜索关键词...'})
     )
     
+    mode = forms.ChoiceField(
+        label='检索方式',
+        choices=MODE_CHOICES,
+        required=False,
+        initial='keyword'
+    )
+    
     category = forms.ModelChoiceField(
         label='内容分类',
         queryset=models.ContentCategory.objects.all(),
@@ -93,6 +107,12 @@ class PostSearchForm(forms.Form):
         empty_label='所有分类'
     )
     
+    tag = forms.CharField(
+        label='标签',
+        max_length=64,
+        required=False
+    )
+    
     sort_by = forms.ChoiceField(
         label='排序方式',
         choices=SORT_CHOICES,
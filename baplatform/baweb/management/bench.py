@@ -0,0 +1,41 @@
+"""
+bench_* 基准命令的公共部分
+测量数据在事务中生成，命令结束后整体回滚，不留在数据库中
+"""
+
+from contextlib import contextmanager
+from uuid import uuid4
+
+from django.db import transaction
+
+from baweb import models
+
+
+class _Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back():
+    '''在事务中执行代码块，结束后回滚（代码块抛出的其他异常照常向外抛出）'''
+    try:
+        with transaction.atomic():
+            yield
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+def seed_course(tag=None):
+    '''生成测量用的教师和课程
+
+    Args:
+        tag (str): 教师用户名后缀，为 None 时随机生成
+
+    Returns:
+        tuple: (教师 User, Course)
+    '''
+    teacher_user = models.User.objects.create(username='bench-' + (tag or uuid4().hex[:8]), password='x', type=2)
+    teacher = models.TeacherInfo.objects.create(user=teacher_user, name='bench')
+    course = models.Course.objects.create(name='bench', teacher=teacher)
+    return teacher_user, course
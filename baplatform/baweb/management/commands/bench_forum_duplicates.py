@@ -0,0 +1,66 @@
+import random
+import time
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+
+from baweb import models
+from baweb.management.bench import rolled_back, seed_course
+from baweb.utils import duplicates, minhash
+
+# 常用字随机组词作为背景文本
+CHARS = [chr(code) for code in range(0x4e00, 0x4e00 + 800)]
+
+
+class Command(BaseCommand):
+    help = '测量发帖时相似问题检测的耗时（数据在事务中生成，结束后回滚）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100000, help='生成的帖子数')
+        parser.add_argument('--repeat', type=int, default=50, help='查询次数')
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            course, samples = self._seed(options['posts'])
+            self._run(course, samples, options['repeat'])
+
+    def _text(self, rng, words):
+        return ''.join(rng.choice(CHARS) for _ in range(words * 2))
+
+    def _seed(self, total):
+        rng = random.Random(0)
+        teacher_user, course = seed_course()
+
+        started = time.perf_counter()
+        samples = []
+        batch = 5000
+        for offset in range(0, total, batch):
+            posts = [
+                models.Post(postId=str(uuid4()), author=teacher_user, course=course,
+                            title=self._text(rng, 6), content=self._text(rng, 60))
+                for _ in range(min(batch, total - offset))
+            ]
+            models.Post.objects.bulk_create(posts)
+            samples.extend((post.title, post.content) for post in rng.sample(posts, 2))
+        # bulk_create 不触发信号，直接批量写入分桶
+        rows = []
+        for pk, title, content in models.Post.objects.filter(course=course).values_list('id', 'title', 'content'):
+            keys = minhash.bands(minhash.signature(minhash.shingles(title, content)))
+            rows.extend(models.PostLSHBucket(course=course, post_id=pk, bucket=key) for key in set(keys))
+        models.PostLSHBucket.objects.bulk_create(rows)
+        self.stdout.write('已生成 {} 篇帖子，耗时 {:.1f} 秒'.format(total, time.perf_counter() - started))
+        return course, samples
+
+    def _run(self, course, samples, repeat):
+        rng = random.Random(1)
+        # 近似重复：在已有帖子末尾改写一小段
+        similar = [(title, content[:-10] + self._text(rng, 5)) for title, content in samples]
+        fresh = [(self._text(rng, 6), self._text(rng, 60)) for _ in samples]
+        for name, queries in (('近似重复', similar), ('全新问题', fresh)):
+            found = 0
+            started = time.perf_counter()
+            for i in range(repeat):
+                title, content = queries[i % len(queries)]
+                found += bool(duplicates.find(course.id, title, content))
+            elapsed = (time.perf_counter() - started) * 1000 / repeat
+            self.stdout.write('{}：平均 {:.2f} ms，{}/{} 次找到相似帖子'.format(name, elapsed, found, repeat))
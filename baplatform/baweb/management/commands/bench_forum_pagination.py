@@ -0,0 +1,68 @@
+import random
+import time
+from datetime import timedelta
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.utils import timezone
+
+from baweb import models
+from baweb.management.bench import rolled_back, seed_course
+from baweb.utils import keyset
+
+
+class Command(BaseCommand):
+    help = '对比页码分页与游标分页在第 1 页和深页的耗时（数据在事务中生成，结束后回滚）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=20000, help='生成的帖子数')
+        parser.add_argument('--page', type=int, default=500, help='对比的深页页码')
+        parser.add_argument('--repeat', type=int, default=20, help='每页重复查询次数')
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            course = self._seed(options['posts'])
+            self._run(course, options['page'], options['repeat'])
+
+    def _seed(self, total):
+        rng = random.Random(0)
+        teacher_user, course = seed_course()
+        now = timezone.now()
+        posts = [
+            models.Post(postId=str(uuid4()), author=teacher_user, course=course, title='帖子', content='内容',
+                        heatScore=round(rng.uniform(0, 100), 1), viewCount=rng.randrange(500),
+                        hotScore=rng.uniform(0, 100))
+            for _ in range(total)
+        ]
+        models.Post.objects.bulk_create(posts)
+        # createdAt 是 auto_now_add，生成后再分散到过去 90 天
+        models.Post.objects.bulk_update(
+            [models.Post(pk=pk, createdAt=now - timedelta(seconds=rng.randrange(90 * 24 * 3600)))
+             for pk in models.Post.objects.filter(course=course).values_list('pk', flat=True)],
+            ['createdAt'], batch_size=500)
+        self.stdout.write('已生成 {} 篇帖子'.format(total))
+        return course
+
+    def _run(self, course, page, repeat):
+        base = models.Post.objects.filter(course=course)
+        for sort_by, keys in keyset.POST_SORT_KEYS.items():
+            ordered = base.order_by(*['-' + key for key in keys])
+            deep_cursor = self._cursor_before(ordered, keys, page)
+            offset_first = self._time(lambda: list(Paginator(ordered, 10).get_page(1)), repeat)
+            offset_deep = self._time(lambda: list(Paginator(ordered, 10).get_page(page)), repeat)
+            keyset_first = self._time(lambda: list(keyset.paginate(base, keys, None, 10)), repeat)
+            keyset_deep = self._time(lambda: list(keyset.paginate(base, keys, deep_cursor, 10)), repeat)
+            self.stdout.write('{:8}页码分页：第 1 页 {:.2f} ms，第 {} 页 {:.2f} ms；游标分页：第 1 页 {:.2f} ms，第 {} 页 {:.2f} ms'.format(
+                sort_by, offset_first, page, offset_deep, keyset_first, page, keyset_deep))
+
+    def _cursor_before(self, ordered, keys, page):
+        '''第 page 页的游标，即第 page-1 页最后一行的排序键'''
+        last = ordered[(page - 1) * 10 - 1]
+        return keyset._encode('next', keyset._values(last, keys))
+
+    def _time(self, func, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - started) * 1000 / repeat
@@ -0,0 +1,81 @@
+import random
+import time
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+
+from baweb import models
+from baweb.management.bench import rolled_back, seed_course
+from baweb.utils import cjk, search
+
+# 常用字随机组词作为背景文本，关键词只以较低概率出现，使命中率接近真实论坛
+CHARS = [chr(code) for code in range(0x4e00, 0x4e00 + 800)]
+KEYWORDS = ['推荐系统', '决策树 作业', 'pandas', '期末']
+RARE = ['推荐系统', '决策树', '作业', 'pandas', '期末', '机器学习', 'Django', '可视化']
+
+
+class Command(BaseCommand):
+    help = '对比 FTS5 全文检索与 icontains 的检索耗时（数据在事务中生成，结束后回滚）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100000, help='生成的帖子数')
+        parser.add_argument('--repeat', type=int, default=5, help='每个关键词重复查询次数')
+
+    def handle(self, *args, **options):
+        if not search.available():
+            raise CommandError('当前数据库没有全文索引表，请先执行 migrate')
+        with rolled_back():
+            course = self._seed(options['posts'])
+            self._run(course, options['repeat'])
+
+    def _seed(self, total):
+        rng = random.Random(0)
+        teacher_user, course = seed_course()
+
+        started = time.perf_counter()
+        batch = 5000
+        for offset in range(0, total, batch):
+            posts = []
+            for _ in range(min(batch, total - offset)):
+                words = [''.join(rng.choice(CHARS) for _ in range(2)) for _ in range(60)]
+                if rng.random() < 0.05:
+                    words.insert(rng.randrange(len(words)), rng.choice(RARE))
+                title = ''.join(words[:4])
+                content = '，'.join(''.join(words[i:i + 6]) for i in range(4, len(words), 6))
+                posts.append(models.Post(postId=str(uuid4()), author=teacher_user, course=course,
+                                         title=title, content=content))
+            models.Post.objects.bulk_create(posts)
+        # bulk_create 不触发信号，直接批量写入索引
+        with connection.cursor() as cursor:
+            rows = models.Post.objects.filter(course=course).values_list('id', 'title', 'content', 'tags')
+            cursor.executemany(
+                'INSERT INTO {}(rowid, title, content, tags) VALUES (%s, %s, %s, %s)'.format(search.FTS_TABLE),
+                [(pk, cjk.tokenized(t), cjk.tokenized(c), cjk.tokenized(g)) for pk, t, c, g in rows],
+            )
+        self.stdout.write('已生成 {} 篇帖子，耗时 {:.1f} 秒'.format(total, time.perf_counter() - started))
+        return course
+
+    def _run(self, course, repeat):
+        base = models.Post.objects.filter(course=course)
+        for keyword in KEYWORDS:
+            like_query = base
+            for term in keyword.split():
+                like_query = like_query.filter(Q(title__icontains=term) | Q(content__icontains=term))
+            like_query = like_query.order_by('-heatScore', '-createdAt')
+            fts_query = search.search(base, keyword)
+            like_time, like_count = self._time(like_query, repeat)
+            fts_time, fts_count = self._time(fts_query, repeat, keyword)
+            self.stdout.write('“{}”：icontains {:.1f} ms（{} 条），FTS5 {:.1f} ms（{} 条），{:.1f} 倍'.format(
+                keyword, like_time, like_count, fts_time, fts_count, like_time / fts_time if fts_time else 0))
+
+    def _time(self, query, repeat, highlight=None):
+        '''统计总数并取第一页（全文检索还要生成摘要），与 post_list 的分页查询一致'''
+        started = time.perf_counter()
+        for _ in range(repeat):
+            count = query.count()
+            page = list(query[:10])
+            if highlight:
+                search.highlight(page, highlight)
+        return (time.perf_counter() - started) * 1000 / repeat, count
@@ -0,0 +1,79 @@
+import random
+import time
+from datetime import date
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from baweb import models
+from baweb.management.bench import rolled_back, seed_course
+from baweb.utils import submission_status
+
+
+class Command(BaseCommand):
+    help = '测量不同选课人数下统计作业提交情况的查询数和耗时（数据在事务中生成，结束后回滚）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='50,300,3000', help='逗号分隔的选课人数')
+        parser.add_argument('--group-size', type=int, default=5, help='每个小组的人数')
+        parser.add_argument('--files', type=int, default=3, help='每个提交学生上传的文件数')
+        parser.add_argument('--repeat', type=int, default=20, help='每项重复次数')
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            for size in [int(size) for size in options['sizes'].split(',')]:
+                assignments = self._seed(size, options['group_size'], options['files'])
+                self._run(size, assignments, options['repeat'])
+
+    def _seed(self, total, group_size, files):
+        rng = random.Random(total)
+        tag = uuid4().hex[:8]
+        _, course = seed_course(tag)
+        models.User.objects.bulk_create(
+            [models.User(username='b{}-{}'.format(tag, i), password='x', type=1) for i in range(total)])
+        users = models.User.objects.filter(username__startswith='b{}-'.format(tag))
+        models.StudentInfo.objects.bulk_create([models.StudentInfo(user=user) for user in users])
+        students = list(models.StudentInfo.objects.filter(user__in=users))
+        models.StudentCourse.objects.bulk_create(
+            [models.StudentCourse(student=student, course=course) for student in students])
+
+        models.Group.objects.bulk_create([models.Group(course=course, name='bench-{}-{}'.format(tag, i))
+                                          for i in range(0, total, group_size)])
+        groups = list(models.Group.objects.filter(course=course).order_by('id'))
+        models.GroupMember.objects.bulk_create(
+            [models.GroupMember(group=groups[i // group_size], student=student, is_head=i % group_size == 0)
+             for i, student in enumerate(students)])
+
+        assignments = []
+        for is_group in (False, True):
+            assignment = models.Assignment.objects.create(name='bench', course=course, is_group=is_group,
+                                                          ddl=date.today())
+            # 个人任务约七成学生提交；小组任务由约一半小组的组长提交
+            if is_group:
+                submitters = [student for i, student in enumerate(students)
+                              if i % group_size == 0 and rng.random() < 0.5]
+            else:
+                submitters = [student for student in students if rng.random() < 0.7]
+            models.Submission.objects.bulk_create(
+                [models.Submission(assignment=assignment, student=student) for student in submitters])
+            models.SubmissionFile.objects.bulk_create(
+                [models.SubmissionFile(submission=submission, file='submission/bench.txt', file_name='bench')
+                 for submission in models.Submission.objects.filter(assignment=assignment) for _ in range(files)])
+            assignments.append(assignment)
+        # bulk_create 不经过视图，按文件记录生成汇总字段
+        submission_status.sync()
+        return assignments
+
+    def _run(self, total, assignments, repeat):
+        for assignment in assignments:
+            with CaptureQueriesContext(connection) as queries:
+                status = submission_status.compute(assignment)
+            started = time.perf_counter()
+            for _ in range(repeat):
+                submission_status.compute(assignment)
+            elapsed = (time.perf_counter() - started) * 1000 / repeat
+            self.stdout.write('{} 人{}任务：已提交 {}，未提交 {}，{} 次查询，平均 {:.2f} ms'.format(
+                total, '小组' if assignment.is_group else '个人', len(status.submitted), len(status.unsubmitted),
+                len(queries), elapsed))
@@ -0,0 +1,24 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from baweb.utils import submission_status
+
+
+class Command(BaseCommand):
+    help = '按文件记录检查学生提交的汇总字段，只报告不写回；有不一致时以非零状态退出'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--show', type=int, default=20, help='最多列出的不一致条数')
+
+    def handle(self, *args, **options):
+        total, diffs, elapsed = submission_status.sync(dry_run=True)
+        for diff in diffs[:options['show']]:
+            self.stdout.write(str(diff))
+        if len(diffs) > options['show']:
+            self.stdout.write('...（共 {} 条）'.format(len(diffs)))
+        self.stdout.write('检查 {} 个任务，耗时 {:.2f} 秒'.format(total, elapsed))
+        if diffs:
+            by_field = Counter(diff.field for diff in diffs)
+            raise CommandError('发现不一致：' + '，'.join(
+                '{} {} 条'.format(field, count) for field, count in sorted(by_field.items())))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from baweb.utils import embedding_pipeline
+
+
+class Command(BaseCommand):
+    help = '为缺少嵌入或嵌入已过期的帖子批量生成嵌入（可随时中断，重新执行会从剩余的帖子继续）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=256, help='每批帖子数')
+        parser.add_argument('--limit', type=int, default=None, help='最多处理的帖子数')
+
+    def handle(self, *args, **options):
+        total, elapsed = embedding_pipeline.run(batch_size=options['batch_size'], limit=options['limit'])
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write('已生成 {} 篇帖子的嵌入，耗时 {:.2f} 秒（{:.0f} 篇/秒）'.format(total, elapsed, rate))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from baweb.utils import viewcount
+
+
+class Command(BaseCommand):
+    help = '把缓冲中的帖子浏览数批量写回数据库（配置共享缓存时可由 cron 定时执行）'
+
+    def handle(self, *args, **options):
+        flushed = viewcount.flush()
+        self.stdout.write('已写回 {} 次浏览'.format(flushed))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from baweb.utils import trending
+
+
+class Command(BaseCommand):
+    help = '清理超出保留时长的趋势时间桶（建议由 cron 每小时执行）'
+
+    def handle(self, *args, **options):
+        deleted = trending.prune()
+        self.stdout.write('已清理 {} 个时间桶'.format(deleted))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from baweb.utils import purge
+
+
+class Command(BaseCommand):
+    help = '分批清理已软删除帖子的评论、点赞、收藏等关联数据（建议由 cron 定期执行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help='最多清理的帖子数')
+        parser.add_argument('--batch-size', type=int, default=None, help='每批删除的记录数')
+        parser.add_argument('--pause', type=float, default=None, help='两批之间暂停的秒数')
+
+    def handle(self, *args, **options):
+        purged, rows, elapsed = purge.purge(limit=options['limit'], batch_size=options['batch_size'],
+                                            pause=options['pause'])
+        self.stdout.write('已清理 {} 篇帖子、{} 条关联记录，耗时 {:.2f} 秒'.format(purged, rows, elapsed))
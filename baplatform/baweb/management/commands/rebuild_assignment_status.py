@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from baweb.utils import submission_status
+
+
+class Command(BaseCommand):
+    help = '按文件记录重建学生提交的汇总字段，只写回不一致的行'
+
+    def handle(self, *args, **options):
+        total, diffs, elapsed = submission_status.sync()
+        rows = len({diff.pk for diff in diffs})
+        self.stdout.write('检查 {} 个任务，耗时 {:.2f} 秒；已修正 {} 行提交'.format(total, elapsed, rows))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from baweb import models
+from baweb.utils import related
+
+
+class Command(BaseCommand):
+    help = '全量重建相关帖子表（日常由嵌入任务增量刷新，只在修改 FORUM_RELATED_K 或更换嵌入器后需要）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, default=None, help='只重建指定课程')
+
+    def handle(self, *args, **options):
+        if options['course']:
+            course_ids = [options['course']]
+        else:
+            course_ids = models.Post.objects.order_by().values_list('course_id', flat=True).distinct()
+        started = time.perf_counter()
+        total = sum(related.rebuild(course_id) for course_id in course_ids)
+        self.stdout.write('已重建 {} 篇帖子的相关帖子，耗时 {:.2f} 秒'.format(total, time.perf_counter() - started))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from baweb.utils import heat
+
+
+class Command(BaseCommand):
+    help = '分块重算所有帖子的热度分数（建议由 cron 每小时执行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='每块帖子数')
+
+    def handle(self, *args, **options):
+        total, elapsed = heat.recompute_all(chunk_size=options['chunk_size'])
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write('已重算 {} 篇帖子，耗时 {:.2f} 秒（{:.0f} 篇/秒）'.format(total, elapsed, rate))
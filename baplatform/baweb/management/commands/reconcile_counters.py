@@ -0,0 +1,25 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from baweb.utils import reconcile
+
+
+class Command(BaseCommand):
+    help = '按点赞、收藏、评论记录校对帖子的冗余计数，只修正不一致的行'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='每块帖子数')
+        parser.add_argument('--dry-run', action='store_true', help='只报告不一致，不写回')
+        parser.add_argument('--show', type=int, default=20, help='最多列出的不一致条数')
+
+    def handle(self, *args, **options):
+        total, diffs, elapsed = reconcile.reconcile(chunk_size=options['chunk_size'], dry_run=options['dry_run'])
+        for diff in diffs[:options['show']]:
+            self.stdout.write(str(diff))
+        if len(diffs) > options['show']:
+            self.stdout.write('...（共 {} 条）'.format(len(diffs)))
+        by_field = Counter('{}.{}'.format(diff.model, diff.field) for diff in diffs)
+        summary = '，'.join('{} {} 条'.format(field, count) for field, count in sorted(by_field.items())) or '无不一致'
+        action = '发现' if options['dry_run'] else '已修正'
+        self.stdout.write('检查 {} 篇帖子，耗时 {:.2f} 秒；{}：{}'.format(total, elapsed, action, summary))
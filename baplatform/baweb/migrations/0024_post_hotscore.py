@@ -0,0 +1,36 @@
+# Generated by Django 2.2.12 on 2026-10-18 17:10
+
+import math
+
+from django.db import migrations, models
+
+
+def backfill_hot_score(apps, schema_editor):
+    '''按 Post.calculateHot() 的公式回填已有帖子的热门分数'''
+    Post = apps.get_model('baweb', 'Post')
+    posts = []
+    for post in Post.objects.only('id', 'likeCount', 'commentCount', 'collectCount', 'createdAt').iterator():
+        interaction_score = post.likeCount + post.commentCount * 2 + post.collectCount * 3
+        post.hotScore = math.log10(max(interaction_score, 1)) + post.createdAt.timestamp() / 45000
+        posts.append(post)
+    Post.objects.bulk_update(posts, ['hotScore'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baweb', '0023_auto_20251113_1323'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='hotScore',
+            field=models.FloatField(default=0.0, help_text='与时间无关，排序无需定期重算', verbose_name='热门分数'),
+        ),
+        migrations.RunPython(backfill_hot_score, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['course', '-hotScore'], name='baweb_post_course__24d8c8_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+import re
+
+from django.db import migrations, OperationalError
+
+# 迁移中不引用应用代码，分词规则从 baweb.utils.cjk 复制，后者修改时这里保持不变
+CJK_RANGE = '\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+TOKEN_RE = re.compile('(?P<cjk>[{0}]+)|(?P<word>[^\\W_{0}]+)'.format(CJK_RANGE))
+INSERT_SQL = 'INSERT INTO baweb_post_fts(rowid, title, content, tags) VALUES (%s, %s, %s, %s)'
+
+
+def tokenized(text):
+    '''中文切成重叠的二元组，其他文字按单词切分并转小写，用空格连接'''
+    result = []
+    for match in TOKEN_RE.finditer(text or ''):
+        run = match.group('cjk')
+        if run is None:
+            result.append(match.group('word').lower())
+        elif len(run) == 1:
+            result.append(run)
+        else:
+            result.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return ' '.join(result)
+
+
+def create_post_fts(apps, schema_editor):
+    '''建立帖子全文索引表并回填（仅 SQLite，且需编译了 FTS5）'''
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                "CREATE VIRTUAL TABLE baweb_post_fts USING fts5(title, content, tags, tokenize='unicode61')"
+            )
+        except OperationalError:
+            # 当前 SQLite 不支持 FTS5，检索退回 icontains
+            return
+        Post = apps.get_model('baweb', 'Post')
+        rows = []
+        for pk, title, content, tags in Post.objects.values_list('id', 'title', 'content', 'tags').iterator():
+            rows.append((pk, tokenized(title), tokenized(content), tokenized(tags)))
+            if len(rows) >= 500:
+                cursor.executemany(INSERT_SQL, rows)
+                rows = []
+        if rows:
+            cursor.executemany(INSERT_SQL, rows)
+
+
+def drop_post_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS baweb_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baweb', '0024_post_hotscore'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_post_fts, drop_post_fts),
+    ]
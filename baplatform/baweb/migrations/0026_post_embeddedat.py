@@ -0,0 +1,18 @@
+# Generated by Django 2.2.12 on 2026-10-18 17:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baweb', '0025_post_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='embeddedAt',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='生成嵌入时帖子的 updatedAt，为空或早于 updatedAt 时需要重新生成', null=True, verbose_name='嵌入时间'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.12 on 2026-10-18 17:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baweb', '0026_post_embeddedat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedPost',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.SmallIntegerField(verbose_name='排名')),
+                ('score', models.FloatField(verbose_name='相似度')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_posts', to='baweb.Post', verbose_name='帖子')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='baweb.Post', verbose_name='相关帖子')),
+            ],
+            options={
+                'verbose_name_plural': '相关帖子',
+                'ordering': ['post', 'rank'],
+                'unique_together': {('post', 'rank')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.12 on 2026-10-18 17:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baweb', '0027_relatedpost'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='post',
+            name='baweb_post_course__e37517_idx',
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['course', '-heatScore', '-createdAt'], name='baweb_post_course__826b9e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['course', '-createdAt'], name='baweb_post_course__78dbbd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['course', '-viewCount'], name='baweb_post_course__0474fa_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.12 on 2026-10-18 17:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_paths(apps, schema_editor):
+    '''按父子关系回填已有评论的路径、层级和根评论'''
+    PostComment = apps.get_model('baweb', 'PostComment')
+    parents = dict(PostComment.objects.values_list('id', 'parentComment_id'))
+    paths = {}
+
+    def path_of(pk):
+        if pk not in paths:
+            parent = parents[pk]
+            paths[pk] = (path_of(parent) if parent else '') + '{:010d}/'.format(pk)
+        return paths[pk]
+
+    comments = []
+    for pk in parents:
+        path = path_of(pk)
+        comments.append(PostComment(id=pk, path=path, depth=path.count('/') - 1, rootComment_id=int(path[:10])))
+    PostComment.objects.bulk_update(comments, ['path', 'depth', 'rootComment'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baweb', '0028_post_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postcomment',
+            name='depth',
+            field=models.SmallIntegerField(default=0, verbose_name='回复层级'),
+        ),
+        migrations.AddField(
+            model_name='postcomment',
+            name='path',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='评论路径'),
+        ),
+        migrations.AddField(
+            model_name='postcomment',
+            name='rootComment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='baweb.PostComment', verbose_name='根评论'),
+        ),
+        migrations.AddIndex(
+            model_name='postcomment',
+            index=models.Index(fields=['rootComment', 'path'], name='baweb_postc_rootCom_d54d35_idx'),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
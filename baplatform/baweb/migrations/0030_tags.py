@@ -0,0 +1,100 @@
+# Generated by Django 2.2.12 on 2026-10-18 17:34
+
+import re
+from collections import Counter
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_tags(apps, schema_editor):
+    '''按已有帖子的 tags 字符串回填标签、关联和课程标签计数（拆分规则同 baweb/utils/tags.py）'''
+    Post = apps.get_model('baweb', 'Post')
+    Tag = apps.get_model('baweb', 'Tag')
+    PostTag = apps.get_model('baweb', 'PostTag')
+    CourseTag = apps.get_model('baweb', 'CourseTag')
+
+    post_names = {}
+    for pk, course_id, tags in Post.objects.exclude(tags='').values_list('id', 'course_id', 'tags').iterator():
+        names = []
+        for name in re.split(r'[,，、;；]', tags or ''):
+            name = name.strip()[:64]
+            if name and name not in names:
+                names.append(name)
+        if names:
+            post_names[pk] = (course_id, names)
+
+    all_names = {name for _, names in post_names.values() for name in names}
+    Tag.objects.bulk_create([Tag(name=name) for name in sorted(all_names)], batch_size=500)
+    tag_ids = dict(Tag.objects.values_list('name', 'id'))
+
+    counts = Counter()
+    links = []
+    for pk, (course_id, names) in post_names.items():
+        for name in names:
+            links.append(PostTag(post_id=pk, tag_id=tag_ids[name]))
+            counts[course_id, tag_ids[name]] += 1
+    PostTag.objects.bulk_create(links, batch_size=500)
+    CourseTag.objects.bulk_create(
+        [CourseTag(course_id=course_id, tag_id=tag_id, postCount=count) for (course_id, tag_id), count in counts.items()],
+        batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baweb', '0029_postcomment_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True, verbose_name='标签名')),
+            ],
+            options={
+                'verbose_name_plural': '标签',
+            },
+        ),
+        migrations.CreateModel(
+            name='PostTag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_tags', to='baweb.Post', verbose_name='帖子')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_posts', to='baweb.Tag', verbose_name='标签')),
+            ],
+            options={
+                'verbose_name_plural': '帖子标签',
+            },
+        ),
+        migrations.CreateModel(
+            name='CourseTag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('postCount', models.IntegerField(default=0, verbose_name='帖子数')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='course_tags', to='baweb.Course', verbose_name='课程')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='baweb.Tag', verbose_name='标签')),
+            ],
+            options={
+                'verbose_name_plural': '课程标签',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='posttag',
+            index=models.Index(fields=['tag', 'post'], name='baweb_postt_tag_id_493c39_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='posttag',
+            unique_together={('post', 'tag')},
+        ),
+        migrations.AddIndex(
+            model_name='coursetag',
+            index=models.Index(fields=['course', '-postCount'], name='baweb_cours_course__15ecac_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='coursetag',
+            unique_together={('course', 'tag')},
+        ),
+        migrations.RunPython(backfill_tags, migrations.RunPython.noop),
+    ]
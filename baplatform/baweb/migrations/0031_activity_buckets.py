@@ -0,0 +1,56 @@
+# Generated by Django 2.2.12 on 2026-10-18 17:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baweb', '0030_tags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagActivity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(verbose_name='小时')),
+                ('score', models.IntegerField(default=0, verbose_name='互动量')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='baweb.Course', verbose_name='课程')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='baweb.Tag', verbose_name='标签')),
+            ],
+            options={
+                'verbose_name_plural': '标签互动趋势',
+            },
+        ),
+        migrations.CreateModel(
+            name='PostActivity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(verbose_name='小时')),
+                ('score', models.IntegerField(default=0, verbose_name='互动量')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='baweb.Course', verbose_name='课程')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activities', to='baweb.Post', verbose_name='帖子')),
+            ],
+            options={
+                'verbose_name_plural': '帖子互动趋势',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='tagactivity',
+            index=models.Index(fields=['course', 'hour'], name='baweb_tagac_course__695219_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='tagactivity',
+            unique_together={('course', 'tag', 'hour')},
+        ),
+        migrations.AddIndex(
+            model_name='postactivity',
+            index=models.Index(fields=['course', 'hour'], name='baweb_posta_course__4149c2_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='postactivity',
+            unique_together={('post', 'hour')},
+        ),
+    ]
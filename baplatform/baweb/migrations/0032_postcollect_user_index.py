@@ -0,0 +1,17 @@
+# Generated by Django 2.2.12 on 2026-10-18 17:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baweb', '0031_activity_buckets'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='postcollect',
+            index=models.Index(fields=['user', '-createdAt'], name='baweb_postc_user_id_9803ff_idx'),
+        ),
+    ]
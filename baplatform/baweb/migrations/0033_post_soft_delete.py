@@ -0,0 +1,62 @@
+# Generated by Django 2.2.12 on 2026-10-18 17:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baweb', '0032_postcollect_user_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='post',
+            name='baweb_post_created_d532a7_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='baweb_post_course__24d8c8_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='baweb_post_course__826b9e_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='baweb_post_course__78dbbd_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='baweb_post_course__0474fa_idx',
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='deletedAt',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='删除时间'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(deletedAt__isnull=True), fields=['course', '-heatScore', '-createdAt'], name='post_live_course_heat'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(deletedAt__isnull=True), fields=['course', '-hotScore'], name='post_live_course_hot'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(deletedAt__isnull=True), fields=['course', '-createdAt'], name='post_live_course_newest'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(deletedAt__isnull=True), fields=['course', '-viewCount'], name='post_live_course_popular'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(deletedAt__isnull=True), fields=['-createdAt'], name='post_live_newest'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(deletedAt__isnull=False), fields=['deletedAt'], name='post_deleted'),
+        ),
+    ]
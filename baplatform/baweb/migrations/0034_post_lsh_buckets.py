@@ -0,0 +1,91 @@
+# Generated by Django 2.2.12 on 2026-10-18 17:49
+
+import hashlib
+import html
+import re
+import zlib
+
+import numpy as np
+from django.db import migrations, models
+import django.db.models.deletion
+
+# 迁移中不引用应用代码，签名和分桶规则从 baweb.utils.minhash 复制，后者修改时这里保持不变
+SHINGLE = 3
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+PRIME = 4294967311
+TAG_RE = re.compile(r'<[^>]+>')
+NOISE_RE = re.compile(r'[\W_]+')
+
+
+def normalize(text):
+    return NOISE_RE.sub('', html.unescape(TAG_RE.sub(' ', text or ''))).lower()
+
+
+def bucket_keys(title, content, a, b):
+    '''标题和正文的 LSH 桶号集合'''
+    text = normalize(title) + '\x00' + normalize(content)
+    if len(text) <= SHINGLE:
+        grams = {text}
+    else:
+        grams = {text[i:i + SHINGLE] for i in range(len(text) - SHINGLE + 1)}
+    hashes = {zlib.crc32(gram.encode()) for gram in grams}
+    values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+    sig = ((np.outer(a, values) + b[:, None]) % np.uint64(PRIME)).min(axis=1)
+    keys = set()
+    for band in range(BANDS):
+        digest = hashlib.blake2b(sig[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8,
+                                 salt=band.to_bytes(2, 'big')).digest()
+        keys.add(int.from_bytes(digest, 'big', signed=True))
+    return keys
+
+
+def backfill_buckets(apps, schema_editor):
+    '''为已有帖子计算 MinHash 签名并写入 LSH 分桶（规则同 baweb/utils/duplicates.py）'''
+    rng = np.random.RandomState(20240601)
+    a = rng.randint(1, 2 ** 32, size=NUM_PERM, dtype=np.uint64)
+    b = rng.randint(0, 2 ** 32, size=NUM_PERM, dtype=np.uint64)
+    Post = apps.get_model('baweb', 'Post')
+    PostLSHBucket = apps.get_model('baweb', 'PostLSHBucket')
+
+    rows = []
+    posts = Post.objects.filter(deletedAt__isnull=True).values_list('id', 'course_id', 'title', 'content')
+    for pk, course_id, title, content in posts.iterator():
+        keys = bucket_keys(title, content, a, b)
+        rows.extend(PostLSHBucket(course_id=course_id, post_id=pk, bucket=key) for key in keys)
+        if len(rows) >= 5000:
+            PostLSHBucket.objects.bulk_create(rows)
+            rows = []
+    PostLSHBucket.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baweb', '0033_post_soft_delete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostLSHBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.BigIntegerField(verbose_name='桶号')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='baweb.Course', verbose_name='所属课程')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lsh_buckets', to='baweb.Post', verbose_name='帖子')),
+            ],
+            options={
+                'verbose_name_plural': '相似检测分桶',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='postlshbucket',
+            index=models.Index(fields=['course', 'bucket'], name='baweb_postl_course__431340_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='postlshbucket',
+            unique_together={('post', 'bucket')},
+        ),
+        migrations.RunPython(backfill_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 2.2.12 on 2026-10-18 17:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_status(apps, schema_editor):
+    '''按已有提交记录生成学生任务状态（规则同 baweb/utils/submission_status.py），分数取每名学生最早的一条记录'''
+    AssignmentSubmit = apps.get_model('baweb', 'AssignmentSubmit')
+    AssignmentStatus = apps.get_model('baweb', 'AssignmentStatus')
+
+    rows = {}
+    for pk, assignment_id, student_id, submit_time, marks, max_marks in (
+            AssignmentSubmit.objects.order_by('id')
+            .values_list('id', 'assignment_id', 'student_id', 'submit_time', 'marks', 'max_marks').iterator()):
+        status = rows.get((assignment_id, student_id))
+        if status is None:
+            rows[assignment_id, student_id] = AssignmentStatus(
+                assignment_id=assignment_id, student_id=student_id, submitted=True, submit_time=submit_time,
+                file_count=1, marks=marks, max_marks=max_marks)
+        else:
+            status.file_count += 1
+            status.submit_time = max(status.submit_time, submit_time)
+    AssignmentStatus.objects.bulk_create(rows.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baweb', '0034_post_lsh_buckets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssignmentStatus',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('submitted', models.BooleanField(default=False, verbose_name='是否已提交')),
+                ('submit_time', models.DateTimeField(blank=True, null=True, verbose_name='最近提交时间')),
+                ('file_count', models.IntegerField(default=0, verbose_name='文件数')),
+                ('marks', models.SmallIntegerField(default=0, verbose_name='获得分数')),
+                ('max_marks', models.SmallIntegerField(default=100, verbose_name='最大分数')),
+                ('assignment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_assignment', to='baweb.Assignment', verbose_name='任务')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assignmentstatus_student', to='baweb.StudentInfo', verbose_name='学生')),
+            ],
+            options={
+                'verbose_name_plural': '学生任务状态',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='assignmentstatus',
+            index=models.Index(fields=['assignment', 'submitted'], name='baweb_assig_assignm_f58378_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assignmentstatus',
+            index=models.Index(fields=['student', 'submitted'], name='baweb_assig_student_598370_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='assignmentstatus',
+            unique_together={('assignment', 'student')},
+        ),
+        migrations.RunPython(backfill_status, migrations.RunPython.noop),
+    ]
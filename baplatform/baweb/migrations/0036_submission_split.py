@@ -0,0 +1,130 @@
+# Generated by Django 2.2.12 on 2026-10-18 17:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_submissions(apps, schema_editor):
+    '''学生任务状态转为 Submission，每条 AssignmentSubmit 转为一条 SubmissionFile（保留主键和提交时间）'''
+    AssignmentStatus = apps.get_model('baweb', 'AssignmentStatus')
+    AssignmentSubmit = apps.get_model('baweb', 'AssignmentSubmit')
+    Submission = apps.get_model('baweb', 'Submission')
+    SubmissionFile = apps.get_model('baweb', 'SubmissionFile')
+
+    Submission.objects.bulk_create(
+        [Submission(id=status.id, assignment_id=status.assignment_id, student_id=status.student_id,
+                    submitted=status.submitted, submit_time=status.submit_time, file_count=status.file_count,
+                    marks=status.marks, max_marks=status.max_marks)
+         for status in AssignmentStatus.objects.iterator()], batch_size=500)
+    submissions = {(assignment_id, student_id): pk for pk, assignment_id, student_id
+                   in Submission.objects.values_list('id', 'assignment_id', 'student_id')}
+
+    files = []
+    times = []
+    for row in AssignmentSubmit.objects.order_by('id').iterator():
+        key = (row.assignment_id, row.student_id)
+        if key not in submissions:
+            submissions[key] = Submission.objects.create(
+                assignment_id=row.assignment_id, student_id=row.student_id, submitted=True,
+                submit_time=row.submit_time, file_count=1, marks=row.marks, max_marks=row.max_marks).pk
+        files.append(SubmissionFile(id=row.id, submission_id=submissions[key], file=row.file,
+                                    file_name=row.file_name))
+        times.append(row.submit_time)
+    SubmissionFile.objects.bulk_create(files, batch_size=500)
+    # submit_time 是 auto_now，bulk_create 时会写入当前时间，再用 bulk_update（不经过 auto_now）写回原值
+    for file, submit_time in zip(files, times):
+        file.submit_time = submit_time
+    SubmissionFile.objects.bulk_update(files, ['submit_time'], batch_size=500)
+
+
+def restore_submissions(apps, schema_editor):
+    '''copy_submissions 的逆操作：Submission 写回 AssignmentStatus，每条 SubmissionFile 写回一条 AssignmentSubmit
+    （分数取所属提交行的分数）'''
+    AssignmentStatus = apps.get_model('baweb', 'AssignmentStatus')
+    AssignmentSubmit = apps.get_model('baweb', 'AssignmentSubmit')
+    Submission = apps.get_model('baweb', 'Submission')
+    SubmissionFile = apps.get_model('baweb', 'SubmissionFile')
+
+    AssignmentStatus.objects.bulk_create(
+        [AssignmentStatus(id=submission.id, assignment_id=submission.assignment_id,
+                          student_id=submission.student_id, submitted=submission.submitted,
+                          submit_time=submission.submit_time, file_count=submission.file_count,
+                          marks=submission.marks, max_marks=submission.max_marks)
+         for submission in Submission.objects.iterator()], batch_size=500)
+
+    rows = []
+    times = []
+    for file in SubmissionFile.objects.select_related('submission').order_by('id').iterator():
+        submission = file.submission
+        rows.append(AssignmentSubmit(id=file.id, assignment_id=submission.assignment_id,
+                                     student_id=submission.student_id, file=file.file, file_name=file.file_name,
+                                     marks=submission.marks, max_marks=submission.max_marks))
+        times.append(file.submit_time)
+    AssignmentSubmit.objects.bulk_create(rows, batch_size=500)
+    # 同 copy_submissions，submit_time 用 bulk_update 写回原值
+    for row, submit_time in zip(rows, times):
+        row.submit_time = submit_time
+    AssignmentSubmit.objects.bulk_update(rows, ['submit_time'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baweb', '0035_assignment_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Submission',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('submitted', models.BooleanField(default=False, verbose_name='是否已提交')),
+                ('submit_time', models.DateTimeField(blank=True, null=True, verbose_name='最近提交时间')),
+                ('file_count', models.IntegerField(default=0, verbose_name='文件数')),
+                ('marks', models.SmallIntegerField(default=0, verbose_name='获得分数')),
+                ('max_marks', models.SmallIntegerField(default=100, verbose_name='最大分数')),
+                ('assignment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submission_assignment', to='baweb.Assignment', verbose_name='所提交的任务')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submission_student', to='baweb.StudentInfo', verbose_name='学生')),
+            ],
+            options={
+                'verbose_name_plural': '学生提交',
+            },
+        ),
+        migrations.CreateModel(
+            name='SubmissionFile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='submission/', verbose_name='任务文档')),
+                ('file_name', models.CharField(blank=True, default=None, max_length=64, verbose_name='文档名')),
+                ('submit_time', models.DateTimeField(auto_now=True)),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='files', to='baweb.Submission', verbose_name='所属提交')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['assignment', 'submitted'], name='baweb_submi_assignm_27b721_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['student', 'submitted'], name='baweb_submi_student_490ea4_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='submission',
+            unique_together={('assignment', 'student')},
+        ),
+        migrations.RunPython(copy_submissions, restore_submissions),
+        migrations.RemoveField(
+            model_name='assignmentsubmit',
+            name='assignment',
+        ),
+        migrations.RemoveField(
+            model_name='assignmentsubmit',
+            name='student',
+        ),
+        migrations.DeleteModel(
+            name='AssignmentStatus',
+        ),
+        migrations.DeleteModel(
+            name='AssignmentSubmit',
+        ),
+    ]
@@ -122,14 +122,29 @@ class StudentCourse(models.Model):
     student = models.ForeignKey(StudentInfo, verbose_name='选课学生', on_delete=models.CASCADE, related_name='course_student')
     course = models.ForeignKey(Course, verbose_name='被选课程', on_delete=models.CASCADE, related_name='student_course')
     
-class AssignmentSubmit(models.Model):
-    '''学生提交任务'''
-    student = models.ForeignKey(StudentInfo, verbose_name='学生', on_delete=models.CASCADE, related_name='assignmentsubmit_student')
-    assignment = models.ForeignKey(Assignment, verbose_name='所提交的任务', on_delete=models.CASCADE, related_name='submit_assignment')
-    file = models.FileField(verbose_name='任务文档', upload_to="submission/")
-    file_name = models.CharField(verbose_name='文档名', max_length=64 ,default=file.name, blank=True)
+class Submission(models.Model):
+    '''学生提交任务（每个学生每个任务一行，保存分数和文件汇总，见 baweb/utils/submission_status.py）'''
+    assignment = models.ForeignKey(Assignment, verbose_name='所提交的任务', on_delete=models.CASCADE, related_name='submission_assignment')
+    student = models.ForeignKey(StudentInfo, verbose_name='学生', on_delete=models.CASCADE, related_name='submission_student')
+    submitted = models.BooleanField(verbose_name='是否已提交', default=False)
+    submit_time = models.DateTimeField(verbose_name='最近提交时间', null=True, blank=True)
+    file_count = models.IntegerField(verbose_name='文件数', default=0)
     marks = models.SmallIntegerField(verbose_name='获得分数', default=0)
     max_marks = models.SmallIntegerField(verbose_name='最大分数', default=100)
+
+    class Meta:
+        unique_together = ('assignment', 'student')
+        indexes = [
+            models.Index(fields=['assignment', 'submitted']),
+            models.Index(fields=['student', 'submitted']),
+        ]
+        verbose_name_plural = '学生提交'
+
+class SubmissionFile(models.Model):
+    '''学生提交的文件'''
+    submission = models.ForeignKey(Submission, verbose_name='所属提交', on_delete=models.CASCADE, related_name='files')
+    file = models.FileField(verbose_name='任务文档', upload_to="submission/")
+    file_name = models.CharField(verbose_name='文档名', max_length=64 ,default=file.name, blank=True)
     submit_time = models.DateTimeField(auto_now=True)
 
     def __str__(self):
@@ -187,6 +202,13 @@ class ContentCategory(models.Model):
         return self.get_name_display()
 
 
+class PostManager(models.Manager):
+    '''默认只返回未删除的帖子（查询条件 deletedAt IS NULL 与部分索引的条件一致）'''
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deletedAt__isnull=True)
+
+
 class Post(models.Model):
     '''帖子/讨论表'''
     # 基本属性
@@ -215,32 +237,56 @@ class Post(models.Model):
     
     # 热度计算
     heatScore = models.FloatField(verbose_name='热度分数', default=0.0, db_index=True)
+    hotScore = models.FloatField(verbose_name='热门分数', default=0.0, help_text='与时间无关，排序无需定期重算')
     
     # AI向量嵌入（可选，用于向量搜索和推荐）
     embedding = models.BinaryField(verbose_name='内容嵌入向量', null=True, blank=True, 
                                    help_text='768维向量，用于智能推荐和语义搜索')
+    embeddedAt = models.DateTimeField(verbose_name='嵌入时间', null=True, blank=True, db_index=True,
+                                      help_text='生成嵌入时帖子的 updatedAt，为空或早于 updatedAt 时需要重新生成')
+    
+    # 软删除：删帖时只标记，关联数据由 purge_deleted_posts 分批清理
+    deletedAt = models.DateTimeField(verbose_name='删除时间', null=True, blank=True)
+
+    objects = PostManager()
+    # 包含已删除帖子，仅供清理任务使用
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ['-heatScore', '-createdAt']
         indexes = [
-            models.Index(fields=['course', '-heatScore']),
-            models.Index(fields=['-createdAt']),
+            # 与 baweb/utils/keyset.py 中的排序键一致，游标分页可直接在索引上范围扫描；
+            # 只索引未删除的帖子，列表查询的 deletedAt IS NULL 条件不需要回表过滤
+            models.Index(fields=['course', '-heatScore', '-createdAt'], name='post_live_course_heat',
+                         condition=models.Q(deletedAt__isnull=True)),
+            models.Index(fields=['course', '-hotScore'], name='post_live_course_hot',
+                         condition=models.Q(deletedAt__isnull=True)),
+            models.Index(fields=['course', '-createdAt'], name='post_live_course_newest',
+                         condition=models.Q(deletedAt__isnull=True)),
+            models.Index(fields=['course', '-viewCount'], name='post_live_course_popular',
+                         condition=models.Q(deletedAt__isnull=True)),
+            models.Index(fields=['-createdAt'], name='post_live_newest', condition=models.Q(deletedAt__isnull=True)),
             models.Index(fields=['author']),
+            # 待清理的帖子
+            models.Index(fields=['deletedAt'], name='post_deleted', condition=models.Q(deletedAt__isnull=False)),
         ]
 
     def __str__(self):
         return self.title
 
-    def calculateFreshness(self):
+    def calculateFreshness(self, now=None):
         '''计算新鲜度得分（时间衰减）
         
+        Args:
+            now (datetime): 计算基准时间，默认为当前时间
+        
         Returns:
             float: 0-100 之间的新鲜度分数，越接近100表示越新
         '''
         from django.utils import timezone
-        from datetime import timedelta
         
-        time_diff = (timezone.now() - self.createdAt).total_seconds()
+        now = now or timezone.now()
+        time_diff = (now - self.createdAt).total_seconds()
         # 7天内为最新，7天后开始衰减
         max_age_seconds = 7 * 24 * 3600
         
@@ -251,31 +297,54 @@ class Post(models.Model):
         
         return max(0, min(100, freshness))
 
-    def calculateHeat(self):
+    def calculateHeat(self, now=None):
         '''计算帖子热度
         
         热度算法：
         - 互动权重 70%：(点赞 + 评论*2 + 收藏*3) / (时间衰减)
         - 时间权重 30%：新鲜度分数
         
+        批量重算见 baweb/utils/heat.py，两处公式需保持一致
+        
+        Args:
+            now (datetime): 计算基准时间，默认为当前时间
+        
         Returns:
             float: 热度分数
         '''
         import math
+        from django.utils import timezone
+        
+        now = now or timezone.now()
         
         # 交互量权重：70%
         interaction_score = self.likeCount + self.commentCount * 2 + self.collectCount * 3
-        freshness = self.calculateFreshness()
+        freshness = self.calculateFreshness(now)
         
         # 时间衰减因子
-        from django.utils import timezone
-        time_diff_days = (timezone.now() - self.createdAt).days + 1
+        time_diff_days = (now - self.createdAt).days + 1
         time_decay = 1.0 / math.log(time_diff_days + 1) if time_diff_days > 0 else 1.0
         
         # 综合热度计算
         heat = (interaction_score * time_decay * 0.7) + (freshness * 0.3)
         return max(0, heat)
 
+    def calculateHot(self):
+        '''计算热门分数（Reddit 式，与当前时间无关）
+        
+        热门分数 = log10(互动量) + 发帖时间戳 / 45000
+        - 发帖越晚分数越高，新帖自然排在前面
+        - 互动量每增加 10 倍，相当于晚发 12.5 小时
+        分数只在互动变化时改变，排序不会随时间失效，无需批量重算
+        
+        Returns:
+            float: 热门分数
+        '''
+        import math
+        
+        interaction_score = self.likeCount + self.commentCount * 2 + self.collectCount * 3
+        return math.log10(max(interaction_score, 1)) + self.createdAt.timestamp() / 45000
+
     def updateContent(self, new_title=None, new_content=None, new_category=None, new_tags=None):
         '''更新帖子内容
         
@@ -336,12 +405,116 @@ class PostCollect(models.Model):
 
     class Meta:
         unique_together = ('post', 'user')  # 防止重复收藏
+        indexes = [
+            models.Index(fields=['user', '-createdAt']),  # 我的收藏
+        ]
         verbose_name_plural = '帖子收藏'
 
     def __str__(self):
         return f"{self.user.username} collected {self.post.title}"
 
 
+class Tag(models.Model):
+    '''标签表（由 Post.tags 规范化而来，见 baweb/utils/tags.py）'''
+    name = models.CharField(verbose_name='标签名', max_length=64, unique=True)
+
+    class Meta:
+        verbose_name_plural = '标签'
+
+    def __str__(self):
+        return self.name
+
+
+class PostTag(models.Model):
+    '''帖子-标签关联表'''
+    post = models.ForeignKey(Post, verbose_name='帖子', on_delete=models.CASCADE, related_name='post_tags')
+    tag = models.ForeignKey(Tag, verbose_name='标签', on_delete=models.CASCADE, related_name='tag_posts')
+
+    class Meta:
+        unique_together = ('post', 'tag')
+        indexes = [
+            models.Index(fields=['tag', 'post']),
+        ]
+        verbose_name_plural = '帖子标签'
+
+
+class CourseTag(models.Model):
+    '''课程内各标签的帖子数（发帖、编辑、删帖时增量维护，读取时不再统计）'''
+    course = models.ForeignKey(Course, verbose_name='课程', on_delete=models.CASCADE, related_name='course_tags')
+    tag = models.ForeignKey(Tag, verbose_name='标签', on_delete=models.CASCADE, related_name='+')
+    postCount = models.IntegerField(verbose_name='帖子数', default=0)
+
+    class Meta:
+        unique_together = ('course', 'tag')
+        indexes = [
+            models.Index(fields=['course', '-postCount']),
+        ]
+        verbose_name_plural = '课程标签'
+
+    def __str__(self):
+        return f"{self.course.name} {self.tag.name}"
+
+
+class PostActivity(models.Model):
+    '''帖子每小时互动量（趋势统计的时间桶，见 baweb/utils/trending.py）'''
+    course = models.ForeignKey(Course, verbose_name='课程', on_delete=models.CASCADE, related_name='+')
+    post = models.ForeignKey(Post, verbose_name='帖子', on_delete=models.CASCADE, related_name='activities')
+    hour = models.DateTimeField(verbose_name='小时')
+    score = models.IntegerField(verbose_name='互动量', default=0)
+
+    class Meta:
+        unique_together = ('post', 'hour')
+        indexes = [
+            models.Index(fields=['course', 'hour']),
+        ]
+        verbose_name_plural = '帖子互动趋势'
+
+
+class TagActivity(models.Model):
+    '''标签每小时互动量（标签下帖子的互动之和）'''
+    course = models.ForeignKey(Course, verbose_name='课程', on_delete=models.CASCADE, related_name='+')
+    tag = models.ForeignKey(Tag, verbose_name='标签', on_delete=models.CASCADE, related_name='+')
+    hour = models.DateTimeField(verbose_name='小时')
+    score = models.IntegerField(verbose_name='互动量', default=0)
+
+    class Meta:
+        unique_together = ('course', 'tag', 'hour')
+        indexes = [
+            models.Index(fields=['course', 'hour']),
+        ]
+        verbose_name_plural = '标签互动趋势'
+
+
+class RelatedPost(models.Model):
+    '''相关帖子表（由嵌入向量预先计算的同课程近邻，见 baweb/utils/related.py）'''
+    post = models.ForeignKey(Post, verbose_name='帖子', on_delete=models.CASCADE, related_name='related_posts')
+    related = models.ForeignKey(Post, verbose_name='相关帖子', on_delete=models.CASCADE, related_name='+')
+    rank = models.SmallIntegerField(verbose_name='排名')
+    score = models.FloatField(verbose_name='相似度')
+
+    class Meta:
+        unique_together = ('post', 'rank')
+        ordering = ['post', 'rank']
+        verbose_name_plural = '相关帖子'
+
+    def __str__(self):
+        return f"{self.post.title} -> {self.related.title}"
+
+
+class PostLSHBucket(models.Model):
+    '''帖子 MinHash 签名的 LSH 分桶（用于发帖时的相似问题检测，见 baweb/utils/duplicates.py）'''
+    course = models.ForeignKey(Course, verbose_name='所属课程', on_delete=models.CASCADE, related_name='+')
+    post = models.ForeignKey(Post, verbose_name='帖子', on_delete=models.CASCADE, related_name='lsh_buckets')
+    bucket = models.BigIntegerField(verbose_name='桶号')
+
+    class Meta:
+        unique_together = ('post', 'bucket')
+        indexes = [
+            models.Index(fields=['course', 'bucket']),
+        ]
+        verbose_name_plural = '相似检测分桶'
+
+
 class PostComment(models.Model):
     '''帖子评论表'''
     commentId = models.CharField(verbose_name='评论ID', max_length=64, unique=True, db_index=True)
@@ -354,6 +527,11 @@ class PostComment(models.Model):
     # 支持评论回复
     parentComment = models.ForeignKey('self', verbose_name='父评论', on_delete=models.CASCADE, 
                                       null=True, blank=True, related_name='replies')
+    # 物化路径：从根评论到本评论的 id（各 10 位补零，以 / 结尾），按 path 排序即为楼中楼的先序遍历
+    rootComment = models.ForeignKey('self', verbose_name='根评论', on_delete=models.CASCADE,
+                                    null=True, blank=True, related_name='+')
+    path = models.CharField(verbose_name='评论路径', max_length=255, blank=True, default='')
+    depth = models.SmallIntegerField(verbose_name='回复层级', default=0)
     
     createdAt = models.DateTimeField(verbose_name='创建时间', auto_now_add=True)
     updatedAt = models.DateTimeField(verbose_name='更新时间', auto_now=True)
@@ -365,15 +543,27 @@ class PostComment(models.Model):
         indexes = [
             models.Index(fields=['post', '-createdAt']),
             models.Index(fields=['author']),
+            models.Index(fields=['rootComment', 'path']),
         ]
 
     def __str__(self):
         return f"Comment by {self.author.username} on {self.post.title}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if not self.path:
+            # 路径包含自身 id，插入后才能确定
+            parent = self.parentComment
+            self.path = (parent.path if parent else '') + '{:010d}/'.format(self.pk)
+            self.depth = parent.depth + 1 if parent else 0
+            self.rootComment_id = parent.rootComment_id if parent else self.pk
+            PostComment.objects.filter(pk=self.pk).update(
+                path=self.path, depth=self.depth, rootComment_id=self.rootComment_id)
+
     def like(self):
-        '''点赞评论'''
-        self.likeCount += 1
-        self.save()
+        '''点赞评论（数据库端原子自增）'''
+        PostComment.objects.filter(pk=self.pk).update(likeCount=models.F('likeCount') + 1)
+        self.refresh_from_db(fields=['likeCount'])
 
     def reply(self, reply_content, reply_author, is_anonymous=False):
         '''回复评论
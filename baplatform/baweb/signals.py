@@ -0,0 +1,47 @@
+"""
+模型信号
+帖子内容变化时同步派生数据（全文索引、标签、相似检测分桶、向量索引、排行缓存等）
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from baweb import models
+from baweb.utils import duplicates, embedding_pipeline, leaderboard, related, search, tags, vector_index
+
+POST_TEXT_FIELDS = {'title', 'content', 'tags'}
+POST_RANK_FIELDS = {'heatScore', 'hotScore', 'viewCount'}
+
+
+@receiver(post_save, sender=models.Post)
+def post_saved(sender, instance, created=False, update_fields=None, **kwargs):
+    # 只更新计数、热度等字段时不需要重建索引
+    if update_fields is None or POST_TEXT_FIELDS & set(update_fields):
+        search.index_post(instance)
+        tags.sync_post(instance)
+        duplicates.index_post(instance)
+        # 嵌入由 embed_posts 批量生成，新帖的 embeddedAt 本来就为空
+        if not created:
+            embedding_pipeline.enqueue(instance)
+    if update_fields is None or POST_RANK_FIELDS & set(update_fields):
+        # 排行缓存不随事务回滚，提交后再更新
+        transaction.on_commit(lambda: leaderboard.post_changed(instance))
+
+
+@receiver(pre_delete, sender=models.Post)
+def post_deleting(sender, instance, **kwargs):
+    tags.remove_post(instance)
+    # 删除时会级联删掉指向该帖子的相关帖子记录，先记下哪些帖子的列表需要补齐
+    instance._related_referrers = list(
+        models.RelatedPost.objects.filter(related=instance).values_list('post_id', flat=True))
+
+
+@receiver(post_delete, sender=models.Post)
+def post_deleted(sender, instance, **kwargs):
+    search.remove_post(instance.pk)
+    vector_index.remove_post(instance)
+    transaction.on_commit(lambda: leaderboard.post_removed(instance))
+    referrers = getattr(instance, '_related_referrers', [])
+    if referrers:
+        related.refresh(instance.course_id, referrers)
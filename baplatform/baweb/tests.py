@@ -1,3 +1,1590 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+from uuid import uuid4
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from baweb import models
+from baweb.utils import (cjk, comment_tree, counters, duplicates, embedding, embedding_pipeline, events, gradebook,
+                         heat, interactions, keyset, leaderboard, minhash, purge, reconcile, related, search,
+                         submission_status, tags, trending, user_state, vector_index, viewcount)
+from baweb.views import assignment as assignment_views, assignmentfile, course as course_views, forum
+
+
+# 删除帖子、语义检索等会读写向量索引目录，测试期间指向临时目录，不污染开发环境的索引
+_vector_dir = None
+_vector_override = None
+
+
+def setUpModule():
+    global _vector_dir, _vector_override
+    _vector_dir = tempfile.mkdtemp()
+    _vector_override = override_settings(FORUM_VECTOR_DIR=_vector_dir)
+    _vector_override.enable()
+
+
+def tearDownModule():
+    _vector_override.disable()
+    shutil.rmtree(_vector_dir, ignore_errors=True)
+
+
+def use_temp_vector_dir(testcase):
+    '''每个用例使用独立的向量索引目录，避免读到其他用例（已回滚）帖子的向量'''
+    directory = tempfile.mkdtemp()
+    testcase.addCleanup(shutil.rmtree, directory)
+    override = override_settings(FORUM_VECTOR_DIR=directory)
+    override.enable()
+    testcase.addCleanup(override.disable)
+    return directory
+
+
+def make_user(username, type=1):
+    return models.User.objects.create(username=username, password='x', type=type)
+
+
+def make_course(name='商务数据分析'):
+    teacher = models.TeacherInfo.objects.create(user=make_user('t_' + name, type=2), name='老师')
+    return models.Course.objects.create(name=name, teacher=teacher)
+
+
+def make_post(course, author, **kwargs):
+    kwargs.setdefault('title', '帖子')
+    kwargs.setdefault('content', '内容')
+    return models.Post.objects.create(postId=str(uuid4()), course=course, author=author, **kwargs)
+
+
+def forum_request(method, user=None, data=None):
+    '''构造带 session 的请求，直接调用论坛视图'''
+    factory = RequestFactory()
+    request = getattr(factory, method)('/', data or {})
+    request.session = {'info': {'id': user.id, 'name': user.username}} if user else {}
+    return request
+
+
+class PostCounterTests(TestCase):
+    def setUp(self):
+        self.course = make_course()
+        self.user = make_user('2020001')
+        self.post = make_post(self.course, self.user)
+
+    def test_like_toggle_returns_fresh_counts(self):
+        res = json.loads(forum.post_like(forum_request('post', self.user), self.post.postId).content)
+        self.assertEqual(res['action'], 'like')
+        self.assertEqual(res['like_count'], 1)
+
+        # 其他请求修改过的计数不会被覆盖
+        models.Post.objects.filter(pk=self.post.pk).update(likeCount=10)
+        res = json.loads(forum.post_like(forum_request('post', self.user), self.post.postId).content)
+        self.assertEqual(res['action'], 'unlike')
+        self.assertEqual(res['like_count'], 9)
+
+    def test_counter_never_negative(self):
+        result = counters.incr_post(self.post, collectCount=-1)
+        self.assertEqual(result['collect_count'], 0)
+
+    def test_comment_add_and_delete(self):
+        res = json.loads(forum.comment_add(forum_request('post', self.user, {'content': '评论'}), self.post.postId).content)
+        self.assertEqual(res['comment_count'], 1)
+        comment = models.PostComment.objects.get(post=self.post)
+        res = json.loads(forum.comment_delete(forum_request('post', self.user), comment.commentId).content)
+        self.assertEqual(res['comment_count'], 0)
+
+    def test_comment_delete_counts_cascaded_replies(self):
+        forum.comment_add(forum_request('post', self.user, {'content': '评论'}), self.post.postId)
+        root = models.PostComment.objects.get(post=self.post)
+        root.reply('回复', self.user).reply('再回复', self.user)
+        counters.incr_post(self.post, commentCount=2)
+        res = json.loads(forum.comment_delete(forum_request('post', self.user), root.commentId).content)
+        self.assertEqual(res['comment_count'], 0)
+
+    def test_increment_does_not_rewrite_other_columns(self):
+        models.Post.objects.filter(pk=self.post.pk).update(title='新标题')
+        counters.incr_post(self.post, likeCount=1)
+        self.assertEqual(models.Post.objects.get(pk=self.post.pk).title, '新标题')
+
+
+class PostCounterConcurrencyTests(TransactionTestCase):
+    threads = 8
+    rounds = 20
+
+    def test_concurrent_increments_are_not_lost(self):
+        course = make_course()
+        users = [make_user('s{}'.format(i)) for i in range(self.threads)]
+        post = make_post(course, users[0])
+        errors = []
+
+        def worker(user):
+            try:
+                # 每个线程持有自己的过期对象，模拟并发请求
+                stale = models.Post.objects.get(pk=post.pk)
+                for _ in range(self.rounds):
+                    counters.incr_post(stale, update_heat=False, viewCount=1)
+                forum.post_like(forum_request('post', user), post.postId)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(user,)) for user in users]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+
+        self.assertEqual(errors, [])
+        post.refresh_from_db()
+        self.assertEqual(post.viewCount, self.threads * self.rounds)
+        self.assertEqual(post.likeCount, self.threads)
+        self.assertEqual(models.PostLike.objects.filter(post=post).count(), self.threads)
+
+    def test_concurrent_duplicate_likes_are_idempotent(self):
+        course = make_course()
+        user = make_user('2020001')
+        post = make_post(course, user)
+        errors = []
+
+        def worker():
+            try:
+                # 同一用户重复提交：批量接口设置为已点赞，不会违反唯一约束
+                forum.interactions_batch(batch_request(user, [{'postId': post.postId, 'like': True}]))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(self.threads)]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+
+        self.assertEqual(errors, [])
+        post.refresh_from_db()
+        self.assertEqual(post.likeCount, 1)
+        self.assertEqual(models.PostLike.objects.filter(post=post).count(), 1)
+
+
+@override_settings(FORUM_VIEW_FLUSH_HITS=100, FORUM_VIEW_FLUSH_INTERVAL=3600, FORUM_VIEW_DEDUP_SECONDS=0)
+class ViewBufferTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = make_course()
+        self.user = make_user('2020001')
+        self.posts = [make_post(self.course, self.user) for _ in range(3)]
+
+    def test_views_are_buffered_then_flushed_in_batches(self):
+        for post, hits in zip(self.posts, (2, 2, 5)):
+            for _ in range(hits):
+                viewcount.record_view(forum_request('get', self.user), post)
+        self.assertEqual(models.Post.objects.get(pk=self.posts[2].pk).viewCount, 0)
+        self.assertEqual(viewcount.pending(self.posts[2].pk), 5)
+
+        # 增量相同的帖子合并为一条 UPDATE
+        with self.assertNumQueries(4):  # SAVEPOINT + 2 条 UPDATE + RELEASE
+            self.assertEqual(viewcount.flush(), 9)
+        self.assertEqual([p.viewCount for p in models.Post.objects.order_by('id')], [2, 2, 5])
+        self.assertEqual(viewcount.pending(self.posts[2].pk), 0)
+        self.assertEqual(viewcount.flush(), 0)
+
+    def test_views_below_threshold_do_not_write(self):
+        with self.assertNumQueries(0):
+            for _ in range(99):
+                viewcount.record_view(forum_request('get', self.user), self.posts[0])
+        self.assertEqual(viewcount.pending(self.posts[0].pk), 99)
+
+    @override_settings(FORUM_VIEW_FLUSH_HITS=3)
+    def test_flush_after_n_hits(self):
+        for _ in range(3):
+            viewcount.record_view(forum_request('get', self.user), self.posts[0])
+        self.assertEqual(models.Post.objects.get(pk=self.posts[0].pk).viewCount, 3)
+        self.assertEqual(viewcount.pending(self.posts[0].pk), 0)
+        # 写回后重新计数
+        viewcount.record_view(forum_request('get', self.user), self.posts[0])
+        self.assertEqual(models.Post.objects.get(pk=self.posts[0].pk).viewCount, 3)
+
+    @override_settings(FORUM_VIEW_FLUSH_INTERVAL=60)
+    def test_flush_after_interval(self):
+        viewcount.record_view(forum_request('get', self.user), self.posts[0])
+        self.assertEqual(models.Post.objects.get(pk=self.posts[0].pk).viewCount, 0)
+        cache.set(viewcount.LAST_FLUSH_KEY, time.time() - 61, None)
+        viewcount.record_view(forum_request('get', self.user), self.posts[1])
+        self.assertEqual([p.viewCount for p in models.Post.objects.order_by('id')], [1, 1, 0])
+
+    def test_views_after_flush_are_marked_again(self):
+        viewcount.record_view(forum_request('get', self.user), self.posts[0])
+        self.assertEqual(viewcount.flush(), 1)
+        viewcount.record_view(forum_request('get', self.user), self.posts[0])
+        self.assertEqual(viewcount.flush(), 1)
+        self.assertEqual(models.Post.objects.get(pk=self.posts[0].pk).viewCount, 2)
+
+    def test_unwritten_slot_is_skipped_on_second_flush(self):
+        # 另一个进程分配了槽号但还没写入槽
+        cache.set(viewcount.HEAD_KEY, 1, None)
+        viewcount.record_view(forum_request('get', self.user), self.posts[0])
+        self.assertEqual(viewcount.flush(), 0)
+        self.assertEqual(viewcount.flush(), 1)
+        self.assertEqual(models.Post.objects.get(pk=self.posts[0].pk).viewCount, 1)
+
+    @override_settings(FORUM_VIEW_DEDUP_SECONDS=60)
+    def test_repeat_views_in_window_are_dropped(self):
+        other = make_user('2020002')
+        self.assertTrue(viewcount.record_view(forum_request('get', self.user), self.posts[0]))
+        self.assertFalse(viewcount.record_view(forum_request('get', self.user), self.posts[0]))
+        self.assertTrue(viewcount.record_view(forum_request('get', other), self.posts[0]))
+        self.assertEqual(viewcount.pending(self.posts[0].pk), 2)
+
+
+@override_settings(FORUM_VIEW_FLUSH_HITS=6, FORUM_VIEW_FLUSH_INTERVAL=3600, FORUM_VIEW_DEDUP_SECONDS=0)
+class ViewBufferLockTests(TransactionTestCase):
+    def test_reads_do_not_take_write_lock(self):
+        cache.clear()
+        user = make_user('2020001')
+        post = make_post(make_course(), user)
+
+        # 另一个连接持有 SQLite 写锁
+        writer = sqlite3.connect(connection.settings_dict['NAME'], isolation_level=None, timeout=0)
+        writer.execute('BEGIN IMMEDIATE')
+        try:
+            for _ in range(5):
+                viewed = models.Post.objects.get(postId=post.postId)
+                viewcount.record_view(forum_request('get', user), viewed)
+        finally:
+            writer.execute('ROLLBACK')
+            writer.close()
+
+        post.refresh_from_db()
+        self.assertEqual(post.viewCount, 0)
+        # 第 6 次浏览在本进程内触发写回
+        viewcount.record_view(forum_request('get', user), post)
+        post.refresh_from_db()
+        self.assertEqual(post.viewCount, 6)
+
+
+class HeatRecomputeTests(TestCase):
+    def test_vectorized_heat_matches_model(self):
+        course = make_course()
+        user = make_user('2020001')
+        now = timezone.now()
+        ages = [timedelta(0), timedelta(hours=5), timedelta(days=1), timedelta(days=7),
+                timedelta(days=7, seconds=1), timedelta(days=20), timedelta(days=45), timedelta(days=-1)]
+        for i, age in enumerate(ages):
+            post = make_post(course, user, likeCount=i * 3, commentCount=i, collectCount=i % 3)
+            models.Post.objects.filter(pk=post.pk).update(createdAt=now - age)
+
+        total, _ = heat.recompute_all(chunk_size=3, now=now)
+        self.assertEqual(total, len(ages))
+        for post in models.Post.objects.all():
+            self.assertAlmostEqual(post.heatScore, post.calculateHeat(now), places=9)
+
+    def test_command_reports_throughput(self):
+        make_post(make_course(), make_user('2020001'))
+        out = StringIO()
+        call_command('recompute_heat', stdout=out)
+        self.assertIn('篇/秒', out.getvalue())
+
+
+class HotScoreTests(TestCase):
+    def test_hot_score_follows_interactions_without_decay(self):
+        course = make_course()
+        user = make_user('2020001')
+        old = make_post(course, user)
+        new = make_post(course, user)
+        models.Post.objects.filter(pk=old.pk).update(createdAt=timezone.now() - timedelta(hours=25))
+        old.refresh_from_db()
+
+        # 早发 25 小时的帖子需要超过 100 倍的互动量才能排到前面
+        counters.incr_post(old, likeCount=99)
+        counters.incr_post(new, likeCount=0)
+        self.assertLess(old.hotScore, new.hotScore)
+        counters.incr_post(old, likeCount=2)
+        self.assertGreater(old.hotScore, new.hotScore)
+
+        forum.post_like(forum_request('post', user), new.postId)
+        new.refresh_from_db()
+        self.assertAlmostEqual(new.hotScore, new.calculateHot())
+        ordered = models.Post.objects.filter(course=course).order_by('-hotScore', '-id')
+        self.assertEqual(list(ordered), [old, new])
+
+
+class PostSearchTests(TestCase):
+    def setUp(self):
+        self.course = make_course()
+        self.user = make_user('2020001')
+        self.ml = make_post(self.course, self.user, title='机器学习入门', content='监督学习和无监督学习的区别是什么？')
+        self.db = make_post(self.course, self.user, title='数据库作业', content='SQL 语句中如何使用机器学习的结果？')
+        self.other = make_post(self.course, self.user, title='期末考试', content='考试范围', tags='复习,Python')
+
+    def search(self, keyword):
+        return list(search.search(models.Post.objects.filter(course=self.course), keyword))
+
+    def test_bigram_match_and_bm25_ranking(self):
+        self.assertTrue(search.available())
+        # 标题命中的帖子排在前面
+        self.assertEqual(self.search('机器学习'), [self.ml, self.db])
+        self.assertEqual(self.search('学习 区别'), [self.ml])
+        self.assertEqual(self.search('python'), [self.other])
+        self.assertEqual(self.search('器学习'), [self.ml, self.db])
+        self.assertEqual(self.search('学机'), [])
+
+    def test_snippet_highlight(self):
+        post = search.highlight(self.search('无监督'), '无监督')[0]
+        self.assertIn('<mark>无监督</mark>', post.search_snippet)
+        self.assertEqual(cjk.restore('机器 \x02器学 学习\x03 <b>'), '机<mark>器学习</mark> &lt;b&gt;')
+
+    def test_index_follows_update_and_delete(self):
+        self.other.updateContent(new_title='线性回归')
+        self.assertEqual(self.search('回归'), [self.other])
+        self.assertEqual(self.search('期末'), [])
+        self.other.delete()
+        self.assertEqual(self.search('回归'), [])
+
+
+class VectorIndexTests(TestCase):
+    def setUp(self):
+        use_temp_vector_dir(self)
+        self.course = make_course()
+        self.user = make_user('2020001')
+
+    def test_hashing_embedder_is_deterministic(self):
+        vectors = embedding.HashingEmbedder().embed(['机器学习入门', '机器学习入门', ''])
+        self.assertEqual(vectors.shape, (3, embedding.DIM))
+        self.assertEqual(vectors.dtype, np.float32)
+        np.testing.assert_array_equal(vectors[0], vectors[1])
+        self.assertAlmostEqual(float(np.linalg.norm(vectors[0])), 1.0, places=5)
+        self.assertFalse(vectors[2].any())
+
+    def test_packed_formats(self):
+        vector = embedding.HashingEmbedder().embed(['机器学习入门'])[0]
+        packed = embedding.encode(vector)
+        self.assertEqual(len(packed), embedding.DIM + 5)
+        np.testing.assert_allclose(embedding.decode(packed), vector, atol=np.abs(vector).max() / 127)
+        half = embedding.encode(vector, 'float16')
+        self.assertEqual(len(half), embedding.DIM * 2 + 1)
+        np.testing.assert_allclose(embedding.decode(half), vector, atol=1e-3)
+        # 早期不带格式标记的 float32
+        np.testing.assert_array_equal(embedding.decode(vector.tobytes()), vector)
+
+    def test_index_updates_incrementally(self):
+        index = vector_index.VectorIndex(self.course.id)
+        post = make_post(self.course, self.user, title='机器学习入门')
+        embedding_pipeline.run()
+        ids = np.load(index.ids_path)
+        self.assertEqual(list(ids[ids >= 0]), [post.id])
+        post.refresh_from_db()
+        self.assertEqual(len(embedding.decode(post.embedding)), embedding.DIM)
+
+        # 编辑只改写原来的行
+        post.updateContent(new_title='线性回归')
+        embedding_pipeline.run()
+        ids = np.load(index.ids_path)
+        self.assertEqual(list(ids[ids >= 0]), [post.id])
+        query = embedding.get_embedder().embed(['线性回归'])
+        self.assertEqual(index.search(query, 1)[0][0][0], post.id)
+
+        # 删除后空出的行被新帖复用
+        slot = int(np.flatnonzero(ids == post.id)[0])
+        post.delete()
+        self.assertEqual(index.search(query, 5), [[]])
+        reused = make_post(self.course, self.user, title='决策树')
+        embedding_pipeline.run()
+        self.assertEqual(int(np.flatnonzero(np.load(index.ids_path) == reused.id)[0]), slot)
+
+        # 容量不足时扩容
+        rng = np.random.RandomState(0)
+        new_ids = list(range(10000, 10000 + vector_index.MIN_CAPACITY))
+        index.upsert(new_ids, rng.randn(len(new_ids), embedding.DIM))
+        ids = np.load(index.ids_path)
+        self.assertEqual(len(ids), vector_index.MIN_CAPACITY * 2)
+        self.assertEqual(int((ids >= 0).sum()), len(new_ids) + 1)
+        self.assertEqual(os.path.getsize(index.matrix_path), len(ids) * embedding.DIM * 4)
+
+    def test_top_k_matches_brute_force(self):
+        rng = np.random.RandomState(1)
+        vectors = rng.randn(300, embedding.DIM).astype(np.float32)
+        post_ids = list(range(1, 301))
+        index = vector_index.VectorIndex(self.course.id)
+        index.upsert(post_ids, vectors)
+        index.remove(post_ids[:50])
+
+        queries = rng.randn(4, embedding.DIM)
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        for query, hits in zip(queries, index.search(queries, 10)):
+            scores = normalized[50:] @ (query / np.linalg.norm(query))
+            expected = [post_ids[50 + i] for i in np.argsort(-scores)[:10]]
+            self.assertEqual([post_id for post_id, _ in hits], expected)
+
+    def test_semantic_search_mode(self):
+        ml = make_post(self.course, self.user, title='机器学习入门', content='监督学习和无监督学习的区别')
+        make_post(self.course, self.user, title='期末考试', content='考试范围和复习资料')
+        make_post(self.course, self.user, title='数据库作业', content='SQL 查询语句')
+        embedding_pipeline.run()
+        posts = vector_index.semantic_search(models.Post.objects.filter(course=self.course), self.course.id, '学习方法', k=2)
+        self.assertEqual(list(posts)[0], ml)
+        self.assertEqual(len(posts), 2)
+
+
+class EmbeddingPipelineTests(TestCase):
+    def setUp(self):
+        use_temp_vector_dir(self)
+        self.course = make_course()
+        self.user = make_user('2020001')
+        self.posts = [make_post(self.course, self.user, title='帖子{}'.format(i)) for i in range(5)]
+
+    def test_resumable_batches(self):
+        self.assertEqual(embedding_pipeline.pending().count(), 5)
+        # 模拟中途中断：只处理了前两篇
+        total, _ = embedding_pipeline.run(batch_size=2, limit=2)
+        self.assertEqual(total, 2)
+        self.assertEqual(list(embedding_pipeline.pending().order_by('pk')), self.posts[2:])
+
+        total, _ = embedding_pipeline.run(batch_size=2)
+        self.assertEqual(total, 3)
+        self.assertFalse(embedding_pipeline.pending().exists())
+        self.assertEqual(embedding_pipeline.run()[0], 0)
+
+    def test_edit_enqueues_and_counters_do_not(self):
+        embedding_pipeline.run()
+        post = self.posts[0]
+        counters.incr_post(post, likeCount=1)
+        self.assertFalse(embedding_pipeline.pending().exists())
+
+        post.updateContent(new_content='新的内容')
+        self.assertEqual(list(embedding_pipeline.pending()), [post])
+        # 绕过信号的更新通过 updatedAt 判断为过期
+        embedding_pipeline.run()
+        models.Post.objects.filter(pk=post.pk).update(updatedAt=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(list(embedding_pipeline.pending()), [post])
+
+    def test_command_reports_throughput(self):
+        out = StringIO()
+        call_command('embed_posts', batch_size=2, stdout=out)
+        self.assertIn('已生成 5 篇帖子的嵌入', out.getvalue())
+        self.assertIn('篇/秒', out.getvalue())
+        post = models.Post.objects.get(pk=self.posts[0].pk)
+        self.assertEqual(len(post.embedding), embedding.DIM + 5)
+        self.assertEqual(post.embeddedAt, post.updatedAt)
+
+
+@override_settings(FORUM_RELATED_K=2)
+class RelatedPostTests(TestCase):
+    def setUp(self):
+        use_temp_vector_dir(self)
+        self.course = make_course()
+        self.user = make_user('2020001')
+        self.ml = make_post(self.course, self.user, title='机器学习入门', content='监督学习')
+        self.ml2 = make_post(self.course, self.user, title='机器学习进阶', content='无监督学习')
+        self.exam = make_post(self.course, self.user, title='期末考试复习', content='考试范围')
+        self.db = make_post(self.course, self.user, title='数据库作业', content='SQL 查询')
+        embedding_pipeline.run()
+
+    def lists(self):
+        return {post_id: [row[0] for row in rows] for post_id, rows in self.stored().items()}
+
+    def stored(self):
+        result = {}
+        for row in models.RelatedPost.objects.values_list('post_id', 'related_id', 'score'):
+            result.setdefault(row[0], []).append(row[1:])
+        return result
+
+    def test_neighbours_are_precomputed(self):
+        with self.assertNumQueries(1):
+            posts = related.related_posts(self.ml)
+        self.assertEqual(posts[0], self.ml2)
+        for post_id, related_ids in self.lists().items():
+            self.assertEqual(len(related_ids), 2)
+            self.assertNotIn(post_id, related_ids)
+
+    def test_incremental_refresh_matches_rebuild(self):
+        self.exam.updateContent(new_title='机器学习考试', new_content='监督学习')
+        late = make_post(self.course, self.user, title='机器学习入门', content='监督学习')
+        embedding_pipeline.run()
+        incremental = self.lists()
+        self.assertIn(late.id, incremental[self.ml.id])
+
+        related.rebuild(self.course.id)
+        self.assertEqual(incremental, self.lists())
+
+    def test_delete_refills_lists(self):
+        self.ml2.delete()
+        lists = self.lists()
+        self.assertNotIn(self.ml2.id, lists)
+        for related_ids in lists.values():
+            self.assertNotIn(self.ml2.id, related_ids)
+            self.assertEqual(len(related_ids), 2)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        course = make_course()
+        user = make_user('2020001')
+        for i in range(23):
+            # 热度大量重复，检验排序键相同时翻页不丢、不重
+            make_post(course, user, title='帖子{}'.format(i), heatScore=i % 3, viewCount=i % 4)
+        self.query = models.Post.objects.filter(course=course)
+
+    def walk(self, keys):
+        pages, cursor = [], None
+        while True:
+            page = keyset.paginate(self.query, keys, cursor, 5)
+            pages.append(page)
+            if not page.has_next():
+                return pages
+            cursor = page.next_cursor
+
+    def test_pages_follow_sort_keys(self):
+        for keys in keyset.POST_SORT_KEYS.values():
+            pages = self.walk(keys)
+            self.assertEqual([len(page) for page in pages], [5, 5, 5, 5, 3])
+            expected = list(self.query.order_by(*['-' + key for key in keys]))
+            self.assertEqual([post for page in pages for post in page], expected)
+            self.assertFalse(pages[0].has_previous())
+
+            # 从最后一页往回翻
+            cursor, backwards = pages[-1].prev_cursor, []
+            while cursor:
+                page = keyset.paginate(self.query, keys, cursor, 5)
+                backwards.insert(0, list(page))
+                cursor = page.prev_cursor
+            self.assertEqual(backwards, [list(page) for page in pages[:-1]])
+
+    def test_single_query_per_page(self):
+        page = keyset.paginate(self.query, keyset.POST_SORT_KEYS['heat'], None, 5)
+        with self.assertNumQueries(1):
+            keyset.paginate(self.query, keyset.POST_SORT_KEYS['heat'], page.next_cursor, 5)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        first = list(keyset.paginate(self.query, keyset.POST_SORT_KEYS['newest'], None, 5))
+        bad = ['abc', 'e30', keyset._encode('next', [1]), keyset._encode('next', ['2020-02-30T00:00:00', 1]),
+               keyset._encode('next', [[1], {'a': 1}]), keyset._encode('next', ['2020-01-01T00:00:00', '1'])]
+        for cursor in bad:
+            self.assertEqual(list(keyset.paginate(self.query, keyset.POST_SORT_KEYS['newest'], cursor, 5)), first)
+
+
+class CommentTreeTests(TestCase):
+    def setUp(self):
+        self.user = make_user('2020001')
+        self.post = make_post(make_course(), self.user)
+
+    def comment(self, content, parent=None):
+        if parent:
+            return parent.reply(content, self.user)
+        return models.PostComment.objects.create(commentId=str(uuid4()), post=self.post, author=self.user,
+                                                 content=content)
+
+    def thread(self, width, length):
+        '''一条根评论，下面 width 条回复，每条回复再往下接 length 层'''
+        root = self.comment('root')
+        for i in range(width):
+            node = self.comment('reply{}'.format(i), root)
+            for j in range(length):
+                node = self.comment('reply{}-{}'.format(i, j), node)
+        return root
+
+    def test_path_and_depth(self):
+        root = self.comment('a')
+        child = self.comment('b', root)
+        grandchild = self.comment('c', child)
+        grandchild.refresh_from_db()
+        self.assertEqual(grandchild.depth, 2)
+        self.assertEqual(grandchild.rootComment, root)
+        self.assertEqual(grandchild.path, '{:010d}/{:010d}/{:010d}/'.format(root.pk, child.pk, grandchild.pk))
+
+    def test_constant_queries_regardless_of_thread_size(self):
+        small = [self.thread(1, 0)]
+        large = [self.thread(10, 6), self.thread(5, 2)]
+        for roots in (small, large):
+            roots = list(models.PostComment.objects.filter(pk__in=[r.pk for r in roots]).select_related('author'))
+            with self.assertNumQueries(1):
+                comment_tree.attach_threads(roots)
+                # 访问作者不再触发查询
+                names = [child.author.username for root in roots for child in root.children]
+            self.assertTrue(names)
+
+        root = large[0]
+        roots = comment_tree.attach_threads([root])
+        self.assertEqual([child.content for child in roots[0].children], ['reply{}'.format(i) for i in range(10)])
+        # 展开到第 3 层，更深的只做标记
+        level3 = roots[0].children[0].children[0].children[0]
+        self.assertEqual(level3.content, 'reply0-1')
+        self.assertEqual(level3.children, [])
+        self.assertTrue(level3.has_more_replies)
+
+    def test_lazy_replies_endpoint(self):
+        root = self.thread(1, 6)
+        level3 = models.PostComment.objects.get(content='reply0-1')
+        response = forum.comment_replies(forum_request('get'), level3.commentId)
+        data = json.loads(response.content)
+        self.assertTrue(data['status'])
+        self.assertEqual(data['replies'][0]['content'], 'reply0-2')
+        self.assertEqual(data['replies'][0]['replies'][0]['replies'][0]['content'], 'reply0-4')
+        self.assertTrue(data['replies'][0]['replies'][0]['replies'][0]['has_more_replies'])
+        # 其他楼的评论不会混进来
+        self.thread(2, 3)
+        data = json.loads(forum.comment_replies(forum_request('get'), root.commentId).content)
+        self.assertEqual(len(data['replies']), 1)
+
+
+class TagTests(TestCase):
+    def setUp(self):
+        self.course = make_course()
+        self.user = make_user('2020001')
+
+    def counts(self):
+        return dict(tags.popular(self.course.id))
+
+    def test_parse(self):
+        self.assertEqual(tags.parse(' Python，复习, python ,, 复习、期末'), ['Python', '复习', 'python', '期末'])
+        self.assertEqual(tags.parse(''), [])
+
+    def test_counts_follow_create_update_delete(self):
+        a = make_post(self.course, self.user, tags='Python,复习')
+        b = make_post(self.course, self.user, tags='Python')
+        make_post(make_course('数据库'), self.user, tags='Python')
+        self.assertEqual(self.counts(), {'Python': 2, '复习': 1})
+
+        a.updateContent(new_tags='复习,期末')
+        self.assertEqual(self.counts(), {'Python': 1, '复习': 1, '期末': 1})
+        # 标签没变时只有两次读取，不写库
+        with self.assertNumQueries(2):
+            tags.sync_post(b)
+
+        b.delete()
+        self.assertEqual(self.counts(), {'复习': 1, '期末': 1})
+        self.assertEqual(list(models.Post.objects.filter(post_tags__tag__name='期末')), [a])
+
+    def test_popular_tags_endpoint_reads_counts_only(self):
+        for i in range(3):
+            make_post(self.course, self.user, tags='作业' if i else '作业,考试')
+        with self.assertNumQueries(1):
+            response = forum.popular_tags(forum_request('get'), self.course.id)
+        data = json.loads(response.content)
+        self.assertEqual(data['tags'], [{'name': '作业', 'count': 3}, {'name': '考试', 'count': 1}])
+
+
+class TrendingTests(TestCase):
+    def setUp(self):
+        self.course = make_course()
+        self.user = make_user('2020001')
+        self.a = make_post(self.course, self.user, title='a', tags='作业')
+        self.b = make_post(self.course, self.user, title='b', tags='考试,作业')
+        self.now = timezone.now().replace(hour=12, minute=30, second=0, microsecond=0)
+
+    def test_rolling_window(self):
+        hour = timedelta(hours=1)
+        trending.record(self.a, now=self.now - 24 * hour, likeCount=5)        # 窗口外
+        trending.record(self.a, now=self.now - 23 * hour - timedelta(minutes=31), likeCount=7)  # 12:59，窗口外
+        trending.record(self.a, now=self.now - 23 * hour, likeCount=1)        # 13:30，窗口内最早的桶
+        trending.record(self.b, now=self.now - 23 * hour - timedelta(minutes=30), collectCount=1)  # 13:00 整点
+        trending.record(self.b, now=self.now, commentCount=1)
+
+        self.assertEqual(trending.window_start(24, self.now), self.now.replace(minute=0) - 23 * hour)
+        self.assertEqual(trending.trending_posts(self.course.id, 24, now=self.now), [(self.b.id, 5), (self.a.id, 1)])
+        self.assertEqual(trending.trending_tags(self.course.id, 24, now=self.now), [('作业', 6), ('考试', 5)])
+        # 窗口只有当前小时
+        self.assertEqual(trending.trending_posts(self.course.id, 1, now=self.now), [(self.b.id, 2)])
+        # 一小时后 13:00 的桶滑出窗口
+        self.assertEqual(trending.trending_posts(self.course.id, 24, now=self.now + hour), [(self.b.id, 2)])
+
+        # 同一小时内的互动累加到同一个桶
+        self.assertEqual(models.PostActivity.objects.count(), 4)
+        with override_settings(FORUM_TRENDING_RETENTION_HOURS=24):
+            self.assertEqual(trending.prune(self.now), 2)
+        self.assertEqual(models.PostActivity.objects.count(), 3)
+
+    def test_interactions_update_buckets(self):
+        forum.post_like(forum_request('post', self.user), self.a.postId)
+        forum.post_collect(forum_request('post', self.user), self.a.postId)
+        forum.comment_add(forum_request('post', self.user, {'content': '好'}), self.b.postId)
+        self.assertEqual(trending.trending_posts(self.course.id), [(self.a.id, 4), (self.b.id, 2)])
+
+        # 取消点赞从点赞时的时间桶中扣除
+        like = models.PostLike.objects.get()
+        models.PostLike.objects.filter(pk=like.pk).update(createdAt=timezone.now() - timedelta(hours=3))
+        forum.post_like(forum_request('post', self.user), self.a.postId)
+        self.assertEqual(trending.trending_posts(self.course.id), [(self.a.id, 3), (self.b.id, 2)])
+        self.assertEqual(models.PostActivity.objects.filter(post=self.a).order_by('hour').first().score, -1)
+
+        with self.assertNumQueries(3):
+            data = json.loads(forum.trending_list(forum_request('get'), self.course.id).content)
+        self.assertEqual([post['title'] for post in data['posts']], ['a', 'b'])
+        self.assertEqual(data['tags'], [{'name': '作业', 'score': 5}, {'name': '考试', 'score': 2}])
+
+    @override_settings(FORUM_TRENDING_RETENTION_HOURS=24)
+    def test_window_is_capped_at_retention(self):
+        # 尚未清理的过期时间桶不计入
+        trending.record(self.a, now=timezone.now() - timedelta(hours=48), likeCount=1)
+        trending.record(self.b, likeCount=1)
+        data = json.loads(forum.trending_list(forum_request('get', data={'hours': 720}), self.course.id).content)
+        self.assertEqual([post['title'] for post in data['posts']], ['b'])
+
+
+class UserStateTests(TestCase):
+    def setUp(self):
+        self.course = make_course()
+        self.user = make_user('2020001')
+        self.posts = [make_post(self.course, self.user, title='帖子{}'.format(i)) for i in range(10)]
+        for post in self.posts[:4]:
+            models.PostLike.objects.create(post=post, user=self.user)
+        for post in self.posts[2:7]:
+            models.PostCollect.objects.create(post=post, user=self.user)
+        # 其他用户的记录不影响
+        other = make_user('2020002')
+        models.PostLike.objects.create(post=self.posts[9], user=other)
+
+    def test_one_query_per_page(self):
+        posts = list(models.Post.objects.filter(course=self.course).order_by('id'))
+        with self.assertNumQueries(1):
+            user_state.attach(posts, self.user.id)
+        self.assertEqual([p.has_liked for p in posts], [True] * 4 + [False] * 6)
+        self.assertEqual([p.has_collected for p in posts], [False] * 2 + [True] * 5 + [False] * 3)
+
+    def test_anonymous_user_needs_no_query(self):
+        with self.assertNumQueries(0):
+            posts = user_state.attach(self.posts, None)
+        self.assertFalse(any(p.has_liked or p.has_collected for p in posts))
+
+    def test_keyset_page_then_state(self):
+        query = models.Post.objects.filter(course=self.course)
+        with self.assertNumQueries(2):
+            page = keyset.paginate(query, keyset.POST_SORT_KEYS['newest'], None, 5)
+            user_state.attach(page, self.user.id)
+        self.assertEqual([p.has_collected for p in page], [False, False, False, True, True])
+
+        collects = keyset.paginate(models.PostCollect.objects.filter(user=self.user).select_related('post'),
+                                   keyset.COLLECT_SORT_KEYS, None, 10)
+        with self.assertNumQueries(1):
+            posts = user_state.attach([collect.post for collect in collects], self.user.id)
+        self.assertTrue(all(p.has_collected for p in posts))
+        self.assertEqual([p.has_liked for p in posts], [False, False, False, True, True])
+
+
+def batch_request(user, actions):
+    request = RequestFactory().post('/', json.dumps({'actions': actions}), content_type='application/json')
+    request.session = {'info': {'id': user.id, 'name': user.username}}
+    return request
+
+
+class InteractionBatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = make_course()
+        self.user = make_user('2020001')
+        self.posts = [make_post(self.course, self.user, title='帖子{}'.format(i)) for i in range(4)]
+        models.PostLike.objects.create(post=self.posts[0], user=make_user('2020002'))
+        models.Post.objects.filter(pk=self.posts[0].pk).update(likeCount=1)
+
+    def send(self, actions):
+        return json.loads(forum.interactions_batch(batch_request(self.user, actions)).content)
+
+    def test_set_states_are_idempotent(self):
+        actions = [{'postId': post.postId, 'like': True, 'collect': True} for post in self.posts[:3]]
+        actions.append({'postId': self.posts[2].postId, 'collect': False})
+        for _ in range(2):
+            res = self.send(actions)
+            self.assertTrue(res['status'])
+            states = {item['postId']: item for item in res['posts']}
+            self.assertEqual(states[self.posts[0].postId]['like_count'], 2)
+            self.assertEqual(states[self.posts[1].postId]['like_count'], 1)
+            # 同一帖子以后出现的动作为准
+            self.assertFalse(states[self.posts[2].postId]['collected'])
+            self.assertEqual(states[self.posts[2].postId]['collect_count'], 0)
+        self.assertEqual(models.PostLike.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(models.PostCollect.objects.filter(user=self.user).count(), 2)
+
+        res = self.send([{'postId': post.postId, 'like': False} for post in self.posts])
+        states = {item['postId']: item for item in res['posts']}
+        self.assertEqual([states[post.postId]['like_count'] for post in self.posts], [1, 0, 0, 0])
+        self.assertFalse(models.PostLike.objects.filter(user=self.user).exists())
+        # 热度按计数重算，趋势只记录状态真正变化的部分
+        post = models.Post.objects.get(pk=self.posts[1].pk)
+        self.assertAlmostEqual(post.heatScore, post.calculateHeat(), places=3)
+        self.assertEqual(trending.trending_posts(self.course.id), [(self.posts[1].pk, 3), (self.posts[0].pk, 3)])
+
+    def test_query_count_does_not_grow_with_batch(self):
+        def queries(posts):
+            with CaptureQueriesContext(connection) as ctx:
+                self.send([{'postId': post.postId, 'like': True, 'collect': True} for post in posts])
+            return len(ctx.captured_queries)
+
+        more = [make_post(self.course, self.user) for _ in range(6)]
+        self.assertEqual(queries(self.posts[:2]), queries(more))
+
+    def test_invalid_requests(self):
+        self.assertFalse(self.send('x')['status'])
+        self.assertFalse(self.send([{'like': True}])['status'])
+        self.assertFalse(self.send([{'postId': 'x', 'like': True}] * (interactions.MAX_ACTIONS + 1))['status'])
+        self.assertEqual(self.send([{'postId': 'missing', 'like': True}])['posts'], [])
+        res = json.loads(forum.interactions_batch(forum_request('post')).content)
+        self.assertFalse(res['status'])
+
+
+@override_settings(FORUM_LEADERBOARD_SIZE=6)
+class LeaderboardTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = make_course()
+        self.user = make_user('2020001')
+        self.posts = [make_post(self.course, self.user, title='帖子{}'.format(i), heatScore=i) for i in range(10)]
+
+    def expected(self, sort_by, n=5):
+        keys = keyset.POST_SORT_KEYS[sort_by]
+        return list(models.Post.objects.filter(course=self.course).order_by(*['-' + key for key in keys])[:n])
+
+    def page(self, sort_by='heat'):
+        return leaderboard.first_page(self.course.id, sort_by, 5)
+
+    def test_hit_needs_one_hydration_query(self):
+        self.assertEqual(list(self.page()), self.expected('heat'))
+        with self.assertNumQueries(1):
+            page = self.page()
+        self.assertEqual(list(page), self.expected('heat'))
+        # 第二页沿用游标分页
+        rest = keyset.paginate(models.Post.objects.filter(course=self.course), keyset.POST_SORT_KEYS['heat'],
+                               page.next_cursor, 5)
+        self.assertEqual(list(page) + list(rest), self.expected('heat', 10))
+        self.assertEqual(leaderboard.stats()['hits'], 1)
+        self.assertEqual(leaderboard.stats()['misses'], 1)
+
+    def test_events_update_board_in_place(self):
+        for sort_by in keyset.POST_SORT_KEYS:
+            self.page(sort_by)
+        # 点赞让排行外的帖子进入排行
+        for i in range(5):
+            forum.post_like(forum_request('post', make_user('u{}'.format(i))), self.posts[0].postId)
+        new = make_post(self.course, self.user, title='新帖', heatScore=20)
+        with self.assertNumQueries(4):  # 每种排序方式一次 id__in 查询
+            pages = {sort_by: list(self.page(sort_by)) for sort_by in keyset.POST_SORT_KEYS}
+        for sort_by, posts in pages.items():
+            self.assertEqual(posts, self.expected(sort_by), sort_by)
+        self.assertEqual(pages['newest'][0], new)
+        self.assertEqual(leaderboard.stats()['misses'], 4)
+
+    def test_drop_out_and_delete_invalidate(self):
+        self.page()
+        # 排行中的帖子热度跌出前 N
+        post = self.posts[9]
+        post.heatScore = -1
+        post.save(update_fields=['heatScore'])
+        self.assertEqual(list(self.page()), self.expected('heat'))
+        self.assertEqual(leaderboard.stats()['misses'], 2)
+
+        self.posts[8].delete()
+        self.assertEqual(list(self.page()), self.expected('heat'))
+        self.assertEqual(leaderboard.stats()['misses'], 3)
+
+        heat.recompute_all()
+        self.page()
+        self.assertEqual(leaderboard.stats()['misses'], 4)
+
+    def test_rolled_back_save_keeps_board(self):
+        self.page()
+        post = self.posts[0]
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            post.heatScore = 100
+            post.save(update_fields=['heatScore'])
+            raise RuntimeError
+        self.assertEqual(list(self.page()), self.expected('heat'))
+        self.assertEqual(leaderboard.stats()['misses'], 1)
+
+
+class ReconcileTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = make_course()
+        self.users = [make_user('s{}'.format(i)) for i in range(3)]
+        self.posts = [make_post(self.course, self.users[0], title='帖子{}'.format(i)) for i in range(5)]
+        for post in self.posts[:3]:
+            for user in self.users:
+                forum.post_like(forum_request('post', user), post.postId)
+        forum.post_collect(forum_request('post', self.users[1]), self.posts[4].postId)
+        forum.comment_add(forum_request('post', self.users[2], {'content': '评论'}), self.posts[1].postId)
+        # 人为造成漂移
+        models.Post.objects.filter(pk=self.posts[0].pk).update(likeCount=7)
+        models.Post.objects.filter(pk=self.posts[4].pk).update(collectCount=0, commentCount=2)
+        comment = models.PostComment.objects.get()
+        models.PostComment.objects.filter(pk=comment.pk).update(likeCount=-1)
+
+    def stored(self):
+        return list(models.Post.objects.order_by('pk').values_list('likeCount', 'collectCount', 'commentCount'))
+
+    def test_dry_run_reports_without_writing(self):
+        before = self.stored()
+        total, diffs, _ = reconcile.reconcile(chunk_size=2, dry_run=True)
+        self.assertEqual(total, 5)
+        self.assertEqual([str(diff) for diff in diffs], [
+            'Post#{} likeCount: 7 -> 3'.format(self.posts[0].pk),
+            'Post#{} collectCount: 0 -> 1'.format(self.posts[4].pk),
+            'Post#{} commentCount: 2 -> 0'.format(self.posts[4].pk),
+            'PostComment#{} likeCount: -1 -> 0'.format(models.PostComment.objects.get().pk),
+        ])
+        self.assertEqual(self.stored(), before)
+
+    def test_fixes_only_drifted_rows(self):
+        untouched = models.Post.objects.get(pk=self.posts[2].pk)
+        # 每块 1 条读取帖子 + 3 条分组计数，bulk_update 只在有不一致的块执行（2 块），最后修正评论点赞数
+        with self.assertNumQueries(3 * 4 + 1 + 2 + 2):
+            total, diffs, _ = reconcile.reconcile(chunk_size=2)
+        self.assertEqual(len(diffs), 4)
+        self.assertEqual(self.stored(), [(3, 0, 0), (3, 0, 1), (3, 0, 0), (0, 0, 0), (0, 1, 0)])
+        self.assertEqual(models.PostComment.objects.get().likeCount, 0)
+        post = models.Post.objects.get(pk=self.posts[0].pk)
+        self.assertAlmostEqual(post.heatScore, post.calculateHeat(), places=3)
+        self.assertEqual(models.Post.objects.get(pk=self.posts[2].pk).heatScore, untouched.heatScore)
+
+        out = StringIO()
+        call_command('reconcile_counters', '--dry-run', stdout=out)
+        self.assertIn('无不一致', out.getvalue())
+
+
+class SoftDeleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        use_temp_vector_dir(self)
+        self.course = make_course()
+        self.user = make_user('2020001')
+        self.post = make_post(self.course, self.user, title='期末复习资料', tags='复习')
+        self.other = make_post(self.course, self.user, title='期末考试安排', tags='复习')
+        users = [make_user('s{}'.format(i)) for i in range(5)]
+        for user in users:
+            forum.post_like(forum_request('post', user), self.post.postId)
+            forum.post_collect(forum_request('post', user), self.post.postId)
+        for i in range(3):
+            root = models.PostComment.objects.create(commentId=str(uuid4()), post=self.post, author=self.user,
+                                                     content='评论{}'.format(i))
+            root.reply('回复', users[i]).reply('再回复', users[i])
+        forum.post_like(forum_request('post', users[0]), self.other.postId)
+
+    def test_delete_hides_post_immediately(self):
+        leaderboard.first_page(self.course.id, 'heat')
+        res = json.loads(forum.post_delete(forum_request('post', self.user), self.post.postId).content)
+        self.assertTrue(res['status'])
+
+        self.assertFalse(models.Post.objects.filter(pk=self.post.pk).exists())
+        self.assertTrue(models.Post.all_objects.filter(pk=self.post.pk).exists())
+        self.assertEqual(list(leaderboard.first_page(self.course.id, 'heat')), [self.other])
+        self.assertEqual(list(search.search(models.Post.objects.all(), '期末')), [self.other])
+        self.assertEqual(dict(tags.popular(self.course.id)), {'复习': 1})
+        self.assertEqual([post_id for post_id, _ in trending.trending_posts(self.course.id)], [self.other.pk])
+        self.assertEqual(forum.post_detail(forum_request('get', self.user), self.post.postId).status_code, 302)
+        res = json.loads(forum.post_like(forum_request('post', self.user), self.post.postId).content)
+        self.assertFalse(res['status'])
+        # 关联数据还在，等待清理
+        self.assertEqual(models.PostComment.objects.filter(post_id=self.post.pk).count(), 9)
+        # 重复删除
+        self.assertFalse(purge.soft_delete(self.post))
+    def test_purge_removes_dependents_in_batches(self):
+        purge.soft_delete(self.post)
+        with CaptureQueriesContext(connection) as ctx:
+            purged, rows, _ = purge.purge(batch_size=4, pause=0)
+        self.assertEqual((purged, rows), (1, 9 + 5 + 5))
+        # 每批一个短事务
+        self.assertGreaterEqual(sum('DELETE FROM "baweb_postcomment"' in q['sql'] for q in ctx.captured_queries), 3)
+        self.assertFalse(models.Post.all_objects.filter(pk=self.post.pk).exists())
+        for model in (models.PostComment, models.PostLike, models.PostCollect, models.PostActivity):
+            self.assertFalse(model.objects.filter(post_id=self.post.pk).exists(), model)
+        # 其他帖子不受影响
+        self.assertEqual(models.Post.objects.get(pk=self.other.pk).likeCount, 1)
+        self.assertEqual(dict(tags.popular(self.course.id)), {'复习': 1})
+
+        out = StringIO()
+        call_command('purge_deleted_posts', stdout=out)
+        self.assertIn('已清理 0 篇帖子', out.getvalue())
+
+
+class EventStreamTests(TestCase):
+    def setUp(self):
+        self.channel = events.post_channel(uuid4().hex)
+
+    def read(self, last_id, **kwargs):
+        kwargs.setdefault('duration', 0.1)
+        kwargs.setdefault('heartbeat', 0.05)
+        return ''.join(events.stream([self.channel], last_id, **kwargs))
+
+    def test_resume_from_last_event_id(self):
+        ids = [events.publish(self.channel, 'counters', {'like_count': i}) for i in range(3)]
+        events.publish(events.post_channel('other'), 'counters', {'like_count': 9})
+        body = self.read(ids[0])
+        self.assertTrue(body.startswith('retry: '))
+        self.assertNotIn('"like_count": 0', body)
+        self.assertIn('id: {}\nevent: counters\ndata: {{"like_count": 1}}\n\n'.format(ids[1]), body)
+        self.assertIn('id: {}\n'.format(ids[2]), body)
+        self.assertNotIn('"like_count": 9', body)
+        self.assertIn(': keepalive', body)
+        # 不带 Last-Event-ID 只接收新事件
+        self.assertNotIn('event: counters', self.read(None))
+
+    def test_missed_events_send_reset(self):
+        broker = events.Broker(size=2)
+        first = broker.publish('c', 'comment', {})
+        for _ in range(2):
+            broker.publish('c', 'comment', {})
+        self.assertTrue(broker.wait(['c'], first - 1, 0)[1])
+        self.assertEqual(len(broker.wait(['c'], first, 0)[0]), 2)
+        # 重启前进程发出的 id
+        self.assertIn('event: reset', self.read(1))
+
+    def test_idle_channels_are_evicted(self):
+        broker = events.Broker(size=2, max_channels=2, ttl=60)
+        first = broker.publish('a', 'comment', {})
+        for _ in range(2):
+            broker.publish('a', 'comment', {})
+        broker.publish('b', 'comment', {})
+        # 频道数超过上限，最久没有新事件的 a 被淘汰
+        broker.publish('c', 'comment', {})
+        self.assertEqual(list(broker._buffers), ['b', 'c'])
+        self.assertNotIn('a', broker._dropped)
+        self.assertEqual(broker.wait(['a'], first, 0), ([], True))
+        self.assertEqual(len(broker.wait(['b'], first, 0)[0]), 1)
+
+        # 空闲超过 ttl 的频道在下一次发布时淘汰
+        broker._published['b'] -= 61
+        broker.publish('c', 'comment', {})
+        self.assertEqual(list(broker._buffers), ['c'])
+        self.assertEqual(set(broker._published), {'c'})
+
+    def test_idle_stream_wakes_on_publish(self):
+        stream = events.stream([self.channel], None, duration=5, heartbeat=5)
+        next(stream)
+        timer = threading.Timer(0.05, events.publish, (self.channel, 'comment', {'content': '新评论'}))
+        timer.start()
+        started = time.monotonic()
+        message = next(stream)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertIn('event: comment', message)
+        stream.close()
+
+    def test_publish_wakes_only_subscribers_of_the_channel(self):
+        broker = events.Broker()
+        woken = []
+
+        def wait(channel):
+            woken.append((channel, broker.wait([channel], broker.last_id(), 0.5)[0]))
+
+        waiters = [threading.Thread(target=wait, args=(channel,)) for channel in ('a', 'b')]
+        for waiter in waiters:
+            waiter.start()
+        time.sleep(0.05)
+        broker.publish('a', 'comment', {})
+        started = time.monotonic()
+        waiters[0].join()
+        self.assertLess(time.monotonic() - started, 0.3)
+        self.assertEqual(len(woken), 1)
+        self.assertEqual(woken[0][0], 'a')
+        waiters[1].join()
+        self.assertEqual(woken[1], ('b', []))
+        self.assertEqual(broker._waiters, {})
+
+    @override_settings(FORUM_EVENT_STREAM_SECONDS=0.1, FORUM_EVENT_HEARTBEAT=0.05)
+    def test_post_events_view(self):
+        post = make_post(make_course(), make_user('2020001'))
+        channel = events.post_channel(post.pk)
+        first = events.publish(channel, 'comment', {'content': '一'})
+        events.publish(channel, 'comment', {'content': '二'})
+        request = forum_request('get')
+        request.META['HTTP_LAST_EVENT_ID'] = str(first)
+        response = forum.post_events(request, post.postId)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('"content": "二"', body)
+        self.assertNotIn('"content": "一"', body)
+        self.assertEqual(forum.post_events(forum_request('get'), 'missing').status_code, 404)
+
+
+class EventPublishTests(TransactionTestCase):
+    def channel_events(self, channel, after):
+        found, _ = events.broker.wait([channel], after, 0)
+        return [(event, data) for _, event, data in found]
+
+    def test_write_paths_publish_after_commit(self):
+        course = make_course()
+        user = make_user('2020001')
+        post = make_post(course, user)
+        after = events.broker.last_id()
+
+        forum.comment_add(forum_request('post', user, {'content': '评论'}), post.postId)
+        forum.post_like(forum_request('post', user), post.postId)
+        published = self.channel_events(events.post_channel(post.pk), after)
+        self.assertEqual([event for event, _ in published], ['counters', 'comment', 'counters'])
+        self.assertEqual(published[1][1]['content'], '评论')
+        self.assertEqual(published[2][1]['like_count'], 1)
+
+        # 回滚的写操作不推送
+        after = events.broker.last_id()
+        try:
+            with transaction.atomic():
+                counters.incr_post(post, likeCount=1)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(self.channel_events(events.post_channel(post.pk), after), [])
+
+        forum.post_delete(forum_request('post', user), post.postId)
+        self.assertEqual(self.channel_events(events.course_channel(course.id), after),
+                         [('post_deleted', {'postId': post.postId})])
+
+
+class ForumApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = make_course()
+        self.user = make_user('2020001')
+        self.posts = [make_post(self.course, self.user, title='帖子{}'.format(i), heatScore=i) for i in range(3)]
+        session = self.client.session
+        session['info'] = {'id': self.user.id, 'name': self.user.username}
+        session.save()
+
+    def get(self, url, etag=None, **params):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, params, **headers)
+
+    def test_post_list_sparse_fields_and_304(self):
+        url = '/api/forum/{}/posts'.format(self.course.id)
+        res = self.get(url, fields='title,like_count,bogus')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Cache-Control'], 'private, no-cache')
+        data = res.json()
+        self.assertEqual(data['posts'][0], {'postId': self.posts[2].postId, 'title': '帖子2', 'like_count': 0})
+        self.assertNotIn(b'", "', res.content)
+
+        # 内容未变：session 一次查询 + 校验值一次查询，直接返回 304
+        with self.assertNumQueries(2):
+            res304 = self.get(url, res['ETag'], fields='title,like_count,bogus')
+        self.assertEqual(res304.status_code, 304)
+        self.assertEqual(res304.content, b'')
+
+        # 计数变化（不改 updatedAt）也会让 ETag 失效
+        counters.incr_post(self.posts[0], likeCount=1)
+        self.assertEqual(self.get(url, res['ETag'], fields='title,like_count').status_code, 200)
+
+    def test_post_detail_etag(self):
+        url = '/api/forum/post/{}'.format(self.posts[0].postId)
+        res = self.get(url)
+        self.assertEqual(res.json()['post']['author'], '2020001')
+        self.assertEqual(self.get(url, res['ETag']).status_code, 304)
+        self.posts[0].updateContent(new_title='新标题')
+        res = self.get(url, res['ETag'], fields='title')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['post'], {'postId': self.posts[0].postId, 'title': '新标题'})
+        self.assertEqual(self.get('/api/forum/post/missing').status_code, 404)
+
+    def test_comment_page_etag(self):
+        post = self.posts[0]
+        url = '/api/forum/post/{}/comments'.format(post.postId)
+        for content in ('第一条', '第二条'):
+            forum.comment_add(forum_request('post', self.user, {'content': content}), post.postId)
+        res = self.get(url)
+        self.assertEqual([c['content'] for c in res.json()['comments']], ['第二条', '第一条'])
+        self.assertNotIn('Last-Modified', res)
+        self.assertEqual(self.get(url, res['ETag']).status_code, 304)
+
+        comment = models.PostComment.objects.get(content='第二条')
+        comment.like()
+        res = self.get(url, res['ETag'])
+        self.assertEqual(res.status_code, 200)
+        # 删除较早的评论，最新评论时间不变，ETag 仍然失效
+        first = models.PostComment.objects.get(content='第一条')
+        forum.comment_delete(forum_request('post', self.user), first.commentId)
+        self.assertEqual(self.get(url, res['ETag']).status_code, 200)
+
+    def test_unknown_course_is_404(self):
+        self.assertEqual(self.get('/api/forum/0/posts').status_code, 404)
+        empty = make_course('数据库')
+        self.assertEqual(self.get('/api/forum/{}/posts'.format(empty.id)).json()['posts'], [])
+
+    def test_forum_urls_are_wired(self):
+        res = self.client.post('/forum/post/{}/like'.format(self.posts[0].postId))
+        self.assertEqual(res.json()['like_count'], 1)
+        self.client.session.flush()
+        self.client.cookies.clear()
+        self.assertEqual(self.client.get('/api/forum/{}/posts'.format(self.course.id)).status_code, 302)
+
+    def test_forum_pages_render(self):
+        post = self.posts[0]
+        forum.post_collect(forum_request('post', self.user), post.postId)
+        root = models.PostComment.objects.create(commentId=str(uuid4()), post=post, author=self.user, content='楼主')
+        root.reply('回复', self.user).reply('再回复', self.user)
+
+        pages = {
+            '/forum/{}/list'.format(self.course.id): '帖子2',
+            '/forum/{}/list?keyword=帖子&sort_by=relevance'.format(self.course.id): '帖子1',
+            '/forum/{}/list?sort_by=newest&tag=作业'.format(self.course.id): '暂无帖子',
+            '/forum/0/list': '公共论坛',
+            '/forum/post/{}/detail'.format(post.postId): '再回复',
+            '/forum/collections': '帖子0',
+            '/forum/{}/post/add'.format(self.course.id): 'post_form',
+        }
+        for url, text in pages.items():
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, 200, url)
+            self.assertContains(res, text)
+
+
+class DuplicateTests(TestCase):
+    QUESTION = ('决策树作业第二题怎么做', '老师好，决策树作业第二题要求用信息增益选择划分属性，'
+                '我算出来的结果和答案不一样，请问信息增益是用以2为底的对数吗？')
+
+    def setUp(self):
+        self.course = make_course()
+        self.user = make_user('2020001')
+        self.post = make_post(self.course, self.user, title=self.QUESTION[0], content=self.QUESTION[1])
+        make_post(self.course, self.user, title='期末考试范围', content='请问期末考试包括第八章的聚类分析吗？')
+
+    def create(self, title, content, course=None):
+        data = {'title': title, 'content': content, 'tags': ''}
+        res = forum.post_create(forum_request('post', make_user(uuid4().hex[:8]), data), (course or self.course).id)
+        return json.loads(res.content)
+
+    def test_post_create_flags_near_duplicates(self):
+        res = self.create('决策树作业第二题怎么做？', self.QUESTION[1].replace('老师好，', '') + '谢谢！')
+        self.assertTrue(res['status'])
+        self.assertEqual(res['duplicates'], [self.post.postId])
+        # 新帖本身也进入分桶，之后的重复提问会同时命中两篇
+        self.assertEqual(len(self.create(*self.QUESTION)['duplicates']), 2)
+
+        self.assertEqual(self.create('聚类作业', '请问 K-means 的初始中心怎么选？')['duplicates'], [])
+        self.assertEqual(self.create(*self.QUESTION, course=make_course('数据库'))['duplicates'], [])
+
+    def test_lookup_is_two_queries_and_follows_edits(self):
+        with self.assertNumQueries(2):  # 分桶查询 + 候选确认
+            self.assertEqual([post for post, _ in duplicates.find(self.course.id, *self.QUESTION)], [self.post])
+        self.assertLessEqual(models.PostLSHBucket.objects.filter(post=self.post).count(), minhash.BANDS)
+
+        self.post.updateContent(new_title='数据可视化', new_content='matplotlib 中文显示成方框怎么办？')
+        self.assertEqual(duplicates.find(self.course.id, *self.QUESTION), [])
+        purge.soft_delete(self.post)
+        self.assertEqual(duplicates.find(self.course.id, '数据可视化', 'matplotlib 中文显示成方框怎么办？'), [])
+
+    def test_minhash_estimates_jaccard(self):
+        a = minhash.shingles(*self.QUESTION)
+        b = minhash.shingles(self.QUESTION[0], self.QUESTION[1][:40])
+        estimate = np.mean(minhash.signature(a) == minhash.signature(b))
+        self.assertAlmostEqual(estimate, minhash.jaccard(a, b), delta=0.15)
+        self.assertEqual(minhash.normalize('<p>Hello， World!</p>'), 'helloworld')
+
+    def test_crc32_collision_in_title(self):
+        # '丩业丯 丶l0' 中有两个 trigram 的 crc32 相同，哈希集合比 trigram 集合小
+        title = '丩业丯 丶l0'
+        text = minhash.normalize(title) + '\x00'
+        self.assertLess(len(minhash.shingles(title, '')), len(text) - minhash.SHINGLE + 1)
+        migration = import_module('baweb.migrations.0034_post_lsh_buckets')
+        self.assertEqual(migration.bucket_keys(title, '', minhash._A, minhash._B),
+                         set(minhash.bands(minhash.signature(minhash.shingles(title, '')))))
+        self.assertTrue(self.create(title, '正文')['status'])
+
+
+def make_student(username, course=None):
+    student = models.StudentInfo.objects.create(user=make_user(username), name=username)
+    if course:
+        models.StudentCourse.objects.create(student=student, course=course)
+    return student
+
+
+def make_assignment(course, is_group=False):
+    return models.Assignment.objects.create(name='作业', course=course, is_group=is_group, ddl=timezone.now().date())
+
+
+def submit(assignment, student, files=1):
+    with transaction.atomic():
+        submission = submission_status.lock(assignment.id, student.pk)
+        for i in range(files):
+            models.SubmissionFile.objects.create(submission=submission, file='submission/a.txt',
+                                                 file_name='文件{}'.format(i))
+        return submission_status.refresh(submission)
+
+
+class SubmissionStatusTests(TestCase):
+    def setUp(self):
+        self.course = make_course()
+        self.students = [make_student('2020{:03d}'.format(i), self.course) for i in range(6)]
+        group = models.Group.objects.create(course=self.course, name='第一组')
+        for i, student in enumerate(self.students[:3]):
+            models.GroupMember.objects.create(group=group, student=student, is_head=i == 0)
+        # 其他课程的小组不影响本课程
+        other = models.Group.objects.create(course=make_course('数据库'), name='第二组')
+        for student in self.students[3:5]:
+            models.GroupMember.objects.create(group=other, student=student, is_head=False)
+
+    def test_individual_assignment(self):
+        assignment = make_assignment(self.course)
+        submit(assignment, self.students[0], files=3)
+        submit(assignment, self.students[3])
+        submit(assignment, make_student('旁听'))
+
+        status = submission_status.compute(assignment)
+        self.assertEqual(status.submitted, [self.students[0], self.students[3]])
+        self.assertEqual(status.unsubmitted, [self.students[i] for i in (1, 2, 4, 5)])
+        self.assertEqual(status.total, 6)
+
+    def test_group_assignment_counts_whole_group(self):
+        assignment = make_assignment(self.course, is_group=True)
+        # 同组两人都提交过，原先的实现会重复移除而出错
+        submit(assignment, self.students[0])
+        submit(assignment, self.students[1])
+        submit(assignment, self.students[3])
+
+        status = submission_status.compute(assignment)
+        self.assertEqual(status.submitted, self.students[:4])
+        self.assertEqual(status.unsubmitted, self.students[4:])
+
+    def test_query_count_is_constant(self):
+        assignment = make_assignment(self.course, is_group=True)
+        submit(assignment, self.students[0])
+        with self.assertNumQueries(3):
+            submission_status.compute(assignment)
+
+        group = models.Group.objects.create(course=self.course, name='第三组')
+        for i in range(40):
+            student = make_student('2021{:03d}'.format(i), self.course)
+            models.GroupMember.objects.create(group=group, student=student, is_head=False)
+            submit(assignment, student, files=2)
+        with self.assertNumQueries(3):
+            self.assertEqual(len(submission_status.compute(assignment).submitted), 43)
+        individual = make_assignment(self.course)
+        with self.assertNumQueries(2):
+            submission_status.compute(individual)
+
+    def test_views(self):
+        assignment = make_assignment(self.course)
+        submit(assignment, self.students[2], files=2)
+        request = forum_request('get', self.course.teacher.user)
+
+        series = json.loads(assignmentfile.submit_info(request, assignment.id).content)['series']
+        self.assertEqual([item['value'] for item in series[0]['data']], [1, 5])
+        res = assignmentfile.unsubmit_list(request, assignment.id)
+        self.assertContains(res, '未提交总人数： 5')
+        self.assertNotContains(res, self.students[2].name)
+
+
+class SubmissionTests(TestCase):
+    def setUp(self):
+        self.course = make_course()
+        self.student = make_student('2020001', self.course)
+        self.assignment = make_assignment(self.course)
+
+    def test_refresh_and_marks(self):
+        self.assertIsNone(submission_status.get(self.assignment.id, self.student.pk))
+        submit(self.assignment, self.student, files=2)
+        submission = submission_status.get(self.assignment.id, self.student.pk)
+        self.assertEqual((submission.submitted, submission.file_count), (True, 2))
+        self.assertEqual(submission.submit_time, models.SubmissionFile.objects.latest('submit_time').submit_time)
+
+        request = RequestFactory().post('/', {'marks': 90, 'max_marks': 100})
+        assignmentfile.marks_enter(request, self.assignment.id, self.student.pk)
+        with self.assertNumQueries(1):
+            res = assignmentfile.marks_get(forum_request('get'), self.assignment.id, self.student.pk)
+        self.assertEqual(json.loads(res.content)['marks'], '90/100')
+        # 分数只有一份，之后上传文件不影响分数
+        self.assertEqual(submit(self.assignment, self.student).marks, 90)
+        self.assertEqual(models.Submission.objects.count(), 1)
+
+        models.SubmissionFile.objects.all().delete()
+        submission = submission_status.refresh(submission_status.get(self.assignment.id, self.student.pk))
+        self.assertEqual((submission.submitted, submission.file_count, submission.submit_time, submission.marks),
+                         (False, 0, None, 90))
+        self.assertEqual(submission_status.compute(self.assignment).submitted, [])
+
+    def test_marks_before_upload(self):
+        request = RequestFactory().post('/', {'marks': 60, 'max_marks': 80})
+        assignmentfile.marks_enter(request, self.assignment.id, self.student.pk)
+        submission = submission_status.get(self.assignment.id, self.student.pk)
+        self.assertEqual((submission.submitted, submission.marks, submission.max_marks), (False, 60, 80))
+        self.assertFalse(models.SubmissionFile.objects.exists())
+        self.assertEqual(submit(self.assignment, self.student).pk, submission.pk)
+
+    def test_teacher_page_lists_each_student_once(self):
+        submit(self.assignment, self.student, files=3)
+        other = make_student('2020002', self.course)
+        submit(self.assignment, other, files=5)
+        # 只打过分、没有上传文件的学生不列出
+        submission_status.set_marks(self.assignment.id, make_student('2020003', self.course).pk, 60, 100)
+        res = assignment_views.assignment_page(forum_request('get', self.course.teacher.user), self.assignment.id)
+        self.assertEqual(res.content.decode().count('<td id="UserID">'), 2)
+
+    def test_file_update_refreshes_both_submissions(self):
+        submit(self.assignment, self.student)
+        other = make_assignment(self.course)
+        file = models.SubmissionFile.objects.get()
+        request = forum_request('post', self.student.user, {'file_name': '改名'})
+        assignmentfile.file_update(request, other.id, file.id)
+
+        old = submission_status.get(self.assignment.id, self.student.pk)
+        new = submission_status.get(other.id, self.student.pk)
+        self.assertEqual((old.submitted, old.file_count), (False, 0))
+        self.assertEqual((new.submitted, new.file_count), (True, 1))
+
+    def test_remind_marks_submitted_assignments(self):
+        group_assignment = make_assignment(self.course, is_group=True)
+        mate = make_student('2020002', self.course)
+        group = models.Group.objects.create(course=self.course, name='第一组')
+        models.GroupMember.objects.create(group=group, student=self.student, is_head=True)
+        models.GroupMember.objects.create(group=group, student=mate, is_head=False)
+        submit(group_assignment, mate)
+        # 同组成员的个人任务不算自己提交
+        submit(self.assignment, mate)
+
+        res = json.loads(assignment_views.remind(forum_request('get', self.student.user)).content)
+        self.assertEqual(res['urls'], ['/assignment/{}/page'.format(pk)
+                                       for pk in (self.assignment.id, group_assignment.id)])
+        self.assertEqual(res['submitted'], [False, True])
+        res = json.loads(assignment_views.remind(forum_request('get', self.course.teacher.user)).content)
+        self.assertEqual(res['count'], 2)
+        self.assertNotIn('submitted', res)
+
+    def test_check_and_rebuild(self):
+        other = make_student('2020002', self.course)
+        submit(self.assignment, self.student, files=2)
+        submit(self.assignment, other)
+        call_command('check_assignment_status', stdout=StringIO())
+
+        # 绕过视图直接改动文件记录，汇总字段随之过期
+        first = submission_status.get(self.assignment.id, self.student.pk)
+        second = submission_status.get(self.assignment.id, other.pk)
+        models.SubmissionFile.objects.create(submission=second, file='submission/b.txt', file_name='补交')
+        models.SubmissionFile.objects.filter(submission=first).delete()
+        total, diffs, _ = submission_status.sync(dry_run=True)
+        self.assertEqual(total, 1)
+        self.assertEqual([(diff.pk, diff.field) for diff in diffs],
+                         [(first.pk, 'submitted'), (first.pk, 'file_count'), (first.pk, 'submit_time'),
+                          (second.pk, 'file_count'), (second.pk, 'submit_time')])
+        with self.assertRaises(CommandError):
+            call_command('check_assignment_status', stdout=StringIO())
+
+        out = StringIO()
+        call_command('rebuild_assignment_status', stdout=out)
+        self.assertIn('已修正 2 行提交', out.getvalue())
+        self.assertEqual(submission_status.sync(dry_run=True)[1], [])
+        self.assertEqual(submission_status.get(self.assignment.id, other.pk).file_count, 2)
+
+
+class SubmissionBatchTests(TestCase):
+    def setUp(self):
+        self.course = make_course()
+        self.assignment = make_assignment(self.course)
+        self.students = [make_student('2020{:03d}'.format(i), self.course) for i in range(30)]
+        for i, student in enumerate(self.students[:20]):
+            submit(self.assignment, student, files=i % 3 + 1)
+        submission_status.set_marks(self.assignment.id, self.students[0].pk, 95, 100)
+        # 打了分但还没有上传文件
+        submission_status.set_marks(self.assignment.id, self.students[25].pk, 0, 50)
+
+    def fetch(self, user):
+        res = assignmentfile.submissions_get(forum_request('get', user), self.assignment.id)
+        if res.status_code != 200:
+            return res.status_code, None
+        return res.status_code, json.loads(b''.join(res.streaming_content))
+
+    def test_returns_every_student_in_two_queries(self):
+        with self.assertNumQueries(2):  # 权限检查 + 连接查询
+            status, data = self.fetch(self.course.teacher.user)
+        students = {item['id']: item for item in data['students']}
+        self.assertEqual(len(students), 21)
+        self.assertEqual(students[self.students[0].pk]['marks'], '95/100')
+        self.assertEqual(len(students[self.students[2].pk]['urls']), 3)
+        self.assertEqual(students[self.students[2].pk]['names'], ['文件0', '文件1', '文件2'])
+        self.assertTrue(students[self.students[2].pk]['urls'][0].endswith('submission/a.txt'))
+        self.assertEqual(students[self.students[25].pk], {'id': self.students[25].pk, 'marks': '0/50',
+                                                          'names': [], 'urls': []})
+
+    def test_only_course_teacher(self):
+        self.assertEqual(self.fetch(self.students[0].user)[0], 403)
+        self.assertEqual(self.fetch(make_course('数据库').teacher.user)[0], 403)
+
+
+class GradebookTests(TestCase):
+    STUDENTS = 500
+    ASSIGNMENTS = 30
+    GROUP_SIZE = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = make_course()
+        models.User.objects.bulk_create(
+            [models.User(username='gb{:04d}'.format(i), password='x', type=1) for i in range(cls.STUDENTS)])
+        users = models.User.objects.filter(username__startswith='gb').order_by('username')
+        models.StudentInfo.objects.bulk_create([models.StudentInfo(user=user, name=user.username) for user in users])
+        cls.students = list(models.StudentInfo.objects.filter(user__in=users).order_by('user__username'))
+        models.StudentCourse.objects.bulk_create(
+            [models.StudentCourse(student=student, course=cls.course) for student in cls.students])
+        models.Group.objects.bulk_create([models.Group(course=cls.course, name='第{}组'.format(i))
+                                          for i in range(cls.STUDENTS // cls.GROUP_SIZE)])
+        groups = list(models.Group.objects.filter(course=cls.course).order_by('id'))
+        models.GroupMember.objects.bulk_create(
+            [models.GroupMember(group=groups[i // cls.GROUP_SIZE], student=student, is_head=i % cls.GROUP_SIZE == 0)
+             for i, student in enumerate(cls.students)])
+        # 每三个任务中有一个小组任务，小组任务由组长提交
+        cls.assignments = [make_assignment(cls.course, is_group=j % 3 == 2) for j in range(cls.ASSIGNMENTS)]
+        models.Submission.objects.bulk_create([
+            models.Submission(assignment=assignment, student=student, submitted=True, file_count=1,
+                              marks=(i + j) % 101, max_marks=100)
+            for j, assignment in enumerate(cls.assignments)
+            for i, student in enumerate(cls.students)
+            if (not assignment.is_group and i % 7) or (assignment.is_group and i % cls.GROUP_SIZE == 0)
+        ])
+
+    def test_full_grid_in_constant_queries(self):
+        with self.assertNumQueries(4):  # 任务、选课学生、小组成员、提交行
+            book = gradebook.build(self.course.id)
+        self.assertEqual(book.marks.shape, (self.STUDENTS, self.ASSIGNMENTS))
+        self.assertEqual(book.students, self.students)
+        # 个人任务：每 7 人有 1 人未提交，按 0/100 计
+        self.assertEqual((book.marks[8, 0], book.submitted[8, 0]), (8, True))
+        self.assertEqual((book.marks[7, 0], book.max_marks[7, 0], book.submitted[7, 0]), (0, 100, False))
+        # 小组任务：组员共用组长的提交
+        self.assertEqual(list(book.marks[5:10, 2]), [7] * 5)
+        self.assertTrue(book.submitted[:, 2].all())
+        totals, max_totals = book.totals
+        self.assertEqual(max_totals[0], 100 * self.ASSIGNMENTS)
+        self.assertEqual(totals[8], sum(row[1] for row in book.row(self.students[8].pk)))
+
+    def test_student_row_in_constant_queries(self):
+        student = self.students[6]
+        with self.assertNumQueries(4):
+            book = gradebook.build(self.course.id, student_id=student.pk)
+        self.assertEqual(book.students, [student])
+        full = gradebook.build(self.course.id)
+        self.assertEqual(book.row(student.pk), full.row(student.pk))
+        self.assertIsNone(book.row(self.students[0].pk))
+
+    def test_group_prefers_submitted_and_ungrouped_keep_own(self):
+        course = make_course('数据库')
+        assignment = make_assignment(course, is_group=True)
+        head, member, alone = (make_student(name, course) for name in ('组长', '组员', '独立'))
+        group = models.Group.objects.create(course=course, name='唯一的组')
+        models.GroupMember.objects.create(group=group, student=head, is_head=True)
+        models.GroupMember.objects.create(group=group, student=member, is_head=False)
+        # 组员只有分数没有文件，组长上传了文件
+        submission_status.set_marks(assignment.id, member.pk, 99, 100)
+        submit(assignment, head)
+        submission_status.set_marks(assignment.id, head.pk, 80, 90)
+        submit(assignment, alone)
+        submission_status.set_marks(assignment.id, alone.pk, 70, 100)
+
+        book = gradebook.build(course.id)
+        self.assertEqual([row[0][1:] for row in map(book.row, (head.pk, member.pk, alone.pk))],
+                         [(80, 90, True), (80, 90, True), (70, 100, True)])
+
+    def test_marks_list_view(self):
+        res = course_views.marks_list(forum_request('get', self.course.teacher.user), self.course.id)
+        self.assertEqual(res.content.decode().count('<td>gb'), 2 * self.STUDENTS)  # 学号、姓名各一列
+
+        res = course_views.marks_list(forum_request('get', self.students[8].user), self.course.id)
+        self.assertContains(res, '<td>8</td>')
+        self.assertEqual(res.content.decode().count('<td>{}</td>'.format(self.assignments[0].id)), 1)
+
+        other = make_course('数据库').teacher.user
+        self.assertEqual(course_views.marks_list(forum_request('get', other), self.course.id).status_code, 302)
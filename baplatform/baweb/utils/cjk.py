@@ -0,0 +1,93 @@
+"""
+中文二元分词（CJK bigram）
+SQLite 的 Python 接口无法注册自定义 FTS5 分词器，因此在写入全文索引前先在 Python 中分好词：
+连续的汉字切成重叠的二元组（“机器学习” -> “机器 器学 学习”），其他文字按单词切分并转小写，
+词之间用空格分隔，再交给 FTS5 的 unicode61 分词器按空格切分
+本模块不依赖 Django（0025 迁移中保存了一份分词规则的副本）
+"""
+
+import html
+import re
+
+CJK_RANGE = '\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+TOKEN_RE = re.compile('(?P<cjk>[{0}]+)|(?P<word>[^\\W_{0}]+)'.format(CJK_RANGE))
+CJK_RE = re.compile('^[{}]+$'.format(CJK_RANGE))
+
+# snippet() 使用的高亮标记，渲染时再替换为 HTML
+MARK_OPEN = '\x02'
+MARK_CLOSE = '\x03'
+ELLIPSIS = '…'
+
+
+def tokens(text):
+    '''把文本切分为索引词列表'''
+    result = []
+    for match in TOKEN_RE.finditer(text or ''):
+        run = match.group('cjk')
+        if run is None:
+            result.append(match.group('word').lower())
+        elif len(run) == 1:
+            result.append(run)
+        else:
+            result.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return result
+
+
+def tokenized(text):
+    '''写入 FTS5 表的文本'''
+    return ' '.join(tokens(text))
+
+
+def match_expression(query):
+    '''把用户输入的关键词转为 FTS5 MATCH 表达式
+
+    每个以空格分隔的关键词都必须出现（AND），关键词内的二元组按短语匹配；
+    单个汉字和英文单词按前缀匹配，接近原来 icontains 的效果
+
+    Returns:
+        str: MATCH 表达式，关键词中没有可检索的内容时返回 None
+    '''
+    terms = []
+    for term in (query or '').split():
+        toks = tokens(term)
+        if not toks:
+            continue
+        phrase = '"{}"'.format(' '.join(toks))
+        if len(toks[-1]) == 1 or not CJK_RE.match(toks[-1]):
+            phrase += '*'
+        terms.append(phrase)
+    return ' AND '.join(terms) or None
+
+
+def restore(snippet):
+    '''把分词后的 snippet() 结果还原为可读文本并转为 HTML
+
+    相邻的重叠二元组合并回原文（“机器 器学 学习” -> “机器学习”），高亮标记替换为 <mark>
+    '''
+    out = []
+    prev = None
+    for piece in (snippet or '').split(' '):
+        if not piece:
+            continue
+        head = piece[:len(piece) - len(piece.lstrip(MARK_OPEN + ELLIPSIS))]
+        core = piece[len(head):]
+        tail = core[len(core.rstrip(MARK_CLOSE + ELLIPSIS)):]
+        core = core[:len(core) - len(tail)]
+
+        merge = (prev and core and CJK_RE.match(prev) and CJK_RE.match(core)
+                 and len(core) == 2 and core[0] == prev[-1])
+        if merge:
+            if MARK_OPEN in head:
+                # 高亮从二元组的第一个字开始，即上一个字之前
+                last = max(i for i, ch in enumerate(out) if ch not in (MARK_OPEN, MARK_CLOSE))
+                out.insert(last, MARK_OPEN)
+            out.append(core[1])
+        else:
+            if out:
+                out.append(' ')
+            out.extend(head)
+            out.extend(core)
+        out.extend(tail)
+        prev = core
+    text = html.escape(''.join(out))
+    return text.replace(MARK_OPEN, '<mark>').replace(MARK_CLOSE, '</mark>')
@@ -0,0 +1,87 @@
+"""
+楼中楼评论树
+PostComment.path 是从根评论到自身的物化路径，一个楼的所有回复都能用 (rootComment, path) 索引一次查出，
+按 path 排序即为先序遍历，在内存中挂到各自的父评论下
+
+页面只展开到 FORUM_COMMENT_DEPTH 层，更深的回复由 comment_replies 接口按需加载
+"""
+
+from django.conf import settings
+
+from baweb import models
+
+# 路径中只有数字和 /，都小于 ~，[path, path + '~') 即为整棵子树
+_PATH_END = '~'
+
+
+def max_depth():
+    return getattr(settings, 'FORUM_COMMENT_DEPTH', 3)
+
+
+def _assemble(parents, rows, limit):
+    '''把按 path 排好序的回复挂到父评论的 children 下
+
+    Args:
+        parents (list[PostComment]): 已有的上层评论
+        rows (iterable[PostComment]): 按 path 排序的回复
+        limit (int): 最多展开到的层级，超过的只在父评论上标记 has_more_replies
+    '''
+    nodes = {comment.pk: comment for comment in parents}
+    for comment in parents:
+        comment.children = []
+        comment.has_more_replies = False
+    for comment in rows:
+        parent = nodes.get(comment.parentComment_id)
+        if parent is None:
+            continue
+        if comment.depth > limit:
+            parent.has_more_replies = True
+            continue
+        comment.children = []
+        comment.has_more_replies = False
+        parent.children.append(comment)
+        nodes[comment.pk] = comment
+    return parents
+
+
+def attach_threads(roots):
+    '''为一页根评论加载回复（一次查询），结果放在每条评论的 children 属性中
+
+    Args:
+        roots (list[PostComment]): 当前页的根评论
+
+    Returns:
+        list[PostComment]: roots
+    '''
+    roots = list(roots)
+    if not roots:
+        return roots
+    limit = max_depth()
+    # 多取一层，只用来判断是否还有更深的回复
+    rows = (models.PostComment.objects.filter(rootComment__in=roots, depth__gte=1, depth__lte=limit + 1)
+            .select_related('author').order_by('rootComment', 'path'))
+    return _assemble(roots, rows, limit)
+
+
+def load_subtree(comment):
+    '''加载某条评论下 FORUM_COMMENT_DEPTH 层以内的回复（一次查询）'''
+    limit = comment.depth + max_depth()
+    rows = (models.PostComment.objects
+            .filter(rootComment_id=comment.rootComment_id, path__gt=comment.path, path__lt=comment.path + _PATH_END,
+                    depth__lte=limit + 1)
+            .select_related('author').order_by('path'))
+    return _assemble([comment], rows, limit)[0]
+
+
+def to_dict(comment):
+    '''评论树转为 JSON 可序列化的字典'''
+    return {
+        'comment_id': comment.commentId,
+        'author': '匿名用户' if comment.isAnonymous else comment.author.username,
+        'content': comment.content,
+        'created_at': comment.createdAt.isoformat(),
+        'like_count': comment.likeCount,
+        'depth': comment.depth,
+        'has_more_replies': comment.has_more_replies,
+        'replies': [to_dict(child) for child in comment.children],
+    }
@@ -0,0 +1,58 @@
+"""
+论坛计数器
+在数据库端原子地调整帖子的点赞/收藏/评论/浏览数（UPDATE ... SET x = x + n），
+避免并发点击时“读取-修改-整行保存”造成的丢失更新，也避免重写 embedding 等大字段；
+调整后的计数通过 events 推送给实时订阅的客户端
+"""
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from baweb import models
+from baweb.utils import events
+
+POST_COUNTER_FIELDS = ('likeCount', 'collectCount', 'commentCount', 'viewCount')
+
+
+def incr_post(post, update_heat=True, **deltas):
+    '''原子地调整帖子计数器
+
+    Args:
+        post (Post): 帖子对象，调整后其计数字段会刷新为数据库中的最新值
+        update_heat (bool): 是否根据最新计数重新计算热度和热门分数
+        **deltas: 计数字段及增量，如 likeCount=1、commentCount=-1
+
+    Returns:
+        dict: 最新的计数值和热度分数
+    '''
+    for field in deltas:
+        if field not in POST_COUNTER_FIELDS:
+            raise ValueError("未知的计数字段: {}".format(field))
+
+    # 计数不会减到 0 以下
+    values = {field: Greatest(F(field) + delta, 0) for field, delta in deltas.items()}
+    with transaction.atomic():
+        # 先写后读：SQLite 事务的第一条语句即获取写锁，避免并发下的锁升级死锁
+        models.Post.objects.filter(pk=post.pk).update(**values)
+        post.refresh_from_db(fields=POST_COUNTER_FIELDS)
+        if update_heat:
+            post.heatScore = post.calculateHeat()
+            post.hotScore = post.calculateHot()
+            post.save(update_fields=['heatScore', 'hotScore'])
+        # 提交后推送给正在查看该帖子的客户端
+        events.publish_on_commit(events.post_channel(post.pk), 'counters',
+                                 {"postId": post.postId, **post_counters(post)})
+    return post_counters(post)
+
+
+def post_counters(post):
+    '''帖子计数器的 JSON 表示'''
+    return {
+        "like_count": post.likeCount,
+        "collect_count": post.collectCount,
+        "comment_count": post.commentCount,
+        "view_count": post.viewCount,
+        "heat_score": post.heatScore,
+        "hot_score": post.hotScore,
+    }
@@ -0,0 +1,66 @@
+"""
+发帖时的相似问题检测
+每篇帖子的 MinHash 签名分段后写入 PostLSHBucket（帖子内容变化时由 baweb/signals.py 更新），
+新帖只需计算自己的签名，按 (课程, 桶号) 索引查出落入相同桶的帖子，
+再对命中段数最多的少量候选计算真实的 Jaccard 相似度确认，耗时与课程帖子总数基本无关
+"""
+
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+
+from baweb import models
+from baweb.utils import minhash
+
+# 参与 Jaccard 确认的候选帖子数上限
+MAX_CANDIDATES = 20
+
+
+def _threshold():
+    return getattr(settings, 'FORUM_DUPLICATE_THRESHOLD', 0.5)
+
+
+def index_post(post):
+    '''重写一篇帖子的 LSH 分桶'''
+    if post.course_id is None:
+        return
+    keys = minhash.bands(minhash.signature(minhash.shingles(post.title, post.content)))
+    with transaction.atomic():
+        models.PostLSHBucket.objects.filter(post_id=post.pk).delete()
+        models.PostLSHBucket.objects.bulk_create(
+            [models.PostLSHBucket(course_id=post.course_id, post_id=post.pk, bucket=key) for key in set(keys)])
+
+
+def find(course_id, title, content, exclude=None, limit=5):
+    '''查找课程内与给定标题、正文相似的帖子
+
+    Args:
+        course_id (int): 课程 id
+        title (str): 标题
+        content (str): 正文
+        exclude (int): 不参与比较的帖子 id（编辑帖子时为帖子本身）
+        limit (int): 最多返回的帖子数
+
+    Returns:
+        list[tuple]: [(帖子, Jaccard 相似度), ...]，按相似度从高到低
+    '''
+    if course_id is None:
+        return []
+    hashes = minhash.shingles(title, content)
+    keys = minhash.bands(minhash.signature(hashes))
+    hits = Counter(models.PostLSHBucket.objects.filter(course_id=course_id, bucket__in=keys)
+                   .values_list('post_id', flat=True))
+    hits.pop(exclude, None)
+    candidates = [pk for pk, _ in hits.most_common(MAX_CANDIDATES)]
+    if not candidates:
+        return []
+
+    threshold = _threshold()
+    scored = []
+    for post in models.Post.objects.filter(pk__in=candidates).only('postId', 'title', 'content'):
+        score = minhash.jaccard(hashes, minhash.shingles(post.title, post.content))
+        if score >= threshold:
+            scored.append((post, score))
+    scored.sort(key=lambda item: (-item[1], -item[0].pk))
+    return scored[:limit]
@@ -0,0 +1,106 @@
+"""
+帖子向量嵌入
+HashingEmbedder 是不依赖模型文件、可离线运行的确定性嵌入：
+对中文二元分词结果做特征哈希（hashing trick），得到 L2 归一化的 768 维向量，
+相同文本在任何进程、任何机器上得到相同的向量
+
+嵌入器可通过 settings.FORUM_EMBEDDER 替换为任意实现了 dim 属性和 embed(texts) 方法的类
+Post.embedding 中的向量以紧凑格式存储，见 encode()
+"""
+
+import hashlib
+import math
+import struct
+
+import numpy as np
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from baweb.utils import cjk
+
+DIM = 768
+
+
+class HashingEmbedder:
+    '''特征哈希嵌入器'''
+    dim = DIM
+
+    def embed(self, texts):
+        '''批量计算嵌入
+
+        Args:
+            texts (list[str]): 文本列表
+
+        Returns:
+            numpy.ndarray: (len(texts), dim) 的 float32 矩阵，每行 L2 归一化
+        '''
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = {}
+            for token in cjk.tokens(text):
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                digest = hashlib.md5(token.encode('utf-8')).digest()
+                index = int.from_bytes(digest[:4], 'little') % self.dim
+                sign = 1.0 if digest[4] & 1 else -1.0
+                # 次线性词频，避免高频词主导
+                matrix[row, index] += sign * (1 + math.log(count))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return matrix / norms
+
+
+# 存储格式的首字节标记。维度为偶数时两种格式的长度都是奇数，可与早期不带标记的 float32（长度为 4 的倍数）区分
+FORMAT_INT8 = 1
+FORMAT_FLOAT16 = 2
+FORMATS = {'int8': FORMAT_INT8, 'float16': FORMAT_FLOAT16}
+
+_embedders = {}
+
+
+def get_embedder():
+    '''返回 settings.FORUM_EMBEDDER 指定的嵌入器，每个进程只实例化一次'''
+    path = getattr(settings, 'FORUM_EMBEDDER', 'baweb.utils.embedding.HashingEmbedder')
+    if path not in _embedders:
+        _embedders[path] = import_string(path)()
+    return _embedders[path]
+
+
+def post_text(post):
+    '''参与嵌入的帖子文本，标题重复一次以提高权重'''
+    return '\n'.join([post.title, post.title, post.content, post.tags or ''])
+
+
+def encode(vector, fmt=None):
+    '''向量转为 Post.embedding 中存储的字节
+
+    - int8（默认）：标记 + float32 缩放系数 + 每维 1 字节，768 维共 773 字节，约为 float32 的 1/4
+    - float16：标记 + 每维 2 字节
+
+    Args:
+        vector: 一维向量
+        fmt (str): 'int8' 或 'float16'，默认取 settings.FORUM_EMBEDDING_FORMAT
+
+    Returns:
+        bytes: 打包后的字节
+    '''
+    fmt = fmt or getattr(settings, 'FORUM_EMBEDDING_FORMAT', 'int8')
+    vector = np.asarray(vector, dtype=np.float32)
+    if FORMATS[fmt] == FORMAT_FLOAT16:
+        return bytes([FORMAT_FLOAT16]) + vector.astype(np.float16).tobytes()
+    peak = float(np.abs(vector).max()) if vector.size else 0.0
+    scale = peak / 127 if peak else 1.0
+    quantized = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+    return bytes([FORMAT_INT8]) + struct.pack('<f', scale) + quantized.tobytes()
+
+
+def decode(blob):
+    '''Post.embedding 中的字节转为 float32 向量'''
+    blob = bytes(blob)
+    if len(blob) % 2 == 1:
+        if blob[0] == FORMAT_INT8:
+            scale, = struct.unpack('<f', blob[1:5])
+            return np.frombuffer(blob, dtype=np.int8, offset=5).astype(np.float32) * scale
+        if blob[0] == FORMAT_FLOAT16:
+            return np.frombuffer(blob, dtype=np.float16, offset=1).astype(np.float32)
+    return np.frombuffer(blob, dtype=np.float32)
@@ -0,0 +1,82 @@
+"""
+帖子嵌入批处理
+帖子保存时 enqueue() 只把 embeddedAt 置空（入队），不在请求中计算嵌入；
+由 embed_posts 命令（建议 cron 每分钟执行）按主键分块取出缺少嵌入或嵌入已过期
+（embeddedAt 早于 updatedAt）的帖子，批量计算嵌入，bulk_update 写回并同步向量索引和相关帖子
+
+每一块单独提交，进程中断后重新执行即可从剩余的帖子继续，已完成的块不会重复计算
+"""
+
+import time
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Q
+
+from baweb import models
+from baweb.utils import embedding, related, vector_index
+
+
+def enqueue(post):
+    '''帖子内容变化后标记为待生成嵌入'''
+    models.Post.objects.filter(pk=post.pk).update(embeddedAt=None)
+    post.embeddedAt = None
+
+
+def pending():
+    '''缺少嵌入或嵌入已过期的帖子'''
+    return models.Post.objects.filter(Q(embeddedAt__isnull=True) | Q(embeddedAt__lt=F('updatedAt')))
+
+
+def embed_batch(posts, embedder=None):
+    '''计算一批帖子的嵌入，写回数据库并更新向量索引和相关帖子
+
+    Args:
+        posts (list[Post]): 至少加载了 course_id、title、content、tags、updatedAt 的帖子
+        embedder: 嵌入器，默认为 embedding.get_embedder()
+    '''
+    embedder = embedder or embedding.get_embedder()
+    vectors = embedder.embed([embedding.post_text(post) for post in posts])
+    by_course = defaultdict(lambda: ([], []))
+    for post, vector in zip(posts, vectors):
+        post.embedding = embedding.encode(vector)
+        # 记录读取时的 updatedAt，期间被再次编辑的帖子仍会被判定为过期
+        post.embeddedAt = post.updatedAt
+        ids, stored = by_course[post.course_id]
+        ids.append(post.pk)
+        stored.append(embedding.decode(post.embedding))
+    with transaction.atomic():
+        models.Post.objects.bulk_update(posts, ['embedding', 'embeddedAt'])
+    for course_id, (ids, stored) in by_course.items():
+        vector_index.VectorIndex(course_id, dim=embedder.dim).upsert(ids, stored)
+        related.update(course_id, ids)
+
+
+def run(batch_size=256, limit=None, embedder=None):
+    '''分块为所有待处理的帖子生成嵌入
+
+    按主键顺序每次只读取一块，且不加载旧的 embedding，内存占用与帖子总数无关
+
+    Args:
+        batch_size (int): 每块帖子数
+        limit (int): 最多处理的帖子数，默认不限
+        embedder: 嵌入器，默认为 embedding.get_embedder()
+
+    Returns:
+        tuple: (处理的帖子数, 耗时秒数)
+    '''
+    started = time.perf_counter()
+    total = 0
+    last_pk = 0
+    while limit is None or total < limit:
+        size = batch_size if limit is None else min(batch_size, limit - total)
+        posts = list(
+            pending().filter(pk__gt=last_pk).order_by('pk')
+            .only('pk', 'course_id', 'title', 'content', 'tags', 'updatedAt')[:size]
+        )
+        if not posts:
+            break
+        embed_batch(posts, embedder)
+        total += len(posts)
+        last_pk = posts[-1].pk
+    return total, time.perf_counter() - started
@@ -0,0 +1,199 @@
+"""
+论坛实时事件（Server-Sent Events）
+论坛写操作在事务提交后把事件发布到进程内的频道（每篇帖子一个、每门课程一个），
+SSE 视图用生成器从频道读取事件写给客户端：
+- 每个频道保留最近 FORUM_EVENT_BUFFER 条事件，客户端断线重连时带上 Last-Event-ID 即可补发漏掉的事件；
+  漏掉的事件已被挤出缓冲区（或来自重启前的进程）时发送 reset 事件，客户端应重新拉取页面数据
+- 超过 FORUM_EVENT_CHANNEL_TTL 秒没有新事件的频道，以及频道数超过 FORUM_EVENT_CHANNELS 时最久没有新事件的频道，
+  在发布时连同缓冲区一起淘汰；之后带着更早的 Last-Event-ID 重连的客户端会收到 reset
+- 没有新事件时生成器阻塞在自己的 Event 上，不查询数据库、不轮询；发布事件只唤醒订阅了该频道的连接。
+  每隔 FORUM_EVENT_HEARTBEAT 秒发送注释行保活，连接保持 FORUM_EVENT_STREAM_SECONDS 秒后结束，由客户端自动重连
+- 事件 id 从进程启动时的毫秒时间戳开始递增，重启后仍大于之前发出的 id
+
+Django 2.2 没有异步视图，流式响应在同步 worker 下会一直占用一个 worker；
+部署时使用 gunicorn.conf.py 中的 gevent 协程 worker，每个连接只占一个协程（threading 被替换为协程版本）
+
+注意：与 LocMemCache 相同，频道是进程内的，多进程部署时各进程只能收到本进程发布的事件
+"""
+
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+
+from django.conf import settings
+from django.db import transaction
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class Broker:
+    '''进程内的发布/订阅，每个频道一个环形缓冲区'''
+
+    def __init__(self, size=None, max_channels=None, ttl=None):
+        self.size = size
+        self.max_channels = max_channels
+        self.ttl = ttl
+        self.started = int(time.time() * 1000)
+        self._ids = itertools.count(self.started)
+        self._last = self.started - 1
+        self._lock = threading.Lock()
+        # 按最近发布时间排序，最久没有新事件的频道在最前
+        self._buffers = OrderedDict()
+        self._published = {}
+        # 已淘汰的频道中最大的事件 id
+        self._evicted = self.started - 1
+        # 每个频道正在等待的连接
+        self._waiters = {}
+        # 每个频道被挤出缓冲区的最后一条事件的 id
+        self._dropped = {}
+
+    def last_id(self):
+        return self._last
+
+    def publish(self, channel, event, data):
+        '''发布事件
+
+        Returns:
+            int: 事件 id
+        '''
+        with self._lock:
+            event_id = next(self._ids)
+            buffer = self._buffers.get(channel)
+            if buffer is None:
+                buffer = self._buffers[channel] = deque(maxlen=self.size or _setting('FORUM_EVENT_BUFFER', 100))
+            else:
+                self._buffers.move_to_end(channel)
+            now = time.monotonic()
+            self._published[channel] = now
+            if len(buffer) == buffer.maxlen:
+                self._dropped[channel] = buffer[0][0]
+            buffer.append((event_id, event, data))
+            self._last = event_id
+            for waiter in self._waiters.get(channel, ()):
+                waiter.set()
+            self._evict(now)
+        return event_id
+
+    def _evict(self, now):
+        '''淘汰空闲过久或超出数量上限的频道（持有锁时调用）'''
+        max_channels = self.max_channels or _setting('FORUM_EVENT_CHANNELS', 1000)
+        ttl = _setting('FORUM_EVENT_CHANNEL_TTL', 600) if self.ttl is None else self.ttl
+        while self._buffers:
+            channel, buffer = next(iter(self._buffers.items()))
+            if len(self._buffers) <= max_channels and now - self._published[channel] <= ttl:
+                break
+            del self._buffers[channel]
+            del self._published[channel]
+            self._dropped.pop(channel, None)
+            self._evicted = max(self._evicted, buffer[-1][0])
+
+    def _collect(self, channels, after):
+        '''id 大于 after 的事件，以及是否有漏掉的事件'''
+        gap = after < self.started - 1
+        events = []
+        for channel in channels:
+            gap = gap or self._dropped.get(channel, 0) > after
+            # 频道可能已被淘汰，无法判断是否漏掉了事件
+            gap = gap or (channel not in self._buffers and self._evicted > after)
+            events.extend(item for item in self._buffers.get(channel, ()) if item[0] > after)
+        events.sort()
+        return events, gap
+
+    def wait(self, channels, after, timeout):
+        '''等待频道中 id 大于 after 的事件，最多等待 timeout 秒
+
+        Returns:
+            tuple: (事件列表 [(id, 事件名, 数据), ...], 是否有漏掉的事件)
+        '''
+        with self._lock:
+            events, gap = self._collect(channels, after)
+            if events or gap or not timeout:
+                return events, gap
+            # 在同一把锁内登记，检查之后发布的事件一定会唤醒这里
+            waiter = threading.Event()
+            for channel in channels:
+                self._waiters.setdefault(channel, set()).add(waiter)
+        try:
+            waiter.wait(timeout)
+        finally:
+            with self._lock:
+                for channel in channels:
+                    waiting = self._waiters[channel]
+                    waiting.discard(waiter)
+                    if not waiting:
+                        del self._waiters[channel]
+                events, gap = self._collect(channels, after)
+        return events, gap
+
+
+broker = Broker()
+
+
+def post_channel(post_id):
+    return 'post:{}'.format(post_id)
+
+
+def course_channel(course_id):
+    return 'course:{}'.format(course_id)
+
+
+def publish(channel, event, data):
+    '''立即发布事件'''
+    return broker.publish(channel, event, data)
+
+
+def publish_on_commit(channel, event, data):
+    '''当前事务提交后发布事件（不在事务中时立即发布），回滚的写操作不会推送给客户端'''
+    transaction.on_commit(lambda: broker.publish(channel, event, data))
+
+
+def parse_last_id(value):
+    '''解析 Last-Event-ID，格式不对时返回 None'''
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _format(event_id, event, data):
+    return 'id: {}\nevent: {}\ndata: {}\n\n'.format(event_id, event, json.dumps(data, ensure_ascii=False))
+
+
+def stream(channels, last_id=None, duration=None, heartbeat=None):
+    '''SSE 事件流生成器
+
+    Args:
+        channels (list[str]): 订阅的频道
+        last_id (int): 客户端收到的最后一个事件 id，为空表示只接收之后的新事件
+        duration (float): 连接保持的秒数，默认取 settings.FORUM_EVENT_STREAM_SECONDS
+        heartbeat (float): 保活间隔秒数，默认取 settings.FORUM_EVENT_HEARTBEAT
+
+    Yields:
+        str: text/event-stream 格式的消息
+    '''
+    duration = duration or _setting('FORUM_EVENT_STREAM_SECONDS', 300)
+    heartbeat = heartbeat or _setting('FORUM_EVENT_HEARTBEAT', 15)
+    deadline = time.monotonic() + duration
+    cursor = broker.last_id() if last_id is None else last_id
+    # 客户端断线后的重连间隔（毫秒）
+    yield 'retry: {}\n\n'.format(_setting('FORUM_EVENT_RETRY_MS', 3000))
+
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        events, gap = broker.wait(channels, cursor, min(heartbeat, remaining))
+        if gap:
+            # 无法补齐漏掉的事件，让客户端重新拉取，之后从当前位置继续
+            cursor = broker.last_id()
+            yield _format(cursor, 'reset', {})
+            continue
+        for event_id, event, data in events:
+            cursor = event_id
+            yield _format(event_id, event, data)
+        if not events:
+            yield ': keepalive\n\n'
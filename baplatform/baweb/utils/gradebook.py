@@ -0,0 +1,132 @@
+"""
+课程成绩册
+一次构建整个课程的 学生 × 任务 成绩矩阵：依次读出任务、选课学生、（有小组任务时）小组成员和课程内全部提交行，
+查询数固定，与学生数、任务数无关。分数、最大分数、是否提交各存为一个 NumPy 矩阵，合计等统计按行向量化计算
+
+小组任务的成绩取该组的提交：组内成员的提交行中优先取已上传文件的，再取分数最高的，全组成员共用；
+不在任何小组中的学生取自己的提交行。没有提交行的格子为 0 分（满分 100），与原先的成绩列表一致
+"""
+
+import numpy as np
+
+from baweb import models
+
+DEFAULT_MAX_MARKS = 100
+
+
+class Gradebook:
+    '''课程成绩矩阵，行为 students，列为 assignments'''
+
+    def __init__(self, students, assignments, marks, max_marks, submitted):
+        self.students = students
+        self.assignments = assignments
+        self.marks = marks
+        self.max_marks = max_marks
+        self.submitted = submitted
+        self._rows = {student.pk: i for i, student in enumerate(students)}
+
+    @property
+    def totals(self):
+        '''每个学生的总分和满分合计'''
+        return self.marks.sum(axis=1), self.max_marks.sum(axis=1)
+
+    def row(self, student_id):
+        '''一个学生的成绩
+
+        Returns:
+            list[tuple]: [(任务, 分数, 最大分数, 是否已提交), ...]，学生不在成绩册中时为 None
+        '''
+        i = self._rows.get(student_id)
+        if i is None:
+            return None
+        return [(assignment, int(self.marks[i, j]), int(self.max_marks[i, j]), bool(self.submitted[i, j]))
+                for j, assignment in enumerate(self.assignments)]
+
+
+def _students(course_id, student_id):
+    '''选课学生（按选课顺序，重复选课只算一次）'''
+    records = models.StudentCourse.objects.filter(course_id=course_id).select_related('student__user').order_by('id')
+    if student_id is not None:
+        records = records.filter(student_id=student_id)
+    students = {}
+    for record in records:
+        students.setdefault(record.student_id, record.student)
+    return list(students.values())
+
+
+def _groups(course_id, student_id):
+    '''课程内的小组成员
+
+    Returns:
+        dict: {学生 id: 所在小组 id 集合}, {小组 id: 成员 id 列表}
+    '''
+    members = models.GroupMember.objects.filter(group__course_id=course_id)
+    if student_id is not None:
+        members = members.filter(group__groupmember_group__student_id=student_id)
+    student_groups, group_members = {}, {}
+    for group_id, member_id in members.values_list('group_id', 'student_id').distinct():
+        student_groups.setdefault(member_id, set()).add(group_id)
+        group_members.setdefault(group_id, []).append(member_id)
+    return student_groups, group_members
+
+
+def build(course_id, student_id=None):
+    '''构建课程成绩册
+
+    Args:
+        course_id (int): 课程 id
+        student_id (int): 只构建这个学生的一行（学生查看自己的成绩），为 None 时构建全部选课学生
+
+    Returns:
+        Gradebook: 成绩矩阵
+    '''
+    assignments = list(models.Assignment.objects.filter(course_id=course_id).order_by('id')
+                       .only('id', 'name', 'is_group', 'course_id'))
+    students = _students(course_id, student_id)
+    rows = {student.pk: i for i, student in enumerate(students)}
+    cols = {assignment.pk: j for j, assignment in enumerate(assignments)}
+    group_cols = {assignment.pk for assignment in assignments if assignment.is_group}
+
+    student_groups, group_members = {}, {}
+    if group_cols and rows:
+        student_groups, group_members = _groups(course_id, student_id)
+
+    submissions = models.Submission.objects.filter(assignment__course_id=course_id)
+    if student_id is not None:
+        submissions = submissions.filter(student_id__in={student_id, *student_groups})
+
+    # (行, 列) -> (是否已提交, 分数, 最大分数)，同一格有多个候选时元组比较取较大者
+    cells = {}
+
+    def offer(row, col, value):
+        if value > cells.get((row, col), (False, -1, 0)):
+            cells[row, col] = value
+
+    group_best = {}
+    if rows:
+        for assignment_id, owner, marks, max_marks, submitted in submissions.values_list(
+                'assignment_id', 'student_id', 'marks', 'max_marks', 'submitted'):
+            value = (submitted, marks, max_marks)
+            if assignment_id in group_cols and owner in student_groups:
+                for group_id in student_groups[owner]:
+                    key = (assignment_id, group_id)
+                    if value > group_best.get(key, (False, -1, 0)):
+                        group_best[key] = value
+            elif owner in rows:
+                offer(rows[owner], cols[assignment_id], value)
+    for (assignment_id, group_id), value in group_best.items():
+        for member in group_members[group_id]:
+            if member in rows:
+                offer(rows[member], cols[assignment_id], value)
+
+    shape = (len(students), len(assignments))
+    marks = np.zeros(shape, dtype=np.int32)
+    max_marks = np.full(shape, DEFAULT_MAX_MARKS, dtype=np.int32)
+    submitted = np.zeros(shape, dtype=bool)
+    if cells:
+        index = tuple(np.array(list(cells), dtype=np.intp).T)
+        values = np.array(list(cells.values()), dtype=np.int32)
+        submitted[index] = values[:, 0].astype(bool)
+        marks[index] = values[:, 1]
+        max_marks[index] = values[:, 2]
+    return Gradebook(students, assignments, marks, max_marks, submitted)
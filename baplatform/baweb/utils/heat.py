@@ -0,0 +1,93 @@
+"""
+帖子热度批量重算
+heatScore 含有时间衰减项，无人互动的帖子热度不会自动下降，
+这里按主键分块读取计数字段，用 NumPy 向量化计算整块的热度，再 bulk_update 写回
+公式与 Post.calculateHeat() / Post.calculateFreshness() 保持一致
+"""
+
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from baweb import models
+from baweb.utils import leaderboard
+
+DAY_US = 24 * 3600 * 10 ** 6
+FRESH_MAX_AGE = 7 * 24 * 3600
+DECAY_MAX_AGE = 30 * 24 * 3600
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _epoch_us(dt):
+    '''datetime 转为微秒时间戳（整数，避免按天取整时的浮点误差）'''
+    return (dt - EPOCH) // timedelta(microseconds=1)
+
+
+def heat_scores(likes, comments, collects, created_us, now):
+    '''向量化计算热度
+
+    Args:
+        likes, comments, collects: 计数数组
+        created_us: 创建时间的微秒时间戳数组（int64）
+        now (datetime): 计算基准时间
+
+    Returns:
+        numpy.ndarray: 热度分数数组
+    '''
+    likes = np.asarray(likes, dtype=np.float64)
+    comments = np.asarray(comments, dtype=np.float64)
+    collects = np.asarray(collects, dtype=np.float64)
+    diff_us = _epoch_us(now) - np.asarray(created_us, dtype=np.int64)
+
+    # 新鲜度：7 天内线性下降，之后按 30 天衰减
+    diff_seconds = diff_us / 10 ** 6
+    freshness = np.where(
+        diff_seconds <= FRESH_MAX_AGE,
+        100 * (1 - diff_seconds / FRESH_MAX_AGE),
+        np.maximum(0, 100 * (1 - diff_seconds / DECAY_MAX_AGE)),
+    )
+    freshness = np.clip(freshness, 0, 100)
+
+    # 时间衰减因子：timedelta.days 为向下取整
+    days = np.floor_divide(diff_us, DAY_US) + 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        decay = np.where(days > 0, 1.0 / np.log(np.maximum(days, 1) + 1), 1.0)
+
+    interaction = likes + comments * 2 + collects * 3
+    heat = interaction * decay * 0.7 + freshness * 0.3
+    return np.maximum(0, heat)
+
+
+def recompute_all(chunk_size=1000, now=None):
+    '''分块重算全部帖子的热度
+
+    只读取计算所需的字段（不加载 content、embedding），内存占用与帖子总数无关
+
+    Args:
+        chunk_size (int): 每块帖子数
+        now (datetime): 计算基准时间，默认为当前时间
+
+    Returns:
+        tuple: (处理的帖子数, 耗时秒数)
+    '''
+    now = now or timezone.now()
+    started = time.perf_counter()
+    total = 0
+    last_pk = 0
+    while True:
+        rows = list(
+            models.Post.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', 'likeCount', 'commentCount', 'collectCount', 'createdAt')[:chunk_size]
+        )
+        if not rows:
+            break
+        pks, likes, comments, collects, created = zip(*rows)
+        scores = heat_scores(likes, comments, collects, [_epoch_us(dt) for dt in created], now)
+        posts = [models.Post(pk=pk, heatScore=float(score)) for pk, score in zip(pks, scores)]
+        models.Post.objects.bulk_update(posts, ['heatScore'])
+        total += len(rows)
+        last_pk = pks[-1]
+    leaderboard.invalidate_all()
+    return total, time.perf_counter() - started
@@ -0,0 +1,96 @@
+"""
+批量点赞、收藏
+前端把一段时间内的点击合并成一组“设置状态”动作（like=true/false、collect=true/false），
+一次请求、一个事务内完成：点赞/收藏记录用 bulk_create(ignore_conflicts=True) 和批量删除写入，
+动作是幂等的，重复提交或并发提交不会违反 (post, user) 唯一约束；
+随后每篇受影响的帖子只做一次计数更新（按记录表重新计数）和一次热度更新
+"""
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from baweb import models
+from baweb.utils import counters, events, leaderboard, trending, user_state
+
+MAX_ACTIONS = 100
+# 动作字段 -> (记录表, 计数字段)
+KINDS = {
+    'like': (models.PostLike, 'likeCount'),
+    'collect': (models.PostCollect, 'collectCount'),
+}
+
+
+def _count(model):
+    '''记录表中每篇帖子的记录数（相关子查询）'''
+    rows = model.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(n=Count('id')).values('n')
+    return Coalesce(Subquery(rows), 0)
+
+
+def set_states(user_id, actions):
+    '''批量设置当前用户对若干帖子的点赞、收藏状态
+
+    Args:
+        user_id (int): 当前用户 id
+        actions (list[dict]): 如 [{"postId": "...", "like": true}, {"postId": "...", "collect": false}]，
+            同一帖子的多个动作以后出现的为准
+
+    Returns:
+        list[dict]: 每篇帖子最终的状态和计数
+    '''
+    desired = {kind: {} for kind in KINDS}
+    for action in actions:
+        for kind in KINDS:
+            if kind in action:
+                desired[kind][action['postId']] = bool(action[kind])
+
+    post_ids = {post_id for states in desired.values() for post_id in states}
+    posts = {post.postId: post for post in models.Post.objects.filter(postId__in=post_ids)}
+    if not posts:
+        return []
+    pks = [post.pk for post in posts.values()]
+
+    with transaction.atomic():
+        # 先锁住受影响的帖子行（SQLite 上即获取写锁），再读取当前状态，
+        # 保证记录趋势用的前后状态差不会与并发请求重复计算
+        models.Post.objects.filter(pk__in=pks).update(likeCount=F('likeCount'))
+        before = {post.pk: (post.has_liked, post.has_collected) for post in user_state.attach(posts.values(), user_id)}
+
+        for kind, (model, _) in KINDS.items():
+            on = [posts[post_id].pk for post_id, state in desired[kind].items() if state and post_id in posts]
+            off = [posts[post_id].pk for post_id, state in desired[kind].items() if not state and post_id in posts]
+            if on:
+                model.objects.bulk_create([model(post_id=pk, user_id=user_id) for pk in on], ignore_conflicts=True)
+            if off:
+                model.objects.filter(user_id=user_id, post_id__in=off).delete()
+
+        models.Post.objects.filter(pk__in=pks).update(
+            **{field: _count(model) for model, field in KINDS.values()})
+        fresh = list(models.Post.objects.filter(pk__in=pks))
+        for post in fresh:
+            post.heatScore = post.calculateHeat()
+            post.hotScore = post.calculateHot()
+        models.Post.objects.bulk_update(fresh, ['heatScore', 'hotScore'])
+
+        user_state.attach(fresh, user_id)
+        trending.record_many([
+            (post, {'likeCount': post.has_liked - before[post.pk][0],
+                    'collectCount': post.has_collected - before[post.pk][1]})
+            for post in fresh
+        ])
+
+    # 没有经过 post_save 信号（见 leaderboard.invalidate_all），逐帖原地更新排行
+    for post in fresh:
+        leaderboard.post_changed(post)
+        events.publish(events.post_channel(post.pk), 'counters',
+                       {"postId": post.postId, **counters.post_counters(post)})
+
+    return [
+        {
+            "postId": post.postId,
+            "liked": post.has_liked,
+            "collected": post.has_collected,
+            **counters.post_counters(post),
+        }
+        for post in fresh
+    ]
@@ -0,0 +1,144 @@
+"""
+游标（keyset）分页
+按排序键的取值定位下一页：WHERE (排序键) < (上一页最后一行的排序键) ORDER BY 排序键 LIMIT n，
+不需要 COUNT(*)，也不需要 OFFSET 跳过前面的行，任何深度的页都只读取 n+1 行
+
+排序键必须能唯一确定顺序（最后一个键用 id），且都按降序排列
+"""
+
+import base64
+import json
+import math
+from datetime import datetime
+
+from django.db import models
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+# 论坛各排序方式对应的排序键
+POST_SORT_KEYS = {
+    'heat': ('heatScore', 'createdAt', 'id'),
+    'newest': ('createdAt', 'id'),
+    'popular': ('viewCount', 'id'),
+    'hot': ('hotScore', 'id'),
+}
+COMMENT_SORT_KEYS = ('createdAt', 'id')
+COLLECT_SORT_KEYS = ('createdAt', 'id')
+
+
+class KeysetPage:
+    '''一页结果，可直接迭代'''
+
+    def __init__(self, object_list, next_cursor=None, prev_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+
+def _encode(direction, values):
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps({'d': direction, 'v': values}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _parse(field, value):
+    '''按排序键的字段类型校验游标中的一个值，不合法时返回 None'''
+    if isinstance(field, models.DateTimeField):
+        if not isinstance(value, str):
+            return None
+        try:
+            return parse_datetime(value)
+        except ValueError:
+            # 格式正确但日期不存在，如 2020-02-30
+            return None
+    if isinstance(value, bool):
+        return None
+    if isinstance(field, models.FloatField):
+        return value if isinstance(value, (int, float)) and math.isfinite(value) else None
+    if isinstance(field, (models.IntegerField, models.AutoField)):
+        return value if isinstance(value, int) else None
+    return None
+
+
+def _decode(cursor, fields):
+    '''解析游标，格式不对或取值与排序键类型不符时返回 None（当作第一页）'''
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw)
+        direction, values = data['d'], data['v']
+    except (ValueError, TypeError, KeyError):
+        return None
+    if direction not in ('next', 'prev') or not isinstance(values, list) or len(values) != len(fields):
+        return None
+    values = [_parse(field, value) for field, value in zip(fields, values)]
+    if any(value is None for value in values):
+        return None
+    return direction, values
+
+
+def _after(keys, values, descending):
+    '''(keys) 在排序中位于 (values) 之后的条件
+
+    展开为 a < va OR (a = va AND b < vb) OR ...，并额外加上 a <= va，使数据库能直接在索引上做范围扫描
+    '''
+    op = 'lt' if descending else 'gt'
+    condition = Q()
+    for i in range(len(keys) - 1, -1, -1):
+        term = Q(**{'{}__{}'.format(keys[i], op): values[i]})
+        equal = Q(**{key: value for key, value in zip(keys[:i], values[:i])})
+        condition = (equal & term) | condition if condition else equal & term
+    return Q(**{'{}__{}e'.format(keys[0], op): values[0]}) & condition
+
+
+def _values(obj, keys):
+    return [getattr(obj, key) for key in keys]
+
+
+def paginate(queryset, keys, cursor=None, page_size=10):
+    '''按排序键对查询集做游标分页
+
+    Args:
+        queryset (QuerySet): 查询集（排序会被替换为 keys 降序）
+        keys (tuple): 排序键，最后一个需唯一（一般是 id）
+        cursor (str): 上一次返回的 next_cursor 或 prev_cursor，为空表示第一页
+        page_size (int): 每页条数
+
+    Returns:
+        KeysetPage: 当前页
+    '''
+    fields = [queryset.model._meta.get_field(key) for key in keys]
+    decoded = _decode(cursor, fields) if cursor else None
+    direction, values = decoded if decoded else ('next', None)
+    backwards = direction == 'prev'
+
+    ordering = [key if backwards else '-' + key for key in keys]
+    query = queryset.order_by(*ordering)
+    if values is not None:
+        query = query.filter(_after(keys, values, descending=not backwards))
+    rows = list(query[:page_size + 1])
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    if not rows:
+        return KeysetPage([])
+    first, last = _encode('prev', _values(rows[0], keys)), _encode('next', _values(rows[-1], keys))
+    if backwards:
+        return KeysetPage(rows, next_cursor=last, prev_cursor=first if more else None)
+    return KeysetPage(rows, next_cursor=last if more else None, prev_cursor=first if values is not None else None)
@@ -0,0 +1,144 @@
+"""
+课程热帖排行缓存
+post_list 的第一页（无关键词、无筛选）按课程和排序方式缓存前 FORUM_LEADERBOARD_SIZE 篇帖子的
+id、排序键和摘要字段；命中时第一页只需一次 id__in 查询取回帖子
+
+帖子保存（点赞、收藏、评论会重算热度并保存）的事务提交后由 baweb/signals.py 原地更新缓存中的排序：
+- 帖子已在排行中：更新排序键后重新排序
+- 帖子不在排行中：排序键超过排行最后一名（或排行未满）时插入
+- 帖子跌出已满的排行：失效，下次访问重建
+删帖时失效；批量重算热度（recompute_heat）后整体失效。
+浏览数由 viewcount 批量写回，不逐条更新，“按热门排序”的排行最多滞后 FORUM_LEADERBOARD_TIMEOUT 秒
+
+注意：默认的 LocMemCache 是进程内缓存，多进程部署时请配置共享缓存。
+原地更新的读改写由进程内的锁串行化，不同进程同时更新同一课程的排行时后写入的会覆盖先写入的，
+被覆盖的帖子排序最多滞后 FORUM_LEADERBOARD_TIMEOUT 秒
+"""
+
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from baweb import models
+from baweb.utils import keyset
+
+KEY_PREFIX = 'forum:board:'
+BOARD_KEY = KEY_PREFIX + '{}:{}:{}'
+VERSION_KEY = KEY_PREFIX + 'version'
+HITS_KEY = KEY_PREFIX + 'hits'
+MISSES_KEY = KEY_PREFIX + 'misses'
+SUMMARY_FIELDS = ('postId', 'title', 'likeCount', 'collectCount', 'commentCount', 'viewCount')
+
+_lock = threading.Lock()
+
+
+def _size():
+    return getattr(settings, 'FORUM_LEADERBOARD_SIZE', 50)
+
+
+def _timeout():
+    return getattr(settings, 'FORUM_LEADERBOARD_TIMEOUT', 300)
+
+
+def _key(course_id, sort_by):
+    # 版本号变化即让所有排行失效
+    return BOARD_KEY.format(cache.get_or_set(VERSION_KEY, 1, None), course_id, sort_by)
+
+
+def _incr(key):
+    cache.add(key, 0, None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+        return 1
+
+
+def _entry(post, keys):
+    '''排行中的一项：(排序键, 摘要)'''
+    return tuple(getattr(post, key) for key in keys), {field: getattr(post, field) for field in SUMMARY_FIELDS}
+
+
+def _build(course_id, sort_by):
+    keys = keyset.POST_SORT_KEYS[sort_by]
+    posts = list(models.Post.objects.filter(course_id=course_id).order_by(*['-' + key for key in keys])[:_size()])
+    board = [_entry(post, keys) for post in posts]
+    cache.set(_key(course_id, sort_by), board, _timeout())
+    return posts
+
+
+def first_page(course_id, sort_by, page_size=10):
+    '''排行第一页
+
+    Args:
+        course_id (int): 课程 id
+        sort_by (str): keyset.POST_SORT_KEYS 中的排序方式
+        page_size (int): 每页条数
+
+    Returns:
+        KeysetPage: 第一页帖子，next_cursor 可直接用于 keyset.paginate 翻页
+    '''
+    keys = keyset.POST_SORT_KEYS[sort_by]
+    board = cache.get(_key(course_id, sort_by))
+    if board is None:
+        _incr(MISSES_KEY)
+        posts = _build(course_id, sort_by)[:page_size + 1]
+    else:
+        _incr(HITS_KEY)
+        # 排序键的最后一项是帖子 id
+        ids = [key[-1] for key, _ in board[:page_size + 1]]
+        found = models.Post.objects.in_bulk(ids)
+        # 缓存与数据库暂时不一致（如帖子刚被删除）时跳过缺失的帖子
+        posts = [found[pk] for pk in ids if pk in found]
+
+    more = len(posts) > page_size
+    posts = posts[:page_size]
+    next_cursor = keyset._encode('next', keyset._values(posts[-1], keys)) if more and posts else None
+    return keyset.KeysetPage(posts, next_cursor=next_cursor)
+
+
+def post_changed(post):
+    '''帖子的排序键变化后原地更新各排序方式的排行（需在事务提交后调用，锁只在进程内有效）'''
+    for sort_by, keys in keyset.POST_SORT_KEYS.items():
+        with _lock:
+            key = _key(post.course_id, sort_by)
+            board = cache.get(key)
+            if board is None:
+                continue
+            full = len(board) >= _size()
+            rest = [item for item in board if item[0][-1] != post.pk]
+            item = _entry(post, keys)
+            if not full or (rest and item[0] > rest[-1][0]):
+                rest.append(item)
+                rest.sort(key=lambda entry: entry[0], reverse=True)
+            elif len(rest) < len(board):
+                # 帖子跌出已满的排行，不知道谁是新的第 N 名，只能失效
+                cache.delete(key)
+                continue
+            cache.set(key, rest[:_size()], _timeout())
+
+
+def post_removed(post):
+    '''帖子删除后使所在课程的排行失效（排行需要补上第 N+1 名）'''
+    cache.delete_many([_key(post.course_id, sort_by) for sort_by in keyset.POST_SORT_KEYS])
+
+
+def invalidate_all():
+    '''使所有排行失效
+
+    bulk_update 和 QuerySet.update() 不触发 post_save 信号，排行无法原地更新，
+    批量修改排序键之后调用
+    '''
+    _incr(VERSION_KEY)
+
+
+def stats():
+    '''缓存命中统计'''
+    hits = cache.get(HITS_KEY) or 0
+    misses = cache.get(MISSES_KEY) or 0
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+    }
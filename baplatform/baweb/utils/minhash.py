@@ -0,0 +1,82 @@
+"""
+MinHash 与 LSH 分桶
+文本规范化后切成字符 k-gram（shingle），用 NUM_PERM 个哈希函数 h(x) = (a*x + b) mod p 计算 MinHash 签名，
+两篇文本签名中相同位置取值相等的比例近似于它们 shingle 集合的 Jaccard 相似度。
+签名分成 BANDS 段、每段 ROWS 个值，每段哈希成一个桶号：Jaccard 为 s 的两篇文本
+至少落入一个相同桶的概率为 1 - (1 - s^ROWS)^BANDS，约在 s = (1/BANDS)^(1/ROWS) ≈ 0.5 处陡增
+
+本模块不依赖 Django（0034 迁移中保存了一份签名和分桶规则的副本）
+"""
+
+import hashlib
+import html
+import re
+import zlib
+
+import numpy as np
+
+SHINGLE = 3
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# 大于 2^32 的素数；a、x 都小于 2^32，a*x + b 不会超出 uint64
+PRIME = 4294967311
+
+_rng = np.random.RandomState(20240601)
+_A = _rng.randint(1, 2 ** 32, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.randint(0, 2 ** 32, size=NUM_PERM, dtype=np.uint64)
+
+TAG_RE = re.compile(r'<[^>]+>')
+# 只保留文字和数字，标点、空白不影响比较
+NOISE_RE = re.compile(r'[\W_]+')
+
+
+def normalize(text):
+    '''去掉 HTML 标签、标点和空白，转小写'''
+    return NOISE_RE.sub('', html.unescape(TAG_RE.sub(' ', text or ''))).lower()
+
+
+def shingles(title, content):
+    '''标题和正文的字符 k-gram 集合（哈希为 32 位整数）'''
+    text = normalize(title) + '\x00' + normalize(content)
+    if len(text) <= SHINGLE:
+        grams = {text}
+    else:
+        grams = {text[i:i + SHINGLE] for i in range(len(text) - SHINGLE + 1)}
+    return {zlib.crc32(gram.encode()) for gram in grams}
+
+
+def signature(hashes):
+    '''MinHash 签名
+
+    Args:
+        hashes (set[int]): shingles() 的结果
+
+    Returns:
+        numpy.ndarray: NUM_PERM 个 uint64
+    '''
+    values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+    if not len(values):
+        return np.full(NUM_PERM, PRIME, dtype=np.uint64)
+    return ((np.outer(_A, values) + _B[:, None]) % np.uint64(PRIME)).min(axis=1)
+
+
+def bands(sig):
+    '''每段签名的桶号（含段号，不同段的桶不会混淆），可直接存入 BigIntegerField
+
+    Returns:
+        list[int]: BANDS 个有符号 64 位整数
+    '''
+    keys = []
+    for band in range(BANDS):
+        digest = hashlib.blake2b(sig[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8,
+                                 salt=band.to_bytes(2, 'big')).digest()
+        keys.append(int.from_bytes(digest, 'big', signed=True))
+    return keys
+
+
+def jaccard(a, b):
+    '''两个 shingle 集合的 Jaccard 相似度'''
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
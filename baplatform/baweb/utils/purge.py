@@ -0,0 +1,118 @@
+"""
+帖子软删除与后台清理
+热门帖子可能有成千上万条评论、点赞、收藏，在请求里 post.delete() 级联删除会长时间占用 SQLite 写锁。
+删帖时只标记 deletedAt（默认管理器随即不再返回该帖子），并立即撤下全文索引、向量索引、
+标签计数、相关帖子、热门统计和排行缓存；评论等关联数据由 purge_deleted_posts 命令按批删除，
+每批一个短事务，批与批之间暂停，让出写锁给在线请求
+"""
+
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from baweb import models
+from baweb.utils import events, leaderboard, related, search, tags, vector_index
+
+# 按批删除的关联数据：(模型, 关联条件, 删除顺序)
+# 评论按深度从深到浅删除，每批中评论的回复已经删除或在同一批中，级联不会扩散
+DEPENDENTS = (
+    (models.PostComment, lambda pk: Q(post_id=pk), ('-depth', '-pk')),
+    (models.PostLike, lambda pk: Q(post_id=pk), ('pk',)),
+    (models.PostCollect, lambda pk: Q(post_id=pk), ('pk',)),
+    (models.PostActivity, lambda pk: Q(post_id=pk), ('pk',)),
+    (models.RelatedPost, lambda pk: Q(post_id=pk) | Q(related_id=pk), ('pk',)),
+)
+
+
+def soft_delete(post):
+    '''软删除帖子，立即对所有列表、检索隐藏
+
+    Args:
+        post (Post): 帖子
+
+    Returns:
+        bool: 是否删除成功（帖子已被删除时为 False）
+    '''
+    with transaction.atomic():
+        # 先写后读，原因见 counters.incr_post
+        if not models.Post.objects.filter(pk=post.pk).update(deletedAt=timezone.now()):
+            return False
+        # 标签计数立即扣减；关联记录一并删除，清理时 pre_delete 信号不会重复扣减
+        tags.remove_post(post)
+        models.PostTag.objects.filter(post=post).delete()
+        referrers = list(models.RelatedPost.objects.filter(related=post).values_list('post_id', flat=True))
+        models.RelatedPost.objects.filter(Q(post=post) | Q(related=post)).delete()
+        # 热门统计按时间桶保存，每篇帖子只有窗口内的少量行，直接删除使其立即退出热门
+        models.PostActivity.objects.filter(post=post).delete()
+
+    search.remove_post(post.pk)
+    vector_index.remove_post(post)
+    leaderboard.post_removed(post)
+    if referrers:
+        related.refresh(post.course_id, referrers)
+    events.publish(events.course_channel(post.course_id), 'post_deleted', {"postId": post.postId})
+    return True
+
+
+def _batch_size():
+    return getattr(settings, 'FORUM_PURGE_BATCH_SIZE', 500)
+
+
+def _pause():
+    return getattr(settings, 'FORUM_PURGE_PAUSE', 0.05)
+
+
+def purge_post(post, batch_size=None, pause=None):
+    '''分批删除一篇已软删除帖子的关联数据，最后删除帖子本身
+
+    Returns:
+        int: 删除的关联记录数
+    '''
+    batch_size = batch_size or _batch_size()
+    pause = _pause() if pause is None else pause
+    total = 0
+    for model, condition, ordering in DEPENDENTS:
+        while True:
+            ids = list(model.objects.filter(condition(post.pk)).order_by(*ordering)
+                       .values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            with transaction.atomic():
+                model.objects.filter(pk__in=ids).delete()
+            total += len(ids)
+            # 两批之间让出写锁
+            if pause:
+                time.sleep(pause)
+    post.delete()
+    return total
+
+
+def purge(limit=None, batch_size=None, pause=None):
+    '''清理所有已软删除的帖子，先删除的先清理
+
+    Args:
+        limit (int): 最多清理的帖子数
+        batch_size (int): 每批删除的关联记录数，默认取 settings.FORUM_PURGE_BATCH_SIZE
+        pause (float): 两批之间暂停的秒数，默认取 settings.FORUM_PURGE_PAUSE
+
+    Returns:
+        tuple: (清理的帖子数, 删除的关联记录数, 耗时秒数)
+    '''
+    started = time.perf_counter()
+    posts = models.Post.all_objects.filter(deletedAt__isnull=False).order_by('deletedAt')
+    if limit:
+        posts = posts[:limit]
+    # 先取出全部 id，清理过程中不保持对同一张表的查询游标
+    ids = list(posts.values_list('pk', flat=True))
+    purged = rows = 0
+    for pk in ids:
+        post = models.Post.all_objects.filter(pk=pk).first()
+        if post is None:
+            # 已被另一个清理进程删除
+            continue
+        rows += purge_post(post, batch_size, pause)
+        purged += 1
+    return purged, rows, time.perf_counter() - started
@@ -0,0 +1,111 @@
+"""
+论坛计数器校对
+Post 的 likeCount、collectCount、commentCount 是冗余计数，由视图逐次增减维护，
+历史数据或异常中断后可能与 PostLike、PostCollect、PostComment 中的记录不一致。
+这里按主键分块，每块对三张记录表各做一次 GROUP BY post_id 计数（post_id 范围条件可走外键索引），
+与帖子中保存的计数比较，只对不一致的帖子 bulk_update 计数和热度
+
+PostComment.likeCount 没有逐条的点赞记录，无法重新计数，只把负数修正为 0
+"""
+
+import time
+
+from django.db.models import Count
+
+from baweb import models
+from baweb.utils import leaderboard
+
+# 计数字段 -> 记录表
+POST_COUNTER_SOURCES = {
+    'likeCount': models.PostLike,
+    'collectCount': models.PostCollect,
+    'commentCount': models.PostComment,
+}
+
+
+class Diff:
+    '''一条不一致的计数'''
+
+    def __init__(self, model, pk, field, stored, actual):
+        self.model = model
+        self.pk = pk
+        self.field = field
+        self.stored = stored
+        self.actual = actual
+
+    def __str__(self):
+        return '{}#{} {}: {} -> {}'.format(self.model, self.pk, self.field, self.stored, self.actual)
+
+
+def _counts(model, low, high):
+    '''记录表中 post_id 在 [low, high] 内的每篇帖子的记录数'''
+    return dict(
+        model.objects.filter(post_id__gte=low, post_id__lte=high)
+        .values('post_id').annotate(n=Count('id')).order_by().values_list('post_id', 'n')
+    )
+
+
+def _posts_chunk(last_pk, chunk_size, dry_run):
+    '''校对一块帖子
+
+    Returns:
+        tuple: (最后一篇帖子的主键, 本块帖子数, 不一致列表)，没有更多帖子时主键为 None
+    '''
+    rows = list(
+        models.Post.objects.filter(pk__gt=last_pk).order_by('pk')
+        .values_list('pk', 'createdAt', *POST_COUNTER_SOURCES)[:chunk_size]
+    )
+    if not rows:
+        return None, 0, []
+    low, high = rows[0][0], rows[-1][0]
+    actual = {field: _counts(model, low, high) for field, model in POST_COUNTER_SOURCES.items()}
+
+    diffs = []
+    changed = []
+    for pk, created_at, *stored in rows:
+        values = dict(zip(POST_COUNTER_SOURCES, stored))
+        post_diffs = [
+            Diff('Post', pk, field, values[field], actual[field].get(pk, 0))
+            for field in POST_COUNTER_SOURCES if values[field] != actual[field].get(pk, 0)
+        ]
+        if post_diffs:
+            diffs.extend(post_diffs)
+            post = models.Post(pk=pk, createdAt=created_at,
+                               **{field: actual[field].get(pk, 0) for field in POST_COUNTER_SOURCES})
+            post.heatScore = post.calculateHeat()
+            post.hotScore = post.calculateHot()
+            changed.append(post)
+    if changed and not dry_run:
+        models.Post.objects.bulk_update(changed, [*POST_COUNTER_SOURCES, 'heatScore', 'hotScore'])
+    return high, len(rows), diffs
+
+
+def reconcile(chunk_size=5000, dry_run=False):
+    '''分块校对全部论坛计数
+
+    Args:
+        chunk_size (int): 每块帖子数
+        dry_run (bool): 只报告不一致，不写回
+
+    Returns:
+        tuple: (检查的帖子数, 不一致列表, 耗时秒数)
+    '''
+    started = time.perf_counter()
+    total = 0
+    diffs = []
+    last_pk = 0
+    while True:
+        last_pk, count, chunk_diffs = _posts_chunk(last_pk, chunk_size, dry_run)
+        if last_pk is None:
+            break
+        total += count
+        diffs.extend(chunk_diffs)
+
+    negative = models.PostComment.objects.filter(likeCount__lt=0)
+    diffs.extend(Diff('PostComment', pk, 'likeCount', stored, 0)
+                 for pk, stored in negative.values_list('pk', 'likeCount'))
+    if not dry_run:
+        negative.update(likeCount=0)
+        if diffs:
+            leaderboard.invalidate_all()
+    return total, diffs, time.perf_counter() - started
@@ -0,0 +1,98 @@
+"""
+相关帖子推荐
+每篇帖子在 RelatedPost 表中保存同课程内嵌入最相似的 k 篇帖子（按 rank 排序），
+post_detail 只需按 (post, rank) 索引查询一次，不在请求中计算相似度
+
+帖子的嵌入更新后（embedding_pipeline），只重算该帖子以及近邻列表受它影响的帖子（一次矩阵乘法找出）；
+rebuild_related_posts 命令可全量重建
+"""
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+
+from baweb import models
+from baweb.utils import vector_index
+
+
+def _k():
+    return getattr(settings, 'FORUM_RELATED_K', 5)
+
+
+def refresh(course_id, post_ids):
+    '''重算若干帖子的近邻列表并写入 RelatedPost
+
+    Args:
+        course_id (int): 课程 id
+        post_ids (list[int]): 帖子 id（不在向量索引中的帖子只清空列表）
+
+    Returns:
+        dict: {post_id: [(related_id, score), ...]}
+    '''
+    k = _k()
+    index = vector_index.VectorIndex(course_id)
+    found, vectors = index.vectors(list(post_ids))
+    lists = {}
+    if found:
+        # 多取一个，结果中包含帖子自身
+        for post_id, hits in zip(found, index.search(vectors, k + 1)):
+            lists[post_id] = [(related_id, score) for related_id, score in hits if related_id != post_id][:k]
+        # 索引文件与数据库不同步时（如恢复了旧的数据库）跳过已不存在的帖子
+        existing = set(models.Post.objects.filter(
+            pk__in={related_id for hits in lists.values() for related_id, _ in hits}).values_list('pk', flat=True))
+        lists = {post_id: [hit for hit in hits if hit[0] in existing] for post_id, hits in lists.items()}
+
+    with transaction.atomic():
+        models.RelatedPost.objects.filter(post_id__in=list(post_ids)).delete()
+        models.RelatedPost.objects.bulk_create([
+            models.RelatedPost(post_id=post_id, related_id=related_id, rank=rank, score=score)
+            for post_id, hits in lists.items()
+            for rank, (related_id, score) in enumerate(hits)
+        ])
+    return lists
+
+
+def update(course_id, post_ids):
+    '''若干帖子的嵌入变化后增量刷新近邻
+
+    除了这些帖子自己，还要刷新：
+    - 原来把它们列为近邻的帖子（相似度可能变低）
+    - 与它们的相似度超过自身列表中第 k 名的帖子（需要把它们加进列表）
+    '''
+    post_ids = set(post_ids)
+    k = _k()
+    index = vector_index.VectorIndex(course_id)
+    found, vectors = index.vectors(list(post_ids))
+    affected = set(models.RelatedPost.objects.filter(related_id__in=post_ids).values_list('post_id', flat=True))
+    if found:
+        ids, scores = index.scores(vectors)
+        best = scores.max(axis=0)
+        thresholds = dict(
+            models.RelatedPost.objects.filter(post__course_id=course_id).values('post_id')
+            .annotate(count=Count('id'), lowest=Min('score')).filter(count__gte=k)
+            .values_list('post_id', 'lowest')
+        )
+        for post_id, score in zip(ids.tolist(), best.tolist()):
+            if post_id >= 0 and score > thresholds.get(post_id, -np.inf):
+                affected.add(post_id)
+    refresh(course_id, post_ids | affected)
+
+
+def rebuild(course_id, chunk_size=512):
+    '''全量重建一门课程所有帖子的近邻列表
+
+    Returns:
+        int: 处理的帖子数
+    '''
+    post_ids = list(models.Post.objects.filter(course_id=course_id, embedding__isnull=False)
+                    .order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(post_ids), chunk_size):
+        refresh(course_id, post_ids[start:start + chunk_size])
+    return len(post_ids)
+
+
+def related_posts(post):
+    '''帖子的相关帖子列表（一次查询）'''
+    rows = models.RelatedPost.objects.filter(post=post).select_related('related').order_by('rank')
+    return [row.related for row in rows]
@@ -0,0 +1,98 @@
+"""
+论坛全文检索
+基于 SQLite FTS5 虚拟表 baweb_post_fts（rowid 即 Post.id），索引标题、内容和标签的二元分词结果，
+按 BM25 排序并用 snippet() 为当前页生成高亮摘要。索引由 baweb/signals.py 在帖子保存、删除时同步
+当前数据库不支持 FTS5 时退回到 icontains 查询
+"""
+
+from django.db import connection
+from django.db.models import Q
+
+from baweb.utils import cjk
+
+FTS_TABLE = 'baweb_post_fts'
+# BM25 列权重：标题、内容、标签
+BM25_WEIGHTS = (10.0, 1.0, 5.0)
+SNIPPET_TOKENS = 24
+
+_available = None
+
+
+def available():
+    '''当前数据库是否已建立全文索引表'''
+    global _available
+    if _available is None:
+        _available = connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+    return _available
+
+
+def index_post(post):
+    '''写入或更新一篇帖子的索引'''
+    if not available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM {} WHERE rowid = %s'.format(FTS_TABLE), [post.pk])
+        cursor.execute(
+            'INSERT INTO {}(rowid, title, content, tags) VALUES (%s, %s, %s, %s)'.format(FTS_TABLE),
+            [post.pk, cjk.tokenized(post.title), cjk.tokenized(post.content), cjk.tokenized(post.tags)],
+        )
+
+
+def remove_post(post_pk):
+    '''删除一篇帖子的索引'''
+    if not available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM {} WHERE rowid = %s'.format(FTS_TABLE), [post_pk])
+
+
+def search(posts_query, keyword, order_by_rank=True):
+    '''在帖子查询集上应用关键词检索
+
+    Args:
+        posts_query (QuerySet): 帖子查询集
+        keyword (str): 用户输入的关键词
+        order_by_rank (bool): 是否按 BM25 相关度排序
+
+    Returns:
+        QuerySet: 带有 search_rank 字段的查询集
+    '''
+    expression = cjk.match_expression(keyword)
+    if not available() or expression is None:
+        return posts_query.filter(Q(title__icontains=keyword) | Q(content__icontains=keyword))
+
+    weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+    # rowid 前加一元 + 使其不能作为 FTS5 的 rowid 查找条件，
+    # 迫使 SQLite 先用 MATCH 扫描索引再按主键回表，而不是遍历课程下的所有帖子逐行 MATCH
+    query = posts_query.extra(
+        tables=[FTS_TABLE],
+        where=['baweb_post.id = +{0}.rowid'.format(FTS_TABLE), '{} MATCH %s'.format(FTS_TABLE)],
+        params=[expression],
+        select={'search_rank': 'bm25({}, {})'.format(FTS_TABLE, weights)},
+    )
+    if order_by_rank:
+        # bm25() 越小越相关
+        query = query.order_by('search_rank', '-id')
+    return query
+
+
+def highlight(posts, keyword):
+    '''为当前页的帖子生成高亮摘要 post.search_snippet（HTML）
+
+    snippet() 开销较大，只对当前页的帖子单独查询一次，而不是放进检索查询里对所有命中行计算
+    '''
+    posts = list(posts)
+    expression = cjk.match_expression(keyword)
+    if not posts or not available() or expression is None:
+        return posts
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT rowid, snippet({0}, 1, char(2), char(3), '{1}', {2}) FROM {0} "
+            "WHERE {0} MATCH %s AND rowid IN ({3})".format(
+                FTS_TABLE, cjk.ELLIPSIS, SNIPPET_TOKENS, ', '.join(['%s'] * len(posts))),
+            [expression] + [post.pk for post in posts],
+        )
+        snippets = dict(cursor.fetchall())
+    for post in posts:
+        post.search_snippet = cjk.restore(snippets.get(post.pk, ''))
+    return posts
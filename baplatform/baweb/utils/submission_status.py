@@ -0,0 +1,195 @@
+"""
+作业提交情况
+Submission 为每个 (任务, 学生) 保存一行：分数，以及由 SubmissionFile 汇总的是否已提交、最近提交时间、文件数。
+上传、删除文件时先用 lock() 取得提交行，写入文件后在同一事务中调用 refresh() 重新汇总，
+页面只需按 (任务, 学生) 或 (任务, 是否已提交) 索引读取，不再扫描每个文件一行的记录
+
+统计提交情况时一次读出课程选课学生、已提交学生 id 以及（小组任务时）课程内全部小组成员，
+之后在 Python 中用集合判断每个学生是否已提交：
+小组任务中，组内任一成员提交即视为全组已提交。查询数与选课人数、提交文件数无关
+
+汇总字段可以用 sync() 按文件记录校对或重建（见 check_assignment_status、rebuild_assignment_status 命令）
+"""
+
+import time
+
+from django.db import transaction
+from django.db.models import Count, Max
+
+from baweb import models
+from baweb.utils.reconcile import Diff
+
+
+class SubmissionStatus:
+    '''一次统计的结果，学生列表按选课顺序排列'''
+
+    def __init__(self, submitted, unsubmitted):
+        self.submitted = submitted
+        self.unsubmitted = unsubmitted
+
+    @property
+    def total(self):
+        return len(self.submitted) + len(self.unsubmitted)
+
+
+def lock(assignment_id, student_id):
+    '''取出并锁定一名学生的提交行（不存在时创建），需在事务中调用
+
+    Args:
+        assignment_id (int): 任务 id
+        student_id (int): 学生 id（StudentInfo 主键）
+
+    Returns:
+        Submission: 提交行
+    '''
+    submission, _ = models.Submission.objects.select_for_update().get_or_create(
+        assignment_id=assignment_id, student_id=student_id)
+    return submission
+
+
+def refresh(submission):
+    '''按文件记录重新汇总提交行，分数保持不变
+
+    Args:
+        submission (Submission): 提交行，应已在当前事务中由 lock() 锁定，
+            并发上传时后提交的事务能看到先提交的文件
+
+    Returns:
+        Submission: 更新后的提交行
+    '''
+    summary = submission.files.aggregate(count=Count('id'), latest=Max('submit_time'))
+    submission.file_count = summary['count']
+    submission.submitted = summary['count'] > 0
+    submission.submit_time = summary['latest']
+    submission.save(update_fields=['file_count', 'submitted', 'submit_time'])
+    return submission
+
+
+def set_marks(assignment_id, student_id, marks, max_marks):
+    '''给一名学生的任务打分
+
+    Returns:
+        Submission: 更新后的提交行
+    '''
+    with transaction.atomic():
+        submission = lock(assignment_id, student_id)
+        submission.marks = marks
+        submission.max_marks = max_marks
+        submission.save(update_fields=['marks', 'max_marks'])
+    return submission
+
+
+def get(assignment_id, student_id):
+    '''一名学生的提交行，没有提交过也没有打过分时为 None'''
+    return models.Submission.objects.filter(assignment_id=assignment_id, student_id=student_id).first()
+
+
+def _enrolled(course_id):
+    '''课程选课学生（按选课顺序，重复选课只算一次）'''
+    students = {}
+    for record in (models.StudentCourse.objects.filter(course_id=course_id)
+                   .select_related('student').order_by('id')):
+        students.setdefault(record.student_id, record.student)
+    return list(students.values())
+
+
+def submitted_ids(assignment):
+    '''已提交（小组任务中含同组成员）的学生 id 集合
+
+    Args:
+        assignment (Assignment): 任务
+
+    Returns:
+        set[int]: 学生 id（StudentInfo 主键）
+    '''
+    submitters = set(models.Submission.objects.filter(assignment_id=assignment.pk, submitted=True)
+                     .values_list('student_id', flat=True))
+    if not assignment.is_group or not submitters:
+        return submitters
+
+    members = (models.GroupMember.objects.filter(group__course_id=assignment.course_id)
+               .values_list('group_id', 'student_id'))
+    groups = {}
+    for group_id, student_id in members:
+        groups.setdefault(group_id, set()).add(student_id)
+    done = set(submitters)
+    for group in groups.values():
+        if not group.isdisjoint(submitters):
+            done |= group
+    return done
+
+
+def compute(assignment):
+    '''统计任务的已提交、未提交学生
+
+    Args:
+        assignment (Assignment): 任务
+
+    Returns:
+        SubmissionStatus: 已提交、未提交学生（StudentInfo）列表
+    '''
+    done = submitted_ids(assignment)
+    submitted, unsubmitted = [], []
+    for student in _enrolled(assignment.course_id):
+        (submitted if student.pk in done else unsubmitted).append(student)
+    return SubmissionStatus(submitted, unsubmitted)
+
+
+def submitted_assignments(student_id):
+    '''学生已提交（小组任务中含同组成员提交）的任务 id 集合
+
+    Args:
+        student_id (int): 学生 id（StudentInfo 主键）
+
+    Returns:
+        set[int]: 任务 id
+    '''
+    # 同组成员所在小组的课程：同组成员的提交只对该课程的小组任务有效
+    mates = {}
+    for course_id, mate_id in (models.GroupMember.objects
+                               .filter(group__groupmember_group__student_id=student_id)
+                               .values_list('group__course_id', 'student_id')):
+        mates.setdefault(mate_id, set()).add(course_id)
+    mates.pop(student_id, None)
+
+    rows = (models.Submission.objects.filter(student_id__in=[student_id, *mates], submitted=True)
+            .values_list('assignment_id', 'student_id', 'assignment__is_group', 'assignment__course_id'))
+    return {assignment_id for assignment_id, owner, is_group, course_id in rows
+            if owner == student_id or (is_group and course_id in mates[owner])}
+
+
+def _sync_assignment(assignment_id, dry_run):
+    submissions = (models.Submission.objects.filter(assignment_id=assignment_id)
+                   .annotate(count=Count('files'), latest=Max('files__submit_time')).order_by('id'))
+    diffs = []
+    changed = []
+    for submission in submissions:
+        actual = {'submitted': submission.count > 0, 'file_count': submission.count, 'submit_time': submission.latest}
+        row_diffs = [Diff('Submission', submission.pk, field, getattr(submission, field), value)
+                     for field, value in actual.items() if getattr(submission, field) != value]
+        if row_diffs:
+            diffs.extend(row_diffs)
+            for field, value in actual.items():
+                setattr(submission, field, value)
+            changed.append(submission)
+    if changed and not dry_run:
+        models.Submission.objects.bulk_update(changed, ['submitted', 'file_count', 'submit_time'])
+    return diffs
+
+
+def sync(dry_run=False):
+    '''按文件记录逐个任务校对提交行的汇总字段，只写回不一致的行
+
+    Args:
+        dry_run (bool): 只报告不一致，不写回
+
+    Returns:
+        tuple: (检查的任务数, 不一致列表, 耗时秒数)
+    '''
+    started = time.perf_counter()
+    assignment_ids = list(models.Assignment.objects.order_by('id').values_list('id', flat=True))
+    diffs = []
+    for assignment_id in assignment_ids:
+        with transaction.atomic():
+            diffs.extend(_sync_assignment(assignment_id, dry_run))
+    return len(assignment_ids), diffs, time.perf_counter() - started
@@ -0,0 +1,82 @@
+"""
+帖子标签
+Post.tags 仍保存用户输入的逗号分隔字符串，保存时同步到 Tag / PostTag，
+并增量维护每门课程各标签的帖子数 CourseTag.postCount，按标签筛选和热门标签都只读索引
+同步由 baweb/signals.py 在帖子保存、删除时调用
+"""
+
+import re
+
+from django.db import transaction
+from django.db.models import F
+
+from baweb import models
+
+MAX_LENGTH = 64
+_SEPARATORS = re.compile(r'[,，、;；]')
+
+
+def parse(tags):
+    '''把逗号分隔的标签字符串拆成去重后的标签名列表（保持原顺序）'''
+    names = []
+    for name in _SEPARATORS.split(tags or ''):
+        name = name.strip()[:MAX_LENGTH]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def _tag_ids(names):
+    '''标签名对应的 Tag id，不存在的先创建'''
+    if not names:
+        return set()
+    existing = dict(models.Tag.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = [name for name in names if name not in existing]
+    if missing:
+        models.Tag.objects.bulk_create([models.Tag(name=name) for name in missing], ignore_conflicts=True)
+        existing.update(models.Tag.objects.filter(name__in=missing).values_list('name', 'id'))
+    return set(existing.values())
+
+
+def _adjust(course_id, tag_ids, delta):
+    '''数据库端原子增减课程标签计数'''
+    if not tag_ids:
+        return
+    if delta > 0:
+        models.CourseTag.objects.bulk_create(
+            [models.CourseTag(course_id=course_id, tag_id=tag_id) for tag_id in tag_ids], ignore_conflicts=True)
+    models.CourseTag.objects.filter(course_id=course_id, tag_id__in=tag_ids).update(postCount=F('postCount') + delta)
+
+
+def sync_post(post):
+    '''按 post.tags 更新帖子的标签关联和课程标签计数（只处理增删的标签）'''
+    tag_ids = _tag_ids(parse(post.tags))
+    current = set(models.PostTag.objects.filter(post=post).values_list('tag_id', flat=True))
+    added, removed = tag_ids - current, current - tag_ids
+    if not added and not removed:
+        return
+    with transaction.atomic():
+        if removed:
+            models.PostTag.objects.filter(post=post, tag_id__in=removed).delete()
+            _adjust(post.course_id, removed, -1)
+        if added:
+            models.PostTag.objects.bulk_create([models.PostTag(post=post, tag_id=tag_id) for tag_id in added])
+            _adjust(post.course_id, added, 1)
+
+
+def remove_post(post):
+    '''帖子删除前扣减课程标签计数（关联记录随帖子级联删除）'''
+    tag_ids = set(models.PostTag.objects.filter(post=post).values_list('tag_id', flat=True))
+    _adjust(post.course_id, tag_ids, -1)
+
+
+def popular(course_id, limit=20):
+    '''课程内帖子数最多的标签
+
+    Returns:
+        list[tuple]: [(标签名, 帖子数), ...]
+    '''
+    return list(
+        models.CourseTag.objects.filter(course_id=course_id, postCount__gt=0)
+        .order_by('-postCount', 'tag__name').values_list('tag__name', 'postCount')[:limit]
+    )
@@ -0,0 +1,140 @@
+"""
+趋势统计
+每次点赞、收藏、评论（及其撤销）时，把加权后的互动量累加到帖子和帖子各标签当前小时的时间桶
+（PostActivity / TagActivity）。“最近 N 小时”的趋势只需对窗口内的时间桶求和，
+不再扫描 PostLike、PostCollect、PostComment；超出保留时长的时间桶由 prune_trending 命令清理
+
+窗口包含当前（未满的）小时和之前 N-1 个整点小时
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from baweb import models
+
+# 互动权重，与 Post.calculateHeat() 一致
+WEIGHTS = {'likeCount': 1, 'commentCount': 2, 'collectCount': 3}
+
+
+def bucket(now=None):
+    '''时间所在的小时桶'''
+    return (now or timezone.now()).replace(minute=0, second=0, microsecond=0)
+
+
+def window_start(hours, now=None):
+    '''最近 hours 小时窗口的起始桶'''
+    return bucket(now) - timedelta(hours=hours - 1)
+
+
+def _add(model, rows, scores):
+    '''时间桶原子累加：先插入（已存在则忽略）再 UPDATE score = score + n，增量相同的桶合并为一条 UPDATE
+
+    Args:
+        model: PostActivity 或 TagActivity
+        rows (list[dict]): 时间桶的唯一键，除 course_id、hour 外只有一个字段（post_id 或 tag_id）
+        scores (list[int]): 与 rows 对应的增量
+    '''
+    model.objects.bulk_create([model(**row) for row in rows], ignore_conflicts=True)
+    groups = {}
+    for row, score in zip(rows, scores):
+        groups.setdefault((score, row['course_id'], row['hour']), []).append(row)
+    for (score, course_id, hour), group in groups.items():
+        field = next(key for key in group[0] if key not in ('course_id', 'hour'))
+        model.objects.filter(course_id=course_id, hour=hour, **{field + '__in': [row[field] for row in group]}).update(
+            score=F('score') + score)
+
+
+def record(post, now=None, **deltas):
+    '''记录一次互动
+
+    Args:
+        post (Post): 帖子
+        now (datetime): 互动时间，默认为当前时间
+        **deltas: 计数字段及增量，与 counters.incr_post 相同，如 likeCount=1、commentCount=-1
+    '''
+    record_many([(post, deltas)], now)
+
+
+def record_many(items, now=None):
+    '''批量记录互动，查询数与帖子数无关
+
+    Args:
+        items (list[tuple]): [(帖子, {计数字段: 增量}), ...]
+        now (datetime): 互动时间，默认为当前时间
+    '''
+    scores = {}
+    for post, deltas in items:
+        score = sum(WEIGHTS.get(field, 0) * delta for field, delta in deltas.items())
+        if score:
+            scores[post] = scores.get(post, 0) + score
+    scores = {post: score for post, score in scores.items() if score}
+    if not scores:
+        return
+    hour = bucket(now)
+    posts = list(scores)
+    _add(models.PostActivity, [{'course_id': post.course_id, 'post_id': post.pk, 'hour': hour} for post in posts],
+         [scores[post] for post in posts])
+
+    by_pk = {post.pk: post for post in posts}
+    tag_scores = {}
+    for post_id, tag_id in models.PostTag.objects.filter(post_id__in=by_pk).values_list('post_id', 'tag_id'):
+        post = by_pk[post_id]
+        key = (post.course_id, tag_id)
+        tag_scores[key] = tag_scores.get(key, 0) + scores[post]
+    tag_scores = {key: score for key, score in tag_scores.items() if score}
+    if tag_scores:
+        keys = list(tag_scores)
+        _add(models.TagActivity, [{'course_id': course_id, 'tag_id': tag_id, 'hour': hour} for course_id, tag_id in keys],
+             [tag_scores[key] for key in keys])
+
+
+def _default_hours():
+    return getattr(settings, 'FORUM_TRENDING_HOURS', 7 * 24)
+
+
+def trending_posts(course_id, hours=None, limit=10, now=None):
+    '''最近 hours 小时内互动量最高的帖子
+
+    Returns:
+        list[tuple]: [(post_id, 互动量), ...]
+    '''
+    start = window_start(hours or _default_hours(), now)
+    return list(
+        models.PostActivity.objects.filter(course_id=course_id, hour__gte=start)
+        .values('post_id').annotate(total=Sum('score')).filter(total__gt=0)
+        .order_by('-total', '-post_id').values_list('post_id', 'total')[:limit]
+    )
+
+
+def trending_tags(course_id, hours=None, limit=10, now=None):
+    '''最近 hours 小时内互动量最高的标签
+
+    Returns:
+        list[tuple]: [(标签名, 互动量), ...]
+    '''
+    start = window_start(hours or _default_hours(), now)
+    return list(
+        models.TagActivity.objects.filter(course_id=course_id, hour__gte=start)
+        .values('tag__name').annotate(total=Sum('score')).filter(total__gt=0)
+        .order_by('-total', 'tag__name').values_list('tag__name', 'total')[:limit]
+    )
+
+
+def retention_hours():
+    '''时间桶的保留时长，也是可查询的最大窗口'''
+    return getattr(settings, 'FORUM_TRENDING_RETENTION_HOURS', 7 * 24)
+
+
+def prune(now=None):
+    '''删除超出保留时长的时间桶
+
+    Returns:
+        int: 删除的时间桶数
+    '''
+    start = window_start(retention_hours(), now)
+    deleted, _ = models.PostActivity.objects.filter(hour__lt=start).delete()
+    tag_deleted, _ = models.TagActivity.objects.filter(hour__lt=start).delete()
+    return deleted + tag_deleted
@@ -0,0 +1,41 @@
+"""
+当前用户对帖子的点赞、收藏状态
+对一页帖子只做一次查询（点赞和收藏记录 UNION 后按 post_id IN 查找），结果写到每篇帖子的
+has_liked、has_collected 属性上，列表页、检索结果、我的收藏和帖子详情共用
+"""
+
+from django.db.models import IntegerField, Value
+
+from baweb import models
+
+LIKED = 1
+COLLECTED = 2
+
+
+def attach(posts, user_id):
+    '''为帖子列表填充 has_liked、has_collected
+
+    Args:
+        posts (iterable[Post]): 一页帖子
+        user_id (int): 当前用户 id，未登录为 None
+
+    Returns:
+        list[Post]: 帖子列表
+    '''
+    posts = list(posts)
+    for post in posts:
+        post.has_liked = False
+        post.has_collected = False
+    if not posts or not user_id:
+        return posts
+
+    post_ids = [post.pk for post in posts]
+    likes = (models.PostLike.objects.filter(user_id=user_id, post_id__in=post_ids)
+             .annotate(kind=Value(LIKED, IntegerField())).values_list('post_id', 'kind'))
+    collects = (models.PostCollect.objects.filter(user_id=user_id, post_id__in=post_ids)
+                .annotate(kind=Value(COLLECTED, IntegerField())).values_list('post_id', 'kind'))
+    states = set(likes.union(collects, all=True))
+    for post in posts:
+        post.has_liked = (post.pk, LIKED) in states
+        post.has_collected = (post.pk, COLLECTED) in states
+    return posts
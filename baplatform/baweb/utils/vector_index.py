@@ -0,0 +1,208 @@
+"""
+帖子向量索引（语义检索）
+每门课程一个内存映射的 float32 矩阵文件 course_<id>.f32，每行是一篇帖子的归一化嵌入，
+配套 course_<id>.ids.npy 记录每行对应的 Post.id（-1 表示空行）
+帖子创建、编辑、删除时只改写对应的一行，空行被后续新帖复用，容量不足时按倍数扩容，不需要整体重建
+查询时对矩阵分块做 NumPy 矩阵乘法得到余弦相似度，再取 top-k
+
+多进程部署时各进程共享同一组文件；写操作只在进程内加锁，建议由单个进程（如嵌入任务）负责写入
+"""
+
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Case, When, IntegerField
+
+from baweb import models
+from baweb.utils import embedding
+
+DTYPE = np.float32
+MIN_CAPACITY = 64
+# 分块计算相似度时每块的行数，限制临时内存
+BLOCK_ROWS = 65536
+
+_lock = threading.RLock()
+
+
+def _normalize(matrix):
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=DTYPE))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+class VectorIndex:
+    '''单门课程的帖子向量索引'''
+
+    def __init__(self, course_id, dim=None):
+        self.course_id = course_id
+        self.dim = dim or embedding.get_embedder().dim
+        directory = getattr(settings, 'FORUM_VECTOR_DIR', os.path.join(settings.BASE_DIR, 'vector_index'))
+        self.matrix_path = os.path.join(directory, 'course_{}.f32'.format(course_id))
+        self.ids_path = os.path.join(directory, 'course_{}.ids.npy'.format(course_id))
+
+    def exists(self):
+        return os.path.exists(self.ids_path) and os.path.exists(self.matrix_path)
+
+    def _open(self):
+        '''打开索引，不存在时从数据库中已有的嵌入构建
+
+        Returns:
+            tuple: (ids 数组, 内存映射矩阵)
+        '''
+        if not self.exists():
+            self.rebuild()
+        ids = np.load(self.ids_path)
+        if len(ids) == 0:
+            return ids, np.zeros((0, self.dim), dtype=DTYPE)
+        matrix = np.memmap(self.matrix_path, dtype=DTYPE, mode='r+', shape=(len(ids), self.dim))
+        return ids, matrix
+
+    def _save_ids(self, ids):
+        # 先写临时文件再替换，读者不会读到写了一半的 id 表
+        tmp_path = self.ids_path + '.tmp.npy'
+        np.save(tmp_path, ids)
+        os.replace(tmp_path, self.ids_path)
+
+    def _grow(self, ids, needed):
+        '''扩容到至少 needed 行，新行填 0，id 记为 -1'''
+        capacity = max(MIN_CAPACITY, len(ids))
+        while capacity < needed:
+            capacity *= 2
+        with open(self.matrix_path, 'ab') as f:
+            f.write(b'\0' * ((capacity - len(ids)) * self.dim * np.dtype(DTYPE).itemsize))
+        return np.concatenate([ids, np.full(capacity - len(ids), -1, dtype=np.int64)])
+
+    def rebuild(self):
+        '''用数据库中已存储的嵌入重建整个索引'''
+        directory = os.path.dirname(self.ids_path)
+        os.makedirs(directory, exist_ok=True)
+        rows = (models.Post.objects.filter(course_id=self.course_id, embedding__isnull=False)
+                .order_by('id').values_list('id', 'embedding'))
+        ids = []
+        with _lock, open(self.matrix_path, 'wb') as f:
+            for post_id, blob in rows.iterator():
+                vector = embedding.decode(blob)
+                if len(vector) != self.dim:
+                    continue
+                f.write(_normalize(vector).tobytes())
+                ids.append(post_id)
+            self._save_ids(np.array(ids, dtype=np.int64))
+
+    def upsert(self, post_ids, vectors):
+        '''写入或更新若干帖子的向量
+
+        Args:
+            post_ids (list[int]): 帖子 id
+            vectors: (len(post_ids), dim) 的向量矩阵
+        '''
+        vectors = _normalize(vectors)
+        with _lock:
+            ids, _ = self._open()
+            slots = {post_id: slot for slot, post_id in enumerate(ids) if post_id >= 0}
+            free = list(np.flatnonzero(ids < 0))
+            new = [post_id for post_id in post_ids if post_id not in slots]
+            if len(new) > len(free):
+                old_capacity = len(ids)
+                ids = self._grow(ids, len(slots) + len(new))
+                free.extend(range(old_capacity, len(ids)))
+            for post_id in new:
+                slots[post_id] = free.pop(0)
+                ids[slots[post_id]] = post_id
+
+            matrix = np.memmap(self.matrix_path, dtype=DTYPE, mode='r+', shape=(len(ids), self.dim))
+            for post_id, vector in zip(post_ids, vectors):
+                matrix[slots[post_id]] = vector
+            matrix.flush()
+            del matrix
+            self._save_ids(ids)
+
+    def remove(self, post_ids):
+        '''删除若干帖子的向量，空出的行留给后续新帖'''
+        if not self.exists():
+            return
+        with _lock:
+            ids, matrix = self._open()
+            slots = np.flatnonzero(np.isin(ids, list(post_ids)))
+            if len(slots) == 0:
+                return
+            matrix[slots] = 0
+            matrix.flush()
+            del matrix
+            ids[slots] = -1
+            self._save_ids(ids)
+
+    def vectors(self, post_ids):
+        '''读取若干帖子在索引中的向量
+
+        Returns:
+            tuple: (索引中存在的帖子 id 列表, 对应的向量矩阵)
+        '''
+        ids, matrix = self._open()
+        slots = {int(post_id): slot for slot, post_id in enumerate(ids) if post_id >= 0}
+        found = [post_id for post_id in post_ids if post_id in slots]
+        rows = np.asarray(matrix[[slots[post_id] for post_id in found]]) if found else np.zeros((0, self.dim), DTYPE)
+        return found, rows
+
+    def scores(self, queries):
+        '''查询向量与索引中每一行的余弦相似度（分块矩阵乘法）
+
+        Returns:
+            tuple: (ids 数组, (m, 行数) 的相似度矩阵，空行为 -inf)
+        '''
+        queries = _normalize(queries)
+        ids, matrix = self._open()
+        scores = np.empty((len(queries), len(ids)), dtype=DTYPE)
+        for start in range(0, len(ids), BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + BLOCK_ROWS])
+            scores[:, start:start + len(block)] = queries @ block.T
+        scores[:, ids < 0] = -np.inf
+        return ids, scores
+
+    def search(self, queries, k=10):
+        '''批量 top-k 余弦相似度检索
+
+        Args:
+            queries: (m, dim) 的查询向量矩阵
+            k (int): 每个查询返回的结果数
+
+        Returns:
+            list[list[tuple]]: 每个查询的 [(post_id, score), ...]，按相似度从高到低
+        '''
+        ids, scores = self.scores(queries)
+        if len(ids) == 0:
+            return [[] for _ in range(len(scores))]
+
+        k = min(k, int((ids >= 0).sum()))
+        results = []
+        for row in scores:
+            if k == 0:
+                results.append([])
+                continue
+            top = np.argpartition(-row, k - 1)[:k]
+            top = top[np.argsort(-row[top])]
+            results.append([(int(ids[i]), float(row[i])) for i in top])
+        return results
+
+
+def remove_post(post):
+    VectorIndex(post.course_id).remove([post.pk])
+
+
+def semantic_search(posts_query, course_id, keyword, k=None):
+    '''在帖子查询集上应用语义检索，结果按相似度排序
+
+    Returns:
+        QuerySet: 相似度最高的 k 篇帖子（同时满足 posts_query 的其他条件）
+    '''
+    k = k or getattr(settings, 'FORUM_SEMANTIC_TOP_K', 100)
+    query = embedding.get_embedder().embed([keyword])
+    hits = VectorIndex(course_id).search(query, k)[0]
+    ids = [post_id for post_id, _ in hits]
+    if not ids:
+        return posts_query.none()
+    order = Case(*[When(id=post_id, then=rank) for rank, post_id in enumerate(ids)],
+                 output_field=IntegerField())
+    return posts_query.filter(id__in=ids).annotate(semantic_rank=order).order_by('semantic_rank')
@@ -0,0 +1,184 @@
+"""
+帖子浏览数写缓冲
+post_detail 不再每次访问都 UPDATE 帖子行，而是把增量累积在 Django 缓存中，
+每累计 FORUM_VIEW_FLUSH_HITS 次浏览或距上次写回超过 FORUM_VIEW_FLUSH_INTERVAL 秒时，
+由触发的那次浏览在进程内批量写回；同一会话在 FORUM_VIEW_DEDUP_SECONDS 秒内重复访问同一帖子只计一次
+
+所有缓存操作都是单键的原子操作（add / incr / decr），不依赖进程内的锁：
+帖子第一次出现待写回的浏览时用 add 设置它的标记键，设置成功的进程再用 incr 分配一个槽号，
+把帖子主键写入该槽；flush() 按槽号顺序读取新登记的帖子，先删除标记再扣除读到的增量，
+之后到达的浏览会重新登记，不会丢失
+
+注意：默认的 LocMemCache 是进程内缓存，写回只能在同一进程中触发，进程重启时最多丢失未写回的
+FORUM_VIEW_FLUSH_HITS 次浏览（或 FORUM_VIEW_FLUSH_INTERVAL 秒内的浏览）。
+配置共享缓存（如 Memcached/Redis）后，也可以用 flush_views 命令从其他进程定时写回
+"""
+
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.db.models import F
+
+from baweb import models
+
+KEY_PREFIX = 'forum:views:'
+PENDING_KEY = KEY_PREFIX + 'pending:{}'
+# 帖子已登记、尚未被写回处理的标记
+MARK_KEY = KEY_PREFIX + 'mark:{}'
+# 登记槽：槽号 -> 帖子主键；HEAD 为已分配的最大槽号，TAIL 为已处理到的槽号
+SLOT_KEY = KEY_PREFIX + 'slot:{}'
+HEAD_KEY = KEY_PREFIX + 'head'
+TAIL_KEY = KEY_PREFIX + 'tail'
+# 上次写回时遇到的未写入的槽号
+GAP_KEY = KEY_PREFIX + 'gap'
+FLUSH_LOCK_KEY = KEY_PREFIX + 'flushing'
+# 上次写回以来的浏览数和上次写回的时间
+HITS_KEY = KEY_PREFIX + 'hits'
+LAST_FLUSH_KEY = KEY_PREFIX + 'last_flush'
+SEEN_KEY = KEY_PREFIX + 'seen:{}:{}'
+
+# 标记的有效期：登记的进程在设置标记后、写入槽之前中断时，过期后下一次浏览会重新登记
+MARK_TIMEOUT = 3600
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _incr(key, delta=1):
+    '''原子自增缓存计数，键不存在时先创建'''
+    cache.add(key, 0, None)
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # 键在 add 和 incr 之间被删除（刚被写回）
+        cache.add(key, delta, None)
+        return delta
+
+
+def _viewer(request):
+    '''标识访问者：优先使用会话键，其次使用登录用户'''
+    session_key = getattr(request.session, 'session_key', None)
+    if session_key:
+        return session_key
+    user_id = request.session.get('info', {}).get('id')
+    return 'user-{}'.format(user_id) if user_id else None
+
+
+def _mark(pk):
+    '''登记有待写回浏览数的帖子，已登记且未处理时什么也不做'''
+    if cache.add(MARK_KEY.format(pk), 1, MARK_TIMEOUT):
+        cache.set(SLOT_KEY.format(_incr(HEAD_KEY)), pk, None)
+
+
+def record_view(request, post):
+    '''记录一次帖子浏览，达到写回条件时批量写回
+
+    Args:
+        request: 当前请求，用于同会话去重
+        post (Post): 被浏览的帖子
+
+    Returns:
+        bool: 是否计入了浏览数（重复浏览返回 False）
+    '''
+    window = _setting('FORUM_VIEW_DEDUP_SECONDS', 0)
+    viewer = _viewer(request)
+    if window and viewer:
+        # add 仅在键不存在时成功，窗口期内的重复浏览直接丢弃
+        if not cache.add(SEEN_KEY.format(viewer, post.pk), 1, window):
+            return False
+
+    _incr(PENDING_KEY.format(post.pk))
+    _mark(post.pk)
+    if _incr(HITS_KEY) >= _setting('FORUM_VIEW_FLUSH_HITS', 100) or _flush_due():
+        try:
+            flush()
+        except DatabaseError:
+            # 写回失败时增量已放回缓冲，由之后的浏览再次触发，不影响本次请求
+            pass
+    return True
+
+
+def _flush_due():
+    '''距上次写回是否已超过 FORUM_VIEW_FLUSH_INTERVAL 秒（第一次调用时从现在开始计时）'''
+    now = time.time()
+    if cache.add(LAST_FLUSH_KEY, now, None):
+        return False
+    return now - (cache.get(LAST_FLUSH_KEY) or now) >= _setting('FORUM_VIEW_FLUSH_INTERVAL', 60)
+
+
+def pending(post_pk):
+    '''尚未写回数据库的浏览数'''
+    return cache.get(PENDING_KEY.format(post_pk)) or 0
+
+
+def _take_marked():
+    '''取出新登记的帖子主键
+
+    其他进程可能已分配槽号但还没写入槽，遇到这样的空槽时停下，下次写回再读；
+    连续两次写回都是同一个空槽（登记的进程已中断）时跳过它
+    '''
+    head = cache.get(HEAD_KEY) or 0
+    tail = cache.get(TAIL_KEY) or 0
+    keys = [SLOT_KEY.format(n) for n in range(tail + 1, head + 1)]
+    slots = cache.get_many(keys)
+    gap = cache.get(GAP_KEY)
+
+    pks = set()
+    done = tail
+    for n in range(tail + 1, head + 1):
+        pk = slots.get(SLOT_KEY.format(n))
+        if pk is None and n != gap:
+            cache.set(GAP_KEY, n, None)
+            break
+        if pk is not None:
+            pks.add(pk)
+        done = n
+    cache.delete_many(keys[:done - tail])
+    cache.set(TAIL_KEY, done, None)
+    return pks
+
+
+def flush():
+    '''把缓冲的浏览数批量写回数据库
+
+    相同增量的帖子合并成一条 UPDATE ... WHERE id IN (...)
+
+    Returns:
+        int: 写回的浏览数总和
+    '''
+    # 同一时间只允许一个写回者
+    if not cache.add(FLUSH_LOCK_KEY, 1, 60):
+        return 0
+    try:
+        cache.set(HITS_KEY, 0, None)
+        cache.set(LAST_FLUSH_KEY, time.time(), None)
+        pks = _take_marked()
+        # 先删除标记再读取增量：读取之后到达的浏览会重新登记，留待下次写回
+        cache.delete_many([MARK_KEY.format(pk) for pk in pks])
+        counts = cache.get_many([PENDING_KEY.format(pk) for pk in pks])
+        by_delta = defaultdict(list)
+        for pk in pks:
+            count = counts.get(PENDING_KEY.format(pk))
+            if count:
+                cache.decr(PENDING_KEY.format(pk), count)
+                by_delta[count].append(pk)
+
+        if by_delta:
+            try:
+                with transaction.atomic():
+                    for delta, group in by_delta.items():
+                        models.Post.objects.filter(pk__in=group).update(viewCount=F('viewCount') + delta)
+            except Exception:
+                # 写回失败时把增量放回缓冲，留待下次写回
+                for delta, group in by_delta.items():
+                    for pk in group:
+                        _incr(PENDING_KEY.format(pk), delta)
+                        _mark(pk)
+                raise
+        return sum(delta * len(group) for delta, group in by_delta.items())
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
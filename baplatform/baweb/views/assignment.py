@@ -6,6 +6,7 @@ from baweb import models
 from baweb.forms.assignmentforms import AssignmentFileForm, AssignmentSubmitForm, AssignmentMarkForm
 from ..forms.courseforms import CourseAssignmentForm
 from ..forms.userforms import UserChangePasswordForm
+from ..utils import submission_status
 
 
 def assignment_list(request, id):
@@ -97,19 +98,14 @@ def assignment_page(request, id):
     changepwd_form = UserChangePasswordForm
     if user.type == 2:
         is_teacher = 1
-        total_submit_list = models.AssignmentSubmit.objects.filter(
-            assignment=assignment).all()
-        students = []
-        submit_list = []
-        for submit in total_submit_list:
-            if submit.student not in students:
-                submit_list.append(submit)
-                students.append(submit.student)
+        # 每个学生只有一行提交，不需要再去重；只打过分、没有上传文件的不列出
+        submit_list = list(models.Submission.objects.filter(
+            assignment=assignment, submitted=True).select_related('student__user').order_by('id'))
+        students = [submit.student for submit in submit_list]
     elif user.type == 1:
         students = []
-        student = models.StudentInfo.objects.filter(user=user).first()
-        submit_list = models.AssignmentSubmit.objects.filter(
-            assignment=assignment, student=student).all()
+        submit_list = models.SubmissionFile.objects.filter(
+            submission__assignment=assignment, submission__student_id=user.id).all()
         is_teacher = 0
     file_list = models.AssignmentFile.objects.filter(
         assignment=assignment).all()
@@ -138,29 +134,26 @@ def remind(request):
     info = request.session.get("info", "")
     user_id = info['id']
     user = models.User.objects.filter(id=user_id).first()
+    submitted = None
     if user.type == 1:
-        course_list = []
-        student = models.StudentInfo.objects.filter(user=user).first()
-        studentcourse = models.StudentCourse.objects.filter(
-            student=student).all()
-        for obj in studentcourse:
-            course_list.append(obj.course)
+        assignment_list = models.Assignment.objects.filter(course__student_course__student_id=user_id).distinct()
+        submitted = submission_status.submitted_assignments(user_id)
     elif user.type == 2:
-        teacher = models.TeacherInfo.objects.filter(user=user).first()
-        course_list = models.Course.objects.filter(teacher=teacher).all()
+        assignment_list = models.Assignment.objects.filter(course__teacher_id=user_id)
     ddl_list = []
     assignment_name_list = []
     assingment_url_list = []
+    submitted_list = []
     count = 0
-    for course in course_list:
-        assignment_list = models.Assignment.objects.filter(course=course).all()
-        for assignment in assignment_list:
-            year, month, date = str(assignment.ddl).split('-')
-            ddl = "{}-{}-{}".format(int(year), int(month), int(date))
-            ddl_list.append(ddl)
-            assignment_name_list.append(assignment.name)
-            assingment_url_list.append("/assignment/{}/page".format(assignment.id))
-            count += 1
+    for assignment in assignment_list.order_by('course_id', 'id'):
+        year, month, date = str(assignment.ddl).split('-')
+        ddl = "{}-{}-{}".format(int(year), int(month), int(date))
+        ddl_list.append(ddl)
+        assignment_name_list.append(assignment.name)
+        assingment_url_list.append("/assignment/{}/page".format(assignment.id))
+        if submitted is not None:
+            submitted_list.append(assignment.id in submitted)
+        count += 1
     if count == 0:
         res = {
             "status": False
@@ -173,5 +166,7 @@ def remind(request):
             "names": assignment_name_list,
             "urls": assingment_url_list, 
         }
+        if submitted is not None:
+            res["submitted"] = submitted_list
     print(count)
     return JsonResponse(res)
@@ -1,9 +1,13 @@
 from django.shortcuts import render, redirect
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.db import transaction
 
+import json
 import os
+from itertools import groupby
 from baweb import models
+from ..utils import submission_status
 from ..forms.assignmentforms import AssignmentFileForm, AssignmentSubmitForm, AssignmentMarkForm
 
 def file_list(request, id):
@@ -13,8 +17,7 @@ def file_list(request, id):
     if user.type == 2:
         file_list = models.AssignmentFile.objects.filter(assignment=assignment).all()
     else: 
-        student = models.StudentInfo.objects.filter(user=user).first()
-        file_list = models.AssignmentSubmit.objects.filter(assignment=assignment, student=student).all()
+        file_list = models.SubmissionFile.objects.filter(submission__assignment=assignment, submission__student_id=user.id).all()
     return render(request, 'assignmentfile_list.html', {"file_list":file_list, 'id':id})
 
 @csrf_exempt
@@ -30,12 +33,16 @@ def file_add(request, id):
         names = request.POST.getlist("file_name")
         files = request.FILES.getlist("file")
         assignment = models.Assignment.objects.filter(id=id).first()
-        for i in range(len(files)):
+        with transaction.atomic():
             if user.type == 1:
-                student = models.StudentInfo.objects.filter(user=user).first()
-                models.AssignmentSubmit.objects.create(file_name=names[i], assignment=assignment, file=files[i], student=student)
-            elif user.type == 2:
-                models.AssignmentFile.objects.create(file_name=names[i], assignment=assignment, file=files[i])      
+                submission = submission_status.lock(assignment.id, user.id)
+            for i in range(len(files)):
+                if user.type == 1:
+                    models.SubmissionFile.objects.create(file_name=names[i], submission=submission, file=files[i])
+                elif user.type == 2:
+                    models.AssignmentFile.objects.create(file_name=names[i], assignment=assignment, file=files[i])      
+            if user.type == 1:
+                submission_status.refresh(submission)
         return JsonResponse({"status": True})
     return JsonResponse({"status": False})
 
@@ -47,7 +54,7 @@ def file_update(request, id, fid):
     if user.type == 2:
         old_obj = models.AssignmentFile.objects.filter(id=fid).first()
     elif user.type == 1:
-        old_obj = models.AssignmentSubmit.objects.filter(id=fid).first()
+        old_obj = models.SubmissionFile.objects.filter(id=fid).first()
     if request.method == 'GET':
         if user.type == 2:
             form = AssignmentFileForm(instance=old_obj)
@@ -64,12 +71,19 @@ def file_update(request, id, fid):
         form = AssignmentSubmitForm(request.POST, request.FILES, instance=old_obj)
     if form.is_valid():
         obj = form.save(commit=False)
-        assignment = models.Assignment.objects.filter(id=id).first()
-        obj.assignment = assignment
-        if user.type == 1:
-            student = models.StudentInfo.objects.filter(user=user).first()
-            obj.student = student
-        obj.save()
+        with transaction.atomic():
+            if user.type == 2:
+                obj.assignment = models.Assignment.objects.filter(id=id).first()
+            elif user.type == 1:
+                old_submission = obj.submission
+                obj.submission = submission_status.lock(id, user.id)
+            obj.save()
+            if user.type == 1:
+                submission_status.refresh(obj.submission)
+                # 文件换到了另一个任务下，原提交行同样要重新汇总
+                if old_submission.pk != obj.submission.pk:
+                    submission_status.refresh(
+                        submission_status.lock(old_submission.assignment_id, old_submission.student_id))
     return redirect('/assignment/{}/file/list'.format(id))   
 
 @csrf_exempt
@@ -85,48 +99,30 @@ def file_delete(request, id, fid):
             os.remove(dir+'{}'.format(i.file.name))
         models.AssignmentFile.objects.filter(id=fid).delete()
     elif user.type == 1:
-        deletefile = models.AssignmentSubmit.objects.filter(id=fid)
+        deletefile = models.SubmissionFile.objects.filter(id=fid, submission__student_id=user.id)
         for i in deletefile:
             ##print(dir+'{}'.format(i.file.name))
             os.remove(dir+'{}'.format(i.file.name))
-        models.AssignmentSubmit.objects.filter(id=fid).delete()
+        with transaction.atomic():
+            for i in deletefile:
+                submission = submission_status.lock(i.submission.assignment_id, user.id)
+                i.delete()
+                submission_status.refresh(submission)
     return redirect('/assignment/{}/page'.format(id))
 
 
 @csrf_exempt
 def submit_info(request, id):
     assignment = models.Assignment.objects.filter(id=id).first()
-    total_submit_list = models.AssignmentSubmit.objects.filter(assignment=assignment).all()
-    studentscourse = models.StudentCourse.objects.filter(course=assignment.course).all()
-    unsubmit_student_list = []
-    count = 0
-    for studentcourse in studentscourse:
-        unsubmit_student_list.append(studentcourse.student)
-        count += 1
-    total_number = count
-    students = []
-    for submit in total_submit_list:
-        if submit.student not in students:
-            students.append(submit.student)
-            if assignment.is_group:
-                groupmember = models.GroupMember.objects.filter(student=submit.student).first()
-                group = groupmember.group
-                groupmembers = models.GroupMember.objects.filter(group=group).all()
-                for member in groupmembers:
-                    unsubmit_student_list.remove(member.student)
-                    count -= 1
-            else:
-                unsubmit_student_list.remove(submit.student)
-                count -= 1
-    unsubmit_number = count
+    status = submission_status.compute(assignment)
     series = [
                 {
                     "name": '人数',
                     "type": 'pie',
                     "radius": '50%',
                     "data": [
-                        { "value": total_number-unsubmit_number, "name": '已提交' },
-                        { "value": unsubmit_number, "name": '未提交' },
+                        { "value": len(status.submitted), "name": '已提交' },
+                        { "value": len(status.unsubmitted), "name": '未提交' },
                     ],
                     "emphasis": {
                         "itemStyle": {
@@ -143,37 +139,15 @@ def submit_info(request, id):
 def unsubmit_list(request, id):
     '''计算所有未提交作业的人数并且给出名单'''
     assignment = models.Assignment.objects.filter(id=id).first()
-    total_submit_list = models.AssignmentSubmit.objects.filter(assignment=assignment).all()
-    studentscourse = models.StudentCourse.objects.filter(course=assignment.course).all()
-    unsubmit_student_list = []
-    count = 0
-    for studentcourse in studentscourse:
-        unsubmit_student_list.append(studentcourse.student)
-        count += 1
-    students = []
-    for submit in total_submit_list:
-        if submit.student not in students:
-            students.append(submit.student)
-            if assignment.is_group:
-                groupmember = models.GroupMember.objects.filter(student=submit.student).first()
-                group = groupmember.group
-                groupmembers = models.GroupMember.objects.filter(group=group).all()
-                for member in groupmembers:
-                    unsubmit_student_list.remove(member.student)
-                    count -= 1
-            else:
-                unsubmit_student_list.remove(submit.student)
-                count -= 1
+    status = submission_status.compute(assignment)
     context = {
-        'count':count, 
-        'unsubmit_student_list':unsubmit_student_list,
+        'count':len(status.unsubmitted), 
+        'unsubmit_student_list':status.unsubmitted,
     }
     return render(request, 'unsubmit_list.html', context)
 
 def submitfile_list(request, id, sid):
-    assignment = models.Assignment.objects.filter(id=id).first()
-    student = models.StudentInfo.objects.filter(user_id=sid).first()
-    submit_list = models.AssignmentSubmit.objects.filter(assignment=assignment, student=student).all()
+    submit_list = models.SubmissionFile.objects.filter(submission__assignment_id=id, submission__student_id=sid).all()
     return render(request, 'submitfile_list.html', {'submit_list':submit_list})
 @csrf_exempt
 def marks_enter(request, id, sid):
@@ -186,39 +160,26 @@ def marks_enter(request, id, sid):
 
         }
         return render(request, 'change.html', content)
-    assignment = models.Assignment.objects.filter(id=id).first()
-    student = models.StudentInfo.objects.filter(user_id=sid).first()
-    obj = models.AssignmentSubmit.objects.filter(assignment=assignment, student=student).first()
-    form = AssignmentMarkForm(request.POST, instance=obj)
+    form = AssignmentMarkForm(request.POST)
     if form.is_valid():
-        assignmentsubmit = form.save(commit=False)
-        assignmentsubmit.assignment = assignment
-        assignmentsubmit.student = student
-        assignmentsubmit.save()
+        # 分数保存在该学生唯一的一行提交上，还没有上传文件时也先建立提交行
+        submission_status.set_marks(id, sid, form.cleaned_data['marks'], form.cleaned_data['max_marks'])
     return redirect("/assignment/{}/page".format(id))
 
 @csrf_exempt
 def marks_get(request, id, uid):
-    assignment = models.Assignment.objects.filter(id=id).first()
-    student = models.StudentInfo.objects.filter(user_id=uid).first()
-    exists = models.AssignmentSubmit.objects.filter(assignment=assignment, student=student).exists()
-    if exists:
-        file_with_marks = models.AssignmentSubmit.objects.filter(assignment=assignment, student=student).first()
-        get_mark = file_with_marks.marks
-        max_mark = file_with_marks.max_marks
-        marks = "{}/{}".format(get_mark, max_mark)
+    submission = submission_status.get(id, uid)
+    if submission:
+        marks = "{}/{}".format(submission.marks, submission.max_marks)
         return JsonResponse({"status":True, "marks":marks})
 
     return JsonResponse({"status":False})
 
 @csrf_exempt
 def files_get(request, id, uid):
-    assignment = models.Assignment.objects.filter(id=id).first()
-    student = models.StudentInfo.objects.filter(user_id=uid).first()
-    exists = models.AssignmentSubmit.objects.filter(assignment=assignment, student=student).exists()
-    if exists:
-        files = models.AssignmentSubmit.objects.filter(assignment=assignment, student=student).all()
-        count = models.AssignmentSubmit.objects.filter(assignment=assignment, student=student).count()
+    files = list(models.SubmissionFile.objects.filter(submission__assignment_id=id, submission__student_id=uid))
+    if files:
+        count = len(files)
         urls = []
         names = []
         for file in files:
@@ -227,3 +188,31 @@ def files_get(request, id, uid):
         return JsonResponse({"status":True, "urls":urls, "names":names,  "count":count})
     return JsonResponse({"status":False})
 
+
+
+def _submissions_json(rows):
+    '''按学生分组逐段输出 JSON，rows 需按提交行排序'''
+    url = models.SubmissionFile._meta.get_field('file').storage.url
+    yield '{"status": true, "students": ['
+    for index, (_, group) in enumerate(groupby(rows, key=lambda row: row[0])):
+        group = list(group)
+        student_id, marks, max_marks = group[0][1:4]
+        files = [(name, path) for *_, name, path in group if path]
+        item = {
+            "id": student_id,
+            "marks": "{}/{}".format(marks, max_marks),
+            "names": [name for name, _ in files],
+            "urls": [url(path) for _, path in files],
+        }
+        yield (',' if index else '') + json.dumps(item, ensure_ascii=False)
+    yield ']}'
+
+
+def submissions_get(request, id):
+    '''任务全部学生的分数和提交文件（一次连接查询，按学生分组后流式输出）'''
+    info_dict = request.session.get('info')
+    if not models.Assignment.objects.filter(id=id, course__teacher_id=info_dict['id']).exists():
+        return JsonResponse({"status":False}, status=403)
+    rows = (models.Submission.objects.filter(assignment_id=id).order_by('id', 'files__id')
+            .values_list('id', 'student_id', 'marks', 'max_marks', 'files__file_name', 'files__file').iterator())
+    return StreamingHttpResponse(_submissions_json(rows), content_type='application/json')
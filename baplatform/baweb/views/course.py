@@ -6,6 +6,7 @@ from ..forms.userforms import UserChangePasswordForm
 from django.views.decorators.csrf import csrf_exempt
 from openpyxl import load_workbook
 from ..utils.encrypt import md5
+from ..utils import gradebook
 
 def course_list(request):
     info_dict = request.session.get('info')
@@ -187,40 +188,24 @@ def student_list(request, id):
     return render(request, 'student_list.html', content)
 
 def marks_list(request, id):
-    '''显示所有打分情况， 如果未提交，默认分数为0'''
-    course = models.Course.objects.filter(id=id).first()
-    assignment_list = models.Assignment.objects.filter(course=course).all()
+    '''显示所有打分情况， 如果未提交，默认分数为0
+    老师查看全部学生 × 任务的成绩矩阵，学生只查看自己的一行'''
     info_dict = request.session.get('info')
     user = models.User.objects.filter(id=info_dict['id']).first()
-    student = models.StudentInfo.objects.filter(user=user).first()
+    if user.type == 2:
+        if not models.Course.objects.filter(id=id, teacher_id=user.id).exists():
+            return redirect('/')
+        book = gradebook.build(id)
+        totals, max_totals = book.totals
+        grid = [
+            (student, [(int(marks), int(max_marks)) for marks, max_marks in zip(book.marks[i], book.max_marks[i])],
+             int(totals[i]), int(max_totals[i]))
+            for i, student in enumerate(book.students)
+        ]
+        return render(request, 'marks_list.html', {"is_teacher": True, "assignments": book.assignments, "grid": grid})
     marks_list = []
-    for assignment in assignment_list:
-        marks = []
-        marks.append(assignment.id)
-        marks.append(assignment.name)
-        flag = 0
-        if assignment.is_group:
-            groupmember = models.GroupMember.objects.filter(student=student).first()
-            group = groupmember.group
-            groupmembers = models.GroupMember.objects.filter(group=group).all()
-            for member in groupmembers:
-                exists = models.AssignmentSubmit.objects.filter(assignment=assignment, student=member.student).exists()
-                if exists:
-                    submit = models.AssignmentSubmit.objects.filter(assignment=assignment, student=member.student).first()
-                    flag = 1
-                    marks.append(submit.marks)
-                    marks.append(submit.max_marks)
-        else:
-            exists = models.AssignmentSubmit.objects.filter(assignment=assignment, student=student).exists()
-            if exists:
-                submit = models.AssignmentSubmit.objects.filter(assignment=assignment, student=student).first()
-                flag = 1
-                marks.append(submit.marks)
-                marks.append(submit.max_marks)
-        if flag == 0:
-            marks.append(0)
-            marks.append(100)
-        marks_list.append(marks)
+    for assignment, marks, max_marks, _ in gradebook.build(id, student_id=user.id).row(user.id) or []:
+        marks_list.append([assignment.id, assignment.name, marks, max_marks])
     return render(request, 'marks_list.html', {"marks_list":marks_list})
 
 def comment(request, id):
@@ -3,16 +3,21 @@
 处理帖子的创建、查看、编辑、删除等操作
 """
 
+import json
+
 from django.shortcuts import render, redirect
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db import IntegrityError, transaction
+from django.db.models import prefetch_related_objects
 from django.utils import timezone
 from uuid import uuid4
 
 from baweb import models
+from ..utils import (comment_tree, counters, duplicates, events, interactions, keyset, leaderboard, purge, related,
+                     search, tags, trending, user_state, vector_index, viewcount)
 from ..forms.postforms import PostCreateForm, PostUpdateForm, PostCommentForm, PostSearchForm
 
 
@@ -42,7 +47,10 @@ def post_list(request, course_id):
     search_form = PostSearchForm(request.GET)
     keyword = request.GET.get('keyword', '')
     category_id = request.GET.get('category', '')
-    sort_by = request.GET.get('sort_by', 'heat')
+    tag = request.GET.get('tag', '')
+    search_mode = request.GET.get('mode', 'keyword')
+    # 有关键词时默认按相关度排序
+    sort_by = request.GET.get('sort_by', 'relevance' if keyword else 'heat')
     
     # 构建查询（course_id=0时查询所有不对应课程的帖子）
     if course_id == 0:
@@ -50,33 +58,45 @@ def post_list(request, course_id):
     else:
         posts_query = models.Post.objects.filter(course=course)
     
-    if keyword:
-        posts_query = posts_query.filter(
-            Q(title__icontains=keyword) | Q(content__icontains=keyword)
-        )
+    if keyword and search_mode == 'semantic' and course:
+        # 语义检索，按向量相似度排序
+        posts_query = vector_index.semantic_search(posts_query, course.id, keyword)
+    elif keyword:
+        # 全文检索，按 BM25 相关度排序
+        posts_query = search.search(posts_query, keyword)
     
     if category_id:
         posts_query = posts_query.filter(category_id=category_id)
-    
-    # 排序
-    if sort_by == 'newest':
-        posts_query = posts_query.order_by('-createdAt')
-    elif sort_by == 'popular':
-        posts_query = posts_query.order_by('-viewCount')
-    else:  # 默认按热度排序
-        posts_query = posts_query.order_by('-heatScore', '-createdAt')
-    
-    # 分页
-    paginator = Paginator(posts_query, 10)
-    page_num = request.GET.get('page', 1)
-    posts_page = paginator.get_page(page_num)
+    if tag:
+        posts_query = posts_query.filter(post_tags__tag__name=tag)
+    
+    # 分页：相关度排序的检索结果数量有限，沿用页码分页；其余按排序键做游标分页，深页不再变慢
+    if sort_by == 'relevance' and keyword:
+        paginator = Paginator(posts_query, 10)
+        page_num = request.GET.get('page', 1)
+        posts_page = paginator.get_page(page_num)
+    else:
+        if sort_by not in keyset.POST_SORT_KEYS:
+            sort_by = 'heat'
+        cursor = request.GET.get('cursor')
+        if course and not (keyword or category_id or tag or cursor):
+            # 课程第一页访问量最大，从排行缓存读取
+            posts_page = leaderboard.first_page(course.id, sort_by, 10)
+        else:
+            posts_page = keyset.paginate(posts_query, keyset.POST_SORT_KEYS[sort_by], cursor, 10)
+    if keyword and search_mode != 'semantic':
+        search.highlight(posts_page, keyword)
+    # 当前页每篇帖子的点赞、收藏状态（一次查询），作者一次查出
+    prefetch_related_objects(user_state.attach(posts_page, user_id), 'author')
     
     context = {
         'course': course,
         'posts': posts_page,
         'search_form': search_form,
         'keyword': keyword,
+        'search_mode': search_mode,
         'category_id': category_id,
+        'tag': tag,
         'sort_by': sort_by,
         'user_id': user_id,
     }
@@ -84,6 +104,145 @@ def post_list(request, course_id):
     return render(request, 'forum/post_list.html', context)
 
 
+@require_http_methods(["GET"])
+def my_collections(request):
+    """
+    我的收藏
+    按收藏时间倒序，游标分页
+    
+    Returns:
+        renders my_collections.html with paginated posts
+    """
+    info = request.session.get('info', {})
+    user_id = info.get('id')
+    
+    if not user_id:
+        return redirect('/login/')
+    
+    collects_query = (models.PostCollect.objects.filter(user_id=user_id, post__deletedAt__isnull=True)
+                      .select_related('post__author'))
+    collects_page = keyset.paginate(collects_query, keyset.COLLECT_SORT_KEYS, request.GET.get('cursor'), 10)
+    posts = user_state.attach([collect.post for collect in collects_page], user_id)
+    
+    context = {
+        'collects': collects_page,
+        'posts': posts,
+        'user_id': user_id,
+    }
+    
+    return render(request, 'forum/my_collections.html', context)
+
+
+@require_http_methods(["GET"])
+def leaderboard_stats(request):
+    """
+    排行缓存命中统计（仅管理员）
+    
+    Returns:
+        JsonResponse with hits, misses and hit rate
+    """
+    info = request.session.get('info', {})
+    user = models.User.objects.filter(id=info.get('id')).first()
+    if not user or user.type != 3:
+        return JsonResponse({"status": False, "msg": "没有权限"})
+    
+    return JsonResponse({"status": True, **leaderboard.stats()})
+
+
+@require_http_methods(["GET"])
+def popular_tags(request, course_id):
+    """
+    课程热门标签（读取增量维护的标签计数）
+    
+    Args:
+        course_id: 课程ID
+    
+    Returns:
+        JsonResponse with tags and post counts
+    """
+    try:
+        limit = min(int(request.GET.get('limit', 20)), 100)
+    except ValueError:
+        limit = 20
+    
+    return JsonResponse({
+        "status": True,
+        "tags": [{"name": name, "count": count} for name, count in tags.popular(course_id, limit)],
+    })
+
+
+@require_http_methods(["GET"])
+def trending_list(request, course_id):
+    """
+    课程近期趋势：最近 N 小时互动量最高的帖子和标签（只读取时间桶）
+    
+    Args:
+        course_id: 课程ID
+    
+    Returns:
+        JsonResponse with trending posts and tags
+    """
+    try:
+        # 超出保留时长的时间桶已被清理，窗口不能更长
+        hours = min(max(int(request.GET.get('hours', 0)), 0), trending.retention_hours()) or None
+    except ValueError:
+        hours = None
+    
+    post_scores = trending.trending_posts(course_id, hours)
+    posts = models.Post.objects.in_bulk([post_id for post_id, _ in post_scores])
+    
+    return JsonResponse({
+        "status": True,
+        "posts": [
+            {"postId": posts[post_id].postId, "title": posts[post_id].title, "score": score}
+            for post_id, score in post_scores if post_id in posts
+        ],
+        "tags": [{"name": name, "score": score} for name, score in trending.trending_tags(course_id, hours)],
+    })
+
+
+def _event_response(request, channels):
+    '''SSE 响应，断线重连时浏览器会带上 Last-Event-ID 请求头'''
+    last_id = events.parse_last_id(request.META.get('HTTP_LAST_EVENT_ID') or request.GET.get('last_event_id'))
+    response = StreamingHttpResponse(events.stream(channels, last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # 关闭 nginx 的响应缓冲，事件立即送达
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@require_http_methods(["GET"])
+def post_events(request, post_id):
+    """
+    帖子实时事件流（新评论、评论删除、计数变化）
+    
+    Args:
+        post_id: 帖子ID (postId)
+    
+    Returns:
+        StreamingHttpResponse (text/event-stream)
+    """
+    post = models.Post.objects.filter(postId=post_id).first()
+    if not post:
+        return JsonResponse({"status": False, "msg": "帖子不存在"}, status=404)
+    
+    return _event_response(request, [events.post_channel(post.pk)])
+
+
+@require_http_methods(["GET"])
+def course_events(request, course_id):
+    """
+    课程论坛实时事件流（新帖、删帖）
+    
+    Args:
+        course_id: 课程ID，0表示不对应任何课程
+    
+    Returns:
+        StreamingHttpResponse (text/event-stream)
+    """
+    return _event_response(request, [events.course_channel(course_id)])
+
+
 @require_http_methods(["GET"])
 def post_detail(request, post_id):
     """
@@ -104,23 +263,17 @@ def post_detail(request, post_id):
     if not post:
         return redirect('/')
     
-    # 增加浏览数
-    post.viewCount += 1
-    post.save(update_fields=['viewCount'])
+    # 增加浏览数（写缓冲，定期批量写回）
+    viewcount.record_view(request, post)
+    post.viewCount += viewcount.pending(post.pk)
     
-    # 获取评论（分页）
-    comments_query = models.PostComment.objects.filter(post=post, parentComment__isnull=True)
-    paginator = Paginator(comments_query, 10)
-    page_num = request.GET.get('page', 1)
-    comments_page = paginator.get_page(page_num)
+    # 获取评论（游标分页），当前页各楼的回复一次查出
+    comments_query = models.PostComment.objects.filter(post=post, parentComment__isnull=True).select_related('author')
+    comments_page = keyset.paginate(comments_query, keyset.COMMENT_SORT_KEYS, request.GET.get('cursor'), 10)
+    comment_tree.attach_threads(comments_page.object_list)
     
-    # 检查当前用户是否点赞或收藏
-    has_liked = False
-    has_collected = False
-    if user_id:
-        user = models.User.objects.filter(id=user_id).first()
-        has_liked = models.PostLike.objects.filter(post=post, user=user).exists()
-        has_collected = models.PostCollect.objects.filter(post=post, user=user).exists()
+    # 检查当前用户是否点赞或收藏（一次查询）
+    user_state.attach([post], user_id)
     
     # 评论表单
     comment_form = PostCommentForm()
@@ -128,10 +281,11 @@ def post_detail(request, post_id):
     context = {
         'post': post,
         'comments': comments_page,
+        'related_posts': related.related_posts(post),
         'comment_form': comment_form,
         'user_id': user_id,
-        'has_liked': has_liked,
-        'has_collected': has_collected,
+        'has_liked': post.has_liked,
+        'has_collected': post.has_collected,
     }
     
     return render(request, 'forum/post_detail.html', context)
@@ -172,13 +326,29 @@ def post_create(request, course_id):
         form = PostCreateForm(data=request.POST)
         if form.is_valid():
             post = form.save(commit=False)
+            # 保存前检测同课程内的相似问题，随响应返回供前端提示
+            similar = duplicates.find(course.id if course else None, post.title, post.content)
             post.postId = str(uuid4())
             post.author = user
             post.course = course  # 若course为None，则帖子不对应任何课程
             post.heatScore = 0.0  # 初始热度为0
             post.save()
+            # 热门分数依赖创建时间，保存后再计算
+            post.hotScore = post.calculateHot()
+            post.save(update_fields=['hotScore'])
+            events.publish(events.course_channel(course_id), 'post', {
+                "postId": post.postId,
+                "title": post.title,
+                "author": '匿名用户' if post.isAnonymous else user.username,
+                "created_at": post.createdAt.isoformat(),
+            })
             
-            return JsonResponse({"status": True, "postId": post.postId, "msg": "帖子发布成功"})
+            return JsonResponse({
+                "status": True,
+                "postId": post.postId,
+                "msg": "帖子发布成功",
+                "duplicates": [similar_post.postId for similar_post, _ in similar],
+            })
         else:
             return JsonResponse({"status": False, "errors": form.errors})
     
@@ -255,7 +425,8 @@ def post_delete(request, post_id):
     if post.author.id != user_id and user.type != 3:  # 作者或管理员
         return JsonResponse({"status": False, "msg": "没有权限删除"})
     
-    post.delete()
+    # 软删除，评论等关联数据由 purge_deleted_posts 分批清理
+    purge.soft_delete(post)
     return JsonResponse({"status": True, "msg": "帖子已删除"})
 
 
@@ -286,26 +457,31 @@ def post_like(request, post_id):
     # 检查是否已点赞
     like = models.PostLike.objects.filter(post=post, user=user).first()
     
-    if like:
-        # 取消点赞
-        like.delete()
-        post.likeCount = max(0, post.likeCount - 1)
-        action = 'unlike'
-    else:
-        # 点赞
-        models.PostLike.objects.create(post=post, user=user)
-        post.likeCount += 1
-        action = 'like'
-    
-    # 更新热度
-    post.heatScore = post.calculateHeat()
-    post.save()
+    with transaction.atomic():
+        if like:
+            # 取消点赞；并发的重复请求已删除记录时不再扣减计数
+            deleted, _ = models.PostLike.objects.filter(pk=like.pk).delete()
+            action = 'unlike'
+            delta = -deleted
+        else:
+            # 点赞；并发的重复请求已创建记录时不再增加计数
+            try:
+                with transaction.atomic():
+                    models.PostLike.objects.create(post=post, user=user)
+                delta = 1
+            except IntegrityError:
+                delta = 0
+            action = 'like'
+        
+        # 原子更新点赞数和热度
+        result = counters.incr_post(post, likeCount=delta)
+        # 撤销的互动从原来的时间桶中扣除
+        trending.record(post, now=like.createdAt if like else None, likeCount=delta)
     
     return JsonResponse({
         "status": True,
         "action": action,
-        "like_count": post.likeCount,
-        "heat_score": post.heatScore,
+        **result,
     })
 
 
@@ -336,26 +512,66 @@ def post_collect(request, post_id):
     # 检查是否已收藏
     collect = models.PostCollect.objects.filter(post=post, user=user).first()
     
-    if collect:
-        # 取消收藏
-        collect.delete()
-        post.collectCount = max(0, post.collectCount - 1)
-        action = 'uncollect'
-    else:
-        # 收藏
-        models.PostCollect.objects.create(post=post, user=user)
-        post.collectCount += 1
-        action = 'collect'
-    
-    # 更新热度
-    post.heatScore = post.calculateHeat()
-    post.save()
+    with transaction.atomic():
+        if collect:
+            # 取消收藏；并发的重复请求已删除记录时不再扣减计数
+            deleted, _ = models.PostCollect.objects.filter(pk=collect.pk).delete()
+            action = 'uncollect'
+            delta = -deleted
+        else:
+            # 收藏；并发的重复请求已创建记录时不再增加计数
+            try:
+                with transaction.atomic():
+                    models.PostCollect.objects.create(post=post, user=user)
+                delta = 1
+            except IntegrityError:
+                delta = 0
+            action = 'collect'
+        
+        # 原子更新收藏数和热度
+        result = counters.incr_post(post, collectCount=delta)
+        trending.record(post, now=collect.createdAt if collect else None, collectCount=delta)
     
     return JsonResponse({
         "status": True,
         "action": action,
-        "collect_count": post.collectCount,
-        "heat_score": post.heatScore,
+        **result,
+    })
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def interactions_batch(request):
+    """
+    批量设置点赞、收藏状态
+    
+    请求体为 JSON：{"actions": [{"postId": "...", "like": true}, {"postId": "...", "collect": false}, ...]}，
+    动作是“设置为”而不是“切换”，重复提交结果相同
+    
+    Returns:
+        JsonResponse with status and posts (每篇帖子最终的状态和计数)
+    """
+    info = request.session.get('info', {})
+    user_id = info.get('id')
+    
+    if not user_id:
+        return JsonResponse({"status": False, "msg": "未登录"})
+    
+    try:
+        actions = json.loads(request.body or b'{}').get('actions')
+    except (ValueError, AttributeError):
+        actions = None
+    if not isinstance(actions, list) or not all(
+            isinstance(action, dict) and isinstance(action.get('postId'), str) for action in actions):
+        return JsonResponse({"status": False, "msg": "参数错误"})
+    if len(actions) > interactions.MAX_ACTIONS:
+        return JsonResponse({"status": False, "msg": "一次最多提交{}个操作".format(interactions.MAX_ACTIONS)})
+    
+    posts = interactions.set_states(user_id, actions)
+    
+    return JsonResponse({
+        "status": True,
+        "posts": posts,
     })
 
 
@@ -385,22 +601,27 @@ def comment_add(request, post_id):
     
     form = PostCommentForm(data=request.POST)
     if form.is_valid():
-        comment = form.save(commit=False)
-        comment.commentId = str(uuid4())
-        comment.post = post
-        comment.author = user
-        comment.save()
-        
-        # 更新评论数和热度
-        post.commentCount += 1
-        post.heatScore = post.calculateHeat()
-        post.save()
+        with transaction.atomic():
+            comment = form.save(commit=False)
+            comment.commentId = str(uuid4())
+            comment.post = post
+            comment.author = user
+            comment.save()
+            
+            # 原子更新评论数和热度
+            result = counters.incr_post(post, commentCount=1)
+            trending.record(post, commentCount=1)
+            events.publish_on_commit(events.post_channel(post.pk), 'comment', {
+                "comment_id": comment.commentId,
+                "author": '匿名用户' if comment.isAnonymous else user.username,
+                "content": comment.content,
+                "created_at": comment.createdAt.isoformat(),
+            })
         
         return JsonResponse({
             "status": True,
             "msg": "评论已发布",
-            "comment_count": post.commentCount,
-            "heat_score": post.heatScore,
+            **result,
         })
     else:
         return JsonResponse({"status": False, "errors": form.errors})
@@ -425,7 +646,7 @@ def comment_delete(request, comment_id):
     if not user_id:
         return JsonResponse({"status": False, "msg": "未登录"})
     
-    comment = models.PostComment.objects.filter(commentId=comment_id).first()
+    comment = models.PostComment.objects.filter(commentId=comment_id, post__deletedAt__isnull=True).first()
     if not comment:
         return JsonResponse({"status": False, "msg": "评论不存在"})
     
@@ -435,18 +656,45 @@ def comment_delete(request, comment_id):
         return JsonResponse({"status": False, "msg": "没有权限删除"})
     
     post = comment.post
-    post.commentCount = max(0, post.commentCount - 1)
+    with transaction.atomic():
+        # 回复随父评论级联删除，评论数按实际删除的条数扣减
+        _, deleted = comment.delete()
+        removed = deleted.get(models.PostComment._meta.label, 0)
+        
+        # 原子更新评论数和热度
+        result = counters.incr_post(post, commentCount=-removed)
+        trending.record(post, now=comment.createdAt, commentCount=-removed)
+        events.publish_on_commit(events.post_channel(post.pk), 'comment_deleted', {"comment_id": comment.commentId})
     
-    comment.delete()
+    return JsonResponse({
+        "status": True,
+        "msg": "评论已删除",
+        **result,
+    })
+
+
+@require_http_methods(["GET"])
+def comment_replies(request, comment_id):
+    """
+    按需加载评论下更深层的回复
+    
+    Args:
+        comment_id: 评论ID (commentId)
+    
+    Returns:
+        JsonResponse with nested replies
+    """
+    comment = (models.PostComment.objects.filter(commentId=comment_id, post__deletedAt__isnull=True)
+               .select_related('author').first())
+    if not comment:
+        return JsonResponse({"status": False, "msg": "评论不存在"})
     
-    # 更新热度
-    post.heatScore = post.calculateHeat()
-    post.save()
+    comment_tree.load_subtree(comment)
     
     return JsonResponse({
         "status": True,
-        "msg": "评论已删除",
-        "comment_count": post.commentCount,
+        "replies": [comment_tree.to_dict(child) for child in comment.children],
+        "has_more_replies": comment.has_more_replies,
     })
 
 
@@ -468,7 +716,7 @@ def comment_like(request, comment_id):
     if not user_id:
         return JsonResponse({"status": False, "msg": "未登录"})
     
-    comment = models.PostComment.objects.filter(commentId=comment_id).first()
+    comment = models.PostComment.objects.filter(commentId=comment_id, post__deletedAt__isnull=True).first()
     if not comment:
         return JsonResponse({"status": False, "msg": "评论不存在"})
     
@@ -0,0 +1,214 @@
+"""
+论坛只读 JSON 接口
+供轮询的客户端使用：帖子列表、帖子详情、评论分页，支持 fields 参数只返回需要的字段。
+响应带 ETag，客户端带 If-None-Match 重新请求时，
+只做一次很小的查询计算校验值，内容没有变化就直接返回 304，不查询完整数据、不序列化
+
+帖子的计数字段用 update() 原子更新，不会改动 updatedAt（updatedAt 只随内容编辑变化，并用于判断是否需要重新生成嵌入），
+所以帖子列表和详情的校验值由 updatedAt 和各计数字段一起计算，只提供 ETag，不提供 Last-Modified；
+评论页也只提供 ETag：删除较早的评论不会改变最新评论时间，以它作 Last-Modified 会误返回 304
+"""
+
+import hashlib
+
+from django.db.models import Count, Max, Sum
+from django.http import JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_http_methods
+
+from baweb import models
+from ..utils import comment_tree, keyset, viewcount
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+# 接口字段 -> (需要读取的模型字段, 取值函数)
+POST_FIELDS = {
+    'postId': (('postId',), lambda post: post.postId),
+    'title': (('title',), lambda post: post.title),
+    'content': (('content',), lambda post: post.content),
+    'tags': (('tags',), lambda post: post.tags),
+    'author': (('isAnonymous', 'author__username'),
+               lambda post: '匿名用户' if post.isAnonymous else post.author.username),
+    'created_at': (('createdAt',), lambda post: _iso(post.createdAt)),
+    'updated_at': (('updatedAt',), lambda post: _iso(post.updatedAt)),
+    'like_count': (('likeCount',), lambda post: post.likeCount),
+    'collect_count': (('collectCount',), lambda post: post.collectCount),
+    'comment_count': (('commentCount',), lambda post: post.commentCount),
+    'view_count': (('viewCount',), lambda post: post.viewCount),
+    'heat_score': (('heatScore',), lambda post: post.heatScore),
+    'hot_score': (('hotScore',), lambda post: post.hotScore),
+}
+LIST_FIELDS = ('postId', 'title', 'author', 'created_at', 'like_count', 'collect_count', 'comment_count', 'view_count')
+DETAIL_FIELDS = tuple(POST_FIELDS)
+# 计算校验值用到的字段（同时包含所有排序键，游标分页时不会再按需加载）
+VALIDATOR_FIELDS = ('id', 'updatedAt', 'createdAt', 'likeCount', 'collectCount', 'commentCount', 'viewCount',
+                    'heatScore', 'hotScore')
+PAGE_SIZE = 20
+
+
+def _etag(*values):
+    return hashlib.md5(repr(values).encode()).hexdigest()
+
+
+def _compact(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
+
+
+def _fields(request, default):
+    '''解析 fields 参数（逗号分隔），未知字段忽略，postId 总是返回'''
+    requested = [name for name in request.GET.get('fields', '').split(',') if name in POST_FIELDS]
+    names = requested or list(default)
+    return ['postId'] + [name for name in names if name != 'postId']
+
+
+def _load(queryset, fields):
+    '''只读取所选字段需要的列'''
+    columns = {column for name in fields for column in POST_FIELDS[name][0]}
+    if 'author__username' in columns:
+        queryset = queryset.select_related('author')
+    return queryset.only(*columns)
+
+
+def _post_dict(post, fields):
+    return {name: POST_FIELDS[name][1](post) for name in fields}
+
+
+def _sort_by(request):
+    sort_by = request.GET.get('sort_by', 'heat')
+    return sort_by if sort_by in keyset.POST_SORT_KEYS else 'heat'
+
+
+def _post_page(request, course_id):
+    '''当前页的校验字段（同一请求内只查询一次），课程不存在时为 None'''
+    if not hasattr(request, '_forum_post_page'):
+        posts_query = models.Post.objects.filter(course_id=course_id)
+        tag = request.GET.get('tag')
+        if tag:
+            posts_query = posts_query.filter(post_tags__tag__name=tag)
+        page = keyset.paginate(posts_query.only(*VALIDATOR_FIELDS), keyset.POST_SORT_KEYS[_sort_by(request)],
+                               request.GET.get('cursor'), PAGE_SIZE)
+        # 只有空页才需要确认课程是否存在
+        if not page and not models.Course.objects.filter(pk=course_id).exists():
+            page = None
+        request._forum_post_page = page
+    return request._forum_post_page
+
+
+def _post_list_etag(request, course_id):
+    page = _post_page(request, course_id)
+    if page is None:
+        return None
+    return _etag([tuple(getattr(post, field) for field in VALIDATOR_FIELDS) for post in page])
+
+
+@require_http_methods(["GET"])
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_post_list_etag)
+def post_list(request, course_id):
+    """
+    课程帖子列表（游标分页）
+
+    Args:
+        course_id: 课程ID
+
+    Returns:
+        JsonResponse with posts, next_cursor and prev_cursor
+    """
+    page = _post_page(request, course_id)
+    if page is None:
+        return _compact({"status": False, "msg": "课程不存在"}, status=404)
+    fields = _fields(request, LIST_FIELDS)
+    found = _load(models.Post.objects.all(), fields).in_bulk([post.pk for post in page])
+
+    return _compact({
+        "status": True,
+        "posts": [_post_dict(found[post.pk], fields) for post in page if post.pk in found],
+        "next_cursor": page.next_cursor,
+        "prev_cursor": page.prev_cursor,
+    })
+
+
+def _post_state(request, post_id):
+    if not hasattr(request, '_forum_post_state'):
+        request._forum_post_state = (models.Post.objects.filter(postId=post_id)
+                                     .values_list(*VALIDATOR_FIELDS).first())
+    return request._forum_post_state
+
+
+def _post_detail_etag(request, post_id):
+    state = _post_state(request, post_id)
+    if state is None:
+        return None
+    # 浏览数有一部分暂存在写缓冲中
+    return _etag(state, viewcount.pending(state[0]))
+
+
+@require_http_methods(["GET"])
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_post_detail_etag)
+def post_detail(request, post_id):
+    """
+    帖子详情（不计入浏览数）
+
+    Args:
+        post_id: 帖子ID (postId)
+
+    Returns:
+        JsonResponse with post
+    """
+    fields = _fields(request, DETAIL_FIELDS)
+    post = _load(models.Post.objects.filter(postId=post_id), fields + ['view_count']).first()
+    if not post:
+        return _compact({"status": False, "msg": "帖子不存在"}, status=404)
+    post.viewCount += viewcount.pending(post.pk)
+
+    return _compact({"status": True, "post": _post_dict(post, fields)})
+
+
+def _comment_state(request, post_id):
+    '''帖子是否存在及其评论的数量、最新时间、点赞总数（一次聚合查询）'''
+    if not hasattr(request, '_forum_comment_state'):
+        request._forum_comment_state = models.Post.objects.filter(postId=post_id).aggregate(
+            pk=Max('id'), count=Count('post_comments'), latest=Max('post_comments__createdAt'),
+            likes=Sum('post_comments__likeCount'))
+    return request._forum_comment_state
+
+
+def _comment_etag(request, post_id):
+    state = _comment_state(request, post_id)
+    if state['pk'] is None:
+        return None
+    return _etag(state['count'], _iso(state['latest']), state['likes'])
+
+
+@require_http_methods(["GET"])
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_comment_etag)
+def comment_list(request, post_id):
+    """
+    帖子评论（游标分页，每楼附带前几层回复）
+
+    Args:
+        post_id: 帖子ID (postId)
+
+    Returns:
+        JsonResponse with comments, next_cursor and prev_cursor
+    """
+    state = _comment_state(request, post_id)
+    if state['pk'] is None:
+        return _compact({"status": False, "msg": "帖子不存在"}, status=404)
+
+    comments_query = (models.PostComment.objects.filter(post_id=state['pk'], parentComment__isnull=True)
+                      .select_related('author'))
+    page = keyset.paginate(comments_query, keyset.COMMENT_SORT_KEYS, request.GET.get('cursor'), PAGE_SIZE)
+    comment_tree.attach_threads(page.object_list)
+
+    return _compact({
+        "status": True,
+        "comments": [comment_tree.to_dict(comment) for comment in page],
+        "next_cursor": page.next_cursor,
+        "prev_cursor": page.prev_cursor,
+    })
@@ -0,0 +1,18 @@
+"""
+gunicorn 部署配置
+在 baplatform 目录执行：gunicorn -c gunicorn.conf.py baplatform.wsgi
+
+论坛实时事件（SSE）的流式响应会在整个连接期间占用所在的 worker，这里使用 gevent 协程 worker，
+每个连接只占一个协程；gevent worker 启动时会把 threading、socket 等标准库替换为协程版本。
+事件频道和 LocMemCache 都是进程内的（见 baweb/utils/events.py），因此只启动一个 worker 进程
+"""
+
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = 1
+worker_class = 'gevent'
+# 单个 worker 同时保持的连接数（含 SSE 长连接）
+worker_connections = 1000
+# 协程 worker 只用 timeout 检测卡死的进程，不会中断长连接
+timeout = 30